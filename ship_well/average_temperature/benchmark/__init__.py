@@ -0,0 +1,4 @@
+"""
+This package measures the throughput and latency of the average_temperature endpoint against an in-process stand-in
+for the upstream services. See the benchmark management command.
+"""
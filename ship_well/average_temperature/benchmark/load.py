@@ -0,0 +1,141 @@
+"""
+This module drives the average_temperature endpoint at a fixed concurrency, and summarises the outcome
+
+Requests go through the whole Django stack (the ASGI handler, middlewares and the view) with django.test.AsyncClient,
+on the same event loop as the stand-in, so no socket is opened towards the app and the measures only include the app.
+"""
+from collections import Counter
+import asyncio
+from contextlib import contextmanager
+import math
+import random
+import time
+from typing import Dict, List
+from urllib.parse import urlencode, urljoin
+
+from django.test import AsyncClient
+
+from average_temperature.business_logic import geolocation
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+from .stand_in import GOOGLE_MAPS_PATH
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+@contextmanager
+def upstream_services_at(url: str):
+    """
+    Point every temperature source and Google Maps API to the given URL, within the context
+
+    :param url: the base URL of the stand-in
+    """
+    original_urls = {source_class: source_class.BASE_URL for source_class in WEATHER_SOURCE.values()}
+    original_google_maps_url = GoogleApiClient.GOOGLE_MAPS_API_URL
+    try:
+        for source_class, source_url in original_urls.items():
+            source_class.BASE_URL = urljoin(url, source_url.rpartition('/')[2])
+        GoogleApiClient.GOOGLE_MAPS_API_URL = urljoin(url, GOOGLE_MAPS_PATH)
+        yield
+    finally:
+        for source_class, source_url in original_urls.items():
+            source_class.BASE_URL = source_url
+        GoogleApiClient.GOOGLE_MAPS_API_URL = original_google_maps_url
+
+
+@contextmanager
+def google_maps_enabled(geocoding_cache):
+    """
+    Let the zip codes missing from the zip code index be translated by the stand-in, with an API key and a throwaway
+    geocoding cache, within the context
+    """
+    original = geolocation.GOOGLE_MAPS_API_KEY, geolocation.geocoding_cache
+    geolocation.GOOGLE_MAPS_API_KEY = 'benchmark'
+    geolocation.geocoding_cache = geocoding_cache
+    try:
+        yield
+    finally:
+        geolocation.GOOGLE_MAPS_API_KEY, geolocation.geocoding_cache = original
+
+
+def get_request_paths(amount: int, locations: int, zip_code_ratio: float, seed: int = None) -> List[str]:
+    """
+    Build the paths of the requests to perform
+
+    Locations are drawn from a fixed set, so the amount of distinct locations controls the share of requests served
+    from cache.
+
+    :param amount: the amount of requests
+    :param locations: the amount of distinct locations requested
+    :param zip_code_ratio: the share of requests by zip code instead of coordinates
+    :param seed: seeds the choice of locations
+    :return: the paths, with their query strings
+    """
+    generator = random.Random(seed)
+    coordinates = [(round(generator.uniform(-60, 70), 4), round(generator.uniform(-180, 180), 4))
+                   for _ in range(locations)]
+    zip_codes = ['{:05d}'.format(generator.randrange(100000)) for _ in range(locations)]
+
+    paths = []
+    for _ in range(amount):
+        index = generator.randrange(locations)
+        if generator.random() < zip_code_ratio:
+            query = {'zip_code': zip_codes[index]}
+        else:
+            query = {'latitude': coordinates[index][0], 'longitude': coordinates[index][1]}
+        paths.append('/average_temperature?' + urlencode(query))
+    return paths
+
+
+async def run_level(paths: List[str], concurrency: int) -> dict:
+    """
+    Perform the requests with a fixed amount of concurrent clients, each one sending its next request as soon as it
+    gets the response to the previous one
+
+    :param paths: the paths of the requests
+    :param concurrency: the amount of concurrent clients
+    :return: the amount of requests, throughput, latency percentiles (in milliseconds) and status codes
+    """
+    client = AsyncClient(headers={'host': 'localhost'})
+    pending = iter(paths)
+    latencies = []
+    status_codes = Counter()
+
+    async def run_client():
+        for path in pending:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            status_codes[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'duration_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': summarise_latencies(latencies),
+        'status_codes': {str(status): amount for status, amount in sorted(status_codes.items())},
+    }
+
+
+def summarise_latencies(latencies: List[float]) -> Dict[str, float]:
+    """
+    Get the mean, maximum and percentiles of the latencies
+
+    :param latencies: the latencies, in seconds
+    :return: the summary, in milliseconds
+    """
+    if not latencies:
+        return {}
+
+    latencies = sorted(latencies)
+    summary = {'mean': sum(latencies) / len(latencies), 'max': latencies[-1]}
+    for percentile in PERCENTILES:
+        rank = max(0, math.ceil(percentile / 100 * len(latencies)) - 1)
+        summary['p{:g}'.format(percentile)] = latencies[rank]
+    return {name: round(value * 1000, 3) for name, value in summary.items()}
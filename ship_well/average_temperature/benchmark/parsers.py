@@ -0,0 +1,119 @@
+"""
+This module compares, over recorded responses of every temperature source, the time to parse the current temperature
+by decoding the response with the standard library against the fast JSON parsing (see json_parsing.py)
+
+The recorded responses are small, while real ones carry forecasts and the like, so they are also measured grown to
+larger sizes with members the parsers don't read.
+"""
+from contextlib import contextmanager
+import json
+import os
+import timeit
+from typing import Dict, List
+
+from average_temperature.business_logic.sessions import BufferedResponse
+from average_temperature.business_logic.temperature_source import sources
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(__file__), 'payloads')
+
+
+class StandardLibraryResponse(BufferedResponse):
+    """
+    A fully read HTTP response decoded with the standard library, as requests' responses are
+    """
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def load_payloads(payloads_dir: str = PAYLOADS_DIR) -> Dict[str, bytes]:
+    """
+    Load the recorded responses, stored as <source id>.json
+
+    :param payloads_dir: the directory they are stored in
+    :return: source id -> raw response, for every source with a recorded response
+    """
+    payloads = {}
+    for source in WEATHER_SOURCE:
+        path = os.path.join(payloads_dir, '{}.json'.format(source))
+        if os.path.exists(path):
+            with open(path, 'rb') as payload_file:
+                payloads[source] = payload_file.read()
+    return payloads
+
+
+def grow_payload(content: bytes, size: int) -> bytes:
+    """
+    Grow a recorded response up to about a given size, with a forecast the parsers don't read
+
+    :param content: the raw response, a JSON object
+    :param size: the desired size in bytes. Responses already that large are not changed
+    :return: the raw grown response
+    """
+    document = json.loads(content)
+    forecast = []
+    document['forecast'] = forecast
+    grown = json.dumps(document).encode()
+    while len(grown) < size:
+        day = len(forecast)
+        forecast.append({'date': 'Day {}'.format(day), 'text': 'Partly Cloudy', 'code': '30',
+                         'high': {'fahrenheit': '68', 'celsius': '20'}, 'low': {'fahrenheit': '50', 'celsius': '10'}})
+        grown = json.dumps(document).encode()
+    return grown if len(content) < size else content
+
+
+@contextmanager
+def fast_json_parsing(enabled: bool):
+    """
+    Enable or disable the fast JSON parsing of the temperature sources, within the context
+    """
+    original = sources.FAST_JSON_PARSING
+    sources.FAST_JSON_PARSING = enabled
+    try:
+        yield
+    finally:
+        sources.FAST_JSON_PARSING = original
+
+
+def compare_parsers(payloads: Dict[str, bytes], number: int, repeat: int, sizes: List[int] = (0,)) -> Dict[str, list]:
+    """
+    Time both parsers of every source over its recorded response, grown to every given size
+
+    :param payloads: source id -> raw response
+    :param number: the amount of parses of every measure
+    :param repeat: the amount of measures. The fastest one is kept
+    :param sizes: the sizes, in bytes, to grow the responses to. 0 stands for the response as recorded
+    :return: source id -> by size, the parsed temperature, the size of the response and the time of a parse by each
+    parser, in microseconds
+    :raises ValueError if the parsers disagree on the temperature
+    """
+    results = {}
+    for source, content in sorted(payloads.items()):
+        results[source] = [_compare_parsers(WEATHER_SOURCE[source], grow_payload(content, size), number, repeat)
+                           for size in sizes]
+    return results
+
+
+def _compare_parsers(source_class, content: bytes, number: int, repeat: int) -> dict:
+    response = StandardLibraryResponse(200, content)
+
+    timings = {}
+    temperatures = set()
+    for name, enabled in (('full_parse', False), ('fast_parse', True)):
+        with fast_json_parsing(enabled):
+            temperatures.add(source_class._parse_response(response))
+            elapsed = min(timeit.repeat(lambda: source_class._parse_response(response), number=number, repeat=repeat))
+        timings[name] = elapsed / number * 1e6
+
+    if len(temperatures) != 1:
+        raise ValueError('The parsers of {} disagree: {}'.format(source_class.ID, sorted(temperatures)))
+
+    return {
+        'celsius': temperatures.pop(),
+        'bytes': len(content),
+        'full_parse_us': round(timings['full_parse'], 2),
+        'fast_parse_us': round(timings['fast_parse'], 2),
+        'speedup': round(timings['full_parse'] / timings['fast_parse'], 2),
+    }
@@ -0,0 +1,139 @@
+"""
+This module provides an in-process stand-in for the upstream services: the three temperature sources, with the same
+responses as the mock weather API, and Google Maps geocoding API.
+
+The latency of every service follows a log-normal distribution and a share of its requests fail with a 500, both
+configurable. Every request is counted, so the calls each benchmark run costs upstream can be reported.
+"""
+from collections import Counter, namedtuple
+import asyncio
+import random
+
+from aiohttp import web
+
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+
+
+ServiceProfile = namedtuple('ServiceProfile', [
+    'median_latency',  # the median response time, in seconds
+    'latency_sigma',  # the shape of the log-normal distribution of the response time. The larger, the longer the tail
+    'error_rate',  # the share of requests answered with a 500, between 0 and 1
+])
+
+# the paths of every service, as requested by the app
+NOAA_PATH = '/noaa'
+ACCUWEATHER_PATH = '/accuweather'
+WEATHER_DOT_COM_PATH = '/weatherdotcom'
+GOOGLE_MAPS_PATH = '/maps/api/geocode/json'
+
+
+class StandInServer:
+    """
+    An aiohttp server answering as the upstream services, on the running event loop
+    """
+
+    def __init__(self, profiles: dict, default_profile: ServiceProfile, seed: int = None):
+        """
+        :param profiles: the profile of every service, by path
+        :param default_profile: the profile of the services without one
+        :param seed: seeds the latencies and errors, to make runs repeatable
+        """
+        self.profiles = profiles
+        self.default_profile = default_profile
+        self.calls = Counter()  # path -> amount of requests
+        self.errors = Counter()  # path -> amount of requests answered with an error
+        self.url = None
+
+        self._random = random.Random(seed)
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Start listening. By default, on a free port of the loopback interface
+
+        :return: the base URL of the server
+        """
+        app = web.Application()
+        app.router.add_get(NOAA_PATH, self._handle_noaa)
+        app.router.add_get(ACCUWEATHER_PATH, self._handle_accuweather)
+        app.router.add_post(WEATHER_DOT_COM_PATH, self._handle_weather_dot_com)
+        app.router.add_get(GOOGLE_MAPS_PATH, self._handle_google_maps)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        host, port = self._runner.addresses[0][:2]
+        self.url = 'http://{}:{}'.format(host, port)
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def reset_counters(self) -> None:
+        self.calls.clear()
+        self.errors.clear()
+
+    async def _respond(self, path: str, body_factory) -> web.Response:
+        """
+        Wait for the latency of the service, and answer with the body, or with an error
+        """
+        profile = self.profiles.get(path, self.default_profile)
+        self.calls[path] += 1
+        await asyncio.sleep(self._random.lognormvariate(0, profile.latency_sigma) * profile.median_latency)
+
+        if self._random.random() < profile.error_rate:
+            self.errors[path] += 1
+            return web.Response(status=500, text='Internal Server Error')
+        return web.json_response(body_factory())
+
+    def _temperature(self) -> dict:
+        celsius = self._random.randint(-10, 35)
+        return {'fahrenheit': str(round(celsius * 9 / 5 + 32)), 'celsius': str(celsius)}
+
+    async def _handle_noaa(self, request: web.Request) -> web.Response:
+        return await self._respond(NOAA_PATH, lambda: {'today': {'current': self._temperature()}})
+
+    async def _handle_accuweather(self, request: web.Request) -> web.Response:
+        return await self._respond(ACCUWEATHER_PATH, lambda: {
+            'simpleforecast': {'forecastday': [{'current': self._temperature()}]}
+        })
+
+    async def _handle_weather_dot_com(self, request: web.Request) -> web.Response:
+        return await self._respond(WEATHER_DOT_COM_PATH, lambda: {
+            'query': {
+                'count': 1,
+                'results': {
+                    'channel': {
+                        'units': {'temperature': 'F'},
+                        'condition': {'temp': self._temperature()['fahrenheit']},
+                    }
+                }
+            }
+        })
+
+    async def _handle_google_maps(self, request: web.Request) -> web.Response:
+        if 'latlng' in request.query:
+            # reverse geocoding: every location is valid
+            return await self._respond(GOOGLE_MAPS_PATH, lambda: {'status': 'OK', 'results': [{}]})
+
+        # geocoding: the zip code is turned into coordinates
+        zip_code = request.query.get('components', '').rpartition(':')[2]
+        seed = sum(map(ord, zip_code))
+        return await self._respond(GOOGLE_MAPS_PATH, lambda: {
+            'status': 'OK',
+            'results': [{'geometry': {'location': {'lat': seed % 90, 'lng': seed % 180}}}],
+        })
+
+
+async def close_upstream_sessions() -> None:
+    """
+    Close the sessions the app opened to the upstream services from the running event loop
+    """
+    for source_class in WEATHER_SOURCE.values():
+        await source_class.close_async_session()
+    await GoogleApiClient.close_async_session()
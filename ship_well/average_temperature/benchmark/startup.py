@@ -0,0 +1,141 @@
+"""
+This module measures the cold start of the app: how long a fresh process takes to boot it and answer its first request
+to the average_temperature endpoint, and which imports that time goes to.
+
+Every measure runs in a new interpreter (python -m average_temperature.benchmark.startup URL), which reports the time
+of every phase as JSON on stdout:
+ * interpreter: from the process being spawned to the first line of this module running
+ * boot: setting up Django and building the ASGI application, as ship_well/asgi.py does
+ * first_response: the first request, which loads the URL configuration, the views and everything imported lazily
+ * second_response: the same request again, once everything is loaded and the reading is cached
+
+The temperature sources are pointed to the URL given (a stand-in, see the benchmark_startup management command), and
+the geocoding and shared caches to a temporary directory, so the readings of the stand-in don't end up in the caches
+of the host. This module only imports the standard library at the top, so it doesn't add to the measures.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from urllib.parse import urlencode, urljoin
+
+
+PHASES = ('interpreter', 'boot', 'first_response', 'second_response')
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+async def measure_startup(url: str, cwd: str, import_time: bool = False) -> Dict:
+    """
+    Start the app in a new interpreter and measure its startup, without blocking the running event loop
+
+    :param url: the base URL of the stand-in for the temperature sources
+    :param cwd: the directory of the project, where manage.py is
+    :param import_time: whether to run the interpreter with -X importtime, which slows down the imports
+    :return: the milliseconds of every phase, the status code of the first response, and the output of -X importtime
+    if it was asked for
+    :raises RuntimeError if the interpreter failed
+    """
+    arguments = (['-X', 'importtime'] if import_time else []) + ['-m', __name__, url]
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, GEOCODING_CACHE_PATH=os.path.join(directory, 'geocoding_cache.sqlite3'),
+                   SHARED_CACHE_PATH=os.path.join(directory, 'shared_cache.sqlite3'))
+        spawned_at = time.time()
+        process = await asyncio.create_subprocess_exec(sys.executable, *arguments, cwd=cwd, env=env,
+                                                       stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+    if process.returncode:
+        raise RuntimeError('The app failed to start: {}'.format(stderr.decode(errors='replace')))
+
+    result = json.loads(stdout.decode().splitlines()[-1])
+    result['interpreter'] = round((result.pop('started_at') - spawned_at) * 1000, 3)
+    if import_time:
+        result['import_time'] = stderr.decode(errors='replace')
+    return result
+
+
+def summarize_import_times(output: str, top: int) -> List[Dict]:
+    """
+    Get the slowest imports out of the output of -X importtime. Only the modules imported directly are considered, as
+    the time of the modules they import is included in theirs.
+
+    :param output: the output of -X importtime
+    :param top: the amount of imports to report
+    :return: the module, and its own and cumulative milliseconds, of the slowest imports
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match and not match.group(3):
+            imports.append({
+                'module': match.group(4),
+                'self_ms': round(int(match.group(1)) / 1000, 3),
+                'cumulative_ms': round(int(match.group(2)) / 1000, 3),
+            })
+    imports.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return imports[:top]
+
+
+def _request(loop, application, path: str) -> int:
+    """
+    Perform a GET through an ASGI application directly on an event loop, without any socket
+
+    :return: the status code of the response
+    """
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    loop.run_until_complete(application(scope, receive, send))
+    return messages[0]['status']
+
+
+def _main(url: str) -> None:
+    started_at = time.time()
+    started = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ship_well.settings')
+
+    from django.core.asgi import get_asgi_application
+    application = get_asgi_application()
+    booted = time.perf_counter()
+
+    # a location no other run requested, so the reading is not shared by a previous run
+    generator = random.Random()
+    path = '/average_temperature?' + urlencode({'latitude': round(generator.uniform(-60, 70), 4),
+                                                'longitude': round(generator.uniform(-180, 180), 4)})
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    from average_temperature.business_logic.temperature_source.registry import WEATHER_SOURCE
+    for source_class in WEATHER_SOURCE.values():
+        source_class.BASE_URL = urljoin(url, source_class.BASE_URL.rpartition('/')[2])
+    status = _request(loop, application, path)
+    responded = time.perf_counter()
+    _request(loop, application, path)
+    responded_again = time.perf_counter()
+
+    print(json.dumps({
+        'started_at': started_at,
+        'boot': round((booted - started) * 1000, 3),
+        'first_response': round((responded - booted) * 1000, 3),
+        'second_response': round((responded_again - responded) * 1000, 3),
+        'status': status,
+    }))
+
+
+if __name__ == '__main__':
+    _main(sys.argv[1])
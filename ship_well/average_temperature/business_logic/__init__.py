@@ -3,22 +3,46 @@ This module contains all the business logic that supports average_temperature ap
 """
 from .average_temperature import (
     get_average_temperature,
+    get_average_temperature_async,
+    get_average_temperature_detail,
+    get_average_temperature_detail_async,
     get_valid_sources,
 )
 
+from .quorum import AverageTemperature
+
+from .budget import latency_budget
+
+from .fetch import reading_cache
+
+from .fetch_executor import get_fetch_executor
+
+from .prefetch import location_popularity
+
+from .exposition import render_metrics
+
 from .geolocation import (
     validate_coordinates,
+    validate_coordinates_async,
     get_coordinates_from_zip_code,
+    get_coordinates_from_zip_code_async,
 )
 
 from .exceptions import (
     TemperatureAverageException,
     ServiceConnectionError,
+    ServiceNotConfigured,
+    ServiceTimeout,
     ServiceUnexpectedStatusCode,
     ServiceUnexpectedResponse,
+    TemperatureAverageTimeout,
 )
 
 __all__ = [
     get_average_temperature, get_valid_sources, validate_coordinates, get_coordinates_from_zip_code,
-    TemperatureAverageException, ServiceConnectionError, ServiceUnexpectedStatusCode, ServiceUnexpectedResponse,
+    get_average_temperature_async, validate_coordinates_async, get_coordinates_from_zip_code_async,
+    get_average_temperature_detail, get_average_temperature_detail_async, AverageTemperature,
+    get_fetch_executor, reading_cache, location_popularity, render_metrics, latency_budget,
+    TemperatureAverageException, ServiceConnectionError, ServiceNotConfigured, ServiceUnexpectedStatusCode,
+    ServiceUnexpectedResponse, TemperatureAverageTimeout, ServiceTimeout,
 ]
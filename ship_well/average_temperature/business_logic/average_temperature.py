@@ -2,14 +2,32 @@
 This module exposes a single function to get the current temperate as an average from several sources.
 It abstracts all the internals.
 """
-from concurrent import futures
-from typing import List
+import asyncio
+from typing import Dict, List, Tuple
 from statistics import mean
 
-from .temperature_source.sources import WEATHER_SOURCE
-
-
-MAX_CONCURRENT_WORKERS = 20
+from ship_well.settings import (
+    LATENCY_ORIENTED_AVERAGING,
+    AVERAGE_QUORUM,
+    AVERAGE_DEADLINE,
+    HEDGE_PERCENTILE,
+    AGREEMENT_TOLERANCE,
+    AGREEMENT_QUORUM,
+)
+from . import budget
+from .event_loop import fetch_loop
+from .exceptions import TemperatureAverageException
+from .fetch import (
+    fetch_temperature,
+    refetch_temperature,
+    latency_tracker,
+    nearby_readings,
+    reading_cache,
+)
+from .nearby import NearbyReading
+from .quorum import AverageTemperature, QuorumAverage
+from .temperature_source.exceptions import TemperatureSourceUnavailable
+from .temperature_source.registry import WEATHER_SOURCE
 
 
 def get_average_temperature(latitude: float, longitude: float, filter_: List[str] = None) -> float:
@@ -20,6 +38,8 @@ def get_average_temperature(latitude: float, longitude: float, filter_: List[str
     celsius degrees. Sources can be filtered, but note the following:
      - If no filter is provided, all the sources are queried.
      - If a value in the filter doesn't match an existing filter, it's ignored.
+     - A source is not requested if it has a recent reading for a nearby location.
+     - A source is left out while its circuit breaker is open, or when its rate limiter turns the request away.
 
     :param latitude: the desired latitude
     :param longitude: the desired longitude
@@ -28,22 +48,81 @@ def get_average_temperature(latitude: float, longitude: float, filter_: List[str
     :raises WeatherAverageException if any source can't be requested
     :
     """
-    if filter_:
-        desired_sources = {source: source_class
-                           for source, source_class in WEATHER_SOURCE.items()
-                           if source in filter_}
-    else:
-        desired_sources = WEATHER_SOURCE
+    return get_average_temperature_detail(latitude, longitude, filter_).celsius
+
 
-    # Fetch temperature for sources in parallel
-    workers = min(MAX_CONCURRENT_WORKERS, len(desired_sources))
-    with futures.ThreadPoolExecutor(workers) as executor:
-        all_weathers = executor.map(
-            lambda source_class: source_class.get_current_temperature(latitude, longitude),
-            desired_sources.values()
-        )
+async def get_average_temperature_async(latitude: float, longitude: float, filter_: List[str] = None) -> float:
+    """
+    Retrieve current temperature as an average from several sources, without blocking the running event loop
 
-    return mean(all_weathers)
+    This is the asynchronous counterpart of get_average_temperature: all the sources are requested concurrently on
+    the running event loop, so no thread is held while waiting for them.
+
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :param filter_: source filters, by name
+    :return: the average current temperature
+    :raises WeatherAverageException if any source can't be requested
+    """
+    return (await get_average_temperature_detail_async(latitude, longitude, filter_)).celsius
+
+
+def get_average_temperature_detail(latitude: float, longitude: float, filter_: List[str] = None,
+                                   latency_oriented: bool = LATENCY_ORIENTED_AVERAGING,
+                                   agreement_tolerance: float = AGREEMENT_TOLERANCE) -> AverageTemperature:
+    """
+    Retrieve current temperature as an average from several sources, along with the sources it was computed from
+
+    By default, every source must answer. In latency oriented mode, the average is returned as soon as a quorum of
+    sources answered or the deadline expired, failing sources are left out, and slow sources are hedged. With an
+    agreement tolerance, the average is returned as soon as AGREEMENT_QUORUM readings agree within it, from those
+    readings only, and failing sources are left out as well. In every mode, the sources with a recent reading within
+    NEARBY_READING_RADIUS are not requested, and the ones whose circuit breaker is open or whose rate limiter turns
+    the request away are left out.
+
+    Nothing waits longer than the latency budget of the request (see budget.py). Once it runs out, the average is
+    computed from the sources that answered in latency oriented mode or with an agreement tolerance, and
+    ServiceTimeout is raised otherwise.
+
+    The sources are requested on the fetch loop (see event_loop.py).
+
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :param filter_: source filters, by name
+    :param latency_oriented: whether to use the latency oriented mode
+    :param agreement_tolerance: the most celsius degrees the readings may differ by to return early, or None to never
+    return early on agreement
+    :return: the average current temperature, the sources that contributed to it, the distance to the nearby
+    readings and how long the readings stay fresh
+    :raises WeatherAverageException if the average can't be computed
+    """
+    return fetch_loop.run(_get_average_temperature_detail(latitude, longitude, filter_, latency_oriented,
+                                                          agreement_tolerance))
+
+
+async def get_average_temperature_detail_async(
+        latitude: float, longitude: float, filter_: List[str] = None,
+        latency_oriented: bool = LATENCY_ORIENTED_AVERAGING,
+        agreement_tolerance: float = AGREEMENT_TOLERANCE) -> AverageTemperature:
+    """
+    Retrieve current temperature as an average from several sources, along with the sources it was computed from,
+    without blocking the running event loop
+
+    This is the asynchronous counterpart of get_average_temperature_detail: the sources are requested on the fetch
+    loop (see event_loop.py), and awaited from the running one.
+
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :param filter_: source filters, by name
+    :param latency_oriented: whether to use the latency oriented mode
+    :param agreement_tolerance: the most celsius degrees the readings may differ by to return early, or None to never
+    return early on agreement
+    :return: the average current temperature, the sources that contributed to it, the distance to the nearby
+    readings and how long the readings stay fresh
+    :raises WeatherAverageException if the average can't be computed
+    """
+    return await fetch_loop.call(_get_average_temperature_detail(latitude, longitude, filter_, latency_oriented,
+                                                                 agreement_tolerance))
 
 
 def get_valid_sources() -> List[str]:
@@ -52,3 +131,178 @@ def get_valid_sources() -> List[str]:
     :return: a list of valid source names
     """
     return WEATHER_SOURCE.keys()
+
+
+async def _get_average_temperature_detail(latitude: float, longitude: float, filter_: List[str],
+                                          latency_oriented: bool, agreement_tolerance: float) -> AverageTemperature:
+    """
+    Compute the average of get_average_temperature_detail_async on the running event loop
+    """
+    nearby, sources_to_request = _split_sources(_get_desired_sources(filter_), latitude, longitude)
+
+    if not latency_oriented and agreement_tolerance is None:
+        all_weathers = await asyncio.gather(*[
+            _fetch_temperature_unless_unavailable(source_class, latitude, longitude)
+            for source_class in sources_to_request.values()
+        ])
+        readings = {source: reading.celsius for source, reading in nearby.items()}
+        readings.update((source, temperature)
+                        for source, temperature in zip(sources_to_request, all_weathers)
+                        if temperature is not None)
+        return _get_average(readings, nearby, latitude, longitude)
+
+    average = _get_quorum_average(nearby, sources_to_request, latency_oriented, agreement_tolerance)
+    requests = {_run_in_background(fetch_temperature(source_class, latitude, longitude)): source_class
+                for source_class in sources_to_request.values()}
+
+    while not average.is_done() and requests:
+        done, _ = await asyncio.wait(requests, timeout=average.timeout(), return_when=asyncio.FIRST_COMPLETED)
+        for request in done:
+            source_class = requests.pop(request)
+            try:
+                average.add_reading(source_class.ID, request.result())
+            except TemperatureAverageException as exc:
+                average.add_error(source_class.ID, exc)
+
+        for source_id in average.sources_to_hedge():
+            source_class = sources_to_request[source_id]
+            requests[_run_in_background(refetch_temperature(source_class, latitude, longitude))] = source_class
+
+    # the requests still in flight are not waited for, they will fill the cache
+    result = average.result()
+    return result._replace(distance_km=_get_distance(nearby),
+                           max_age=_get_max_age(result.sources, nearby, latitude, longitude))
+
+
+def _get_desired_sources(filter_: List[str] = None) -> Dict[str, type]:
+    """
+    Get the sources to request, by name
+
+    :param filter_: source filters, by name
+    :return: the desired source classes, by name
+    """
+    if filter_:
+        return {source: source_class
+                for source, source_class in WEATHER_SOURCE.items()
+                if source in filter_}
+    else:
+        return WEATHER_SOURCE
+
+
+def _split_sources(desired_sources: Dict[str, type], latitude: float,
+                   longitude: float) -> Tuple[Dict[str, NearbyReading], Dict[str, type]]:
+    """
+    Split the desired sources into the ones with a recent reading nearby, which are not requested, and the ones to
+    request
+
+    :param desired_sources: the desired source classes, by name
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: the nearby readings by source name, and the source classes to request by name
+    :raises TemperatureSourceUnavailable if there's no nearby reading and no source can be requested
+    """
+    nearby = {}
+    for source in desired_sources:
+        reading = nearby_readings.nearest(source, latitude, longitude)
+        if reading is not None:
+            nearby[source] = reading
+
+    sources_to_request = {source: source_class
+                          for source, source_class in desired_sources.items()
+                          if source not in nearby}
+    return nearby, _get_available_sources(sources_to_request, required=not nearby)
+
+
+def _get_available_sources(desired_sources: Dict[str, type], required: bool = True) -> Dict[str, type]:
+    """
+    Leave out the sources whose circuit breaker is open
+
+    :param desired_sources: the desired source classes, by name
+    :param required: whether at least one of them must be available
+    :return: the source classes that can be requested, by name
+    :raises TemperatureSourceUnavailable if no source can be requested, and one is required
+    """
+    available_sources = {source: source_class
+                         for source, source_class in desired_sources.items()
+                         if not source_class.circuit_breaker.is_open()}
+    if required and desired_sources and not available_sources:
+        raise TemperatureSourceUnavailable('All the sources are unavailable: {}'.format(', '.join(desired_sources)))
+    return available_sources
+
+
+async def _fetch_temperature_unless_unavailable(source_class, latitude: float, longitude: float) -> float:
+    """
+    Fetch the current temperature from a source, or get None if it's not requested: its circuit breaker opened in the
+    meantime, or its rate limiter turned the request away
+    """
+    try:
+        return await fetch_temperature(source_class, latitude, longitude)
+    except TemperatureSourceUnavailable:
+        return None
+
+
+def _get_average(readings: Dict[str, float], nearby: Dict[str, NearbyReading], latitude: float,
+                 longitude: float) -> AverageTemperature:
+    """
+    Average the readings of the sources that answered, or had a reading nearby
+
+    :raises TemperatureSourceUnavailable if there are no readings
+    """
+    if not readings:
+        raise TemperatureSourceUnavailable('All the sources are unavailable')
+    return AverageTemperature(mean(readings.values()), sorted(readings), _get_distance(nearby),
+                              _get_max_age(readings, nearby, latitude, longitude))
+
+
+def _get_distance(nearby: Dict[str, NearbyReading]) -> float:
+    """
+    Get the distance to the farthest nearby reading, or 0 if there are none
+    """
+    return max((reading.distance_km for reading in nearby.values()), default=0.)
+
+
+def _get_max_age(sources: List[str], nearby: Dict[str, NearbyReading], latitude: float, longitude: float) -> float:
+    """
+    Get the seconds until the first of the readings of the given sources is no longer fresh: either it expires from
+    the readings cache, or it's too old to be reused nearby
+    """
+    max_ages = []
+    for source in sources:
+        if source in nearby:
+            max_ages.append(nearby_readings.max_age - nearby[source].age)
+        else:
+            age = reading_cache.get_reading_age(source, latitude, longitude)
+            max_ages.append(0. if age is None else reading_cache.ttl - age)
+    return max(0., min(max_ages, default=0.))
+
+
+def _get_quorum_average(nearby: Dict[str, NearbyReading], sources_to_request: Dict[str, type],
+                        latency_oriented: bool, agreement_tolerance: float) -> QuorumAverage:
+    """
+    Build the quorum, accounting the nearby readings right away. In latency oriented mode, every requested source is
+    hedged after its observed latency percentile, and the deadline is AVERAGE_DEADLINE. Otherwise, only the latency
+    budget of the request bounds the wait, which the deadline is clipped to anyway. With an agreement tolerance, the
+    quorum is AGREEMENT_QUORUM readings that agree within it.
+    """
+    if latency_oriented:
+        hedge_delays = {source_id: latency_tracker.percentile(source_id, HEDGE_PERCENTILE)
+                        for source_id in sources_to_request}
+        deadline = AVERAGE_DEADLINE
+    else:
+        hedge_delays = None
+        deadline = None
+    quorum = AGREEMENT_QUORUM if agreement_tolerance is not None else AVERAGE_QUORUM
+    average = QuorumAverage(list(nearby) + list(sources_to_request), quorum, budget.bound(deadline), hedge_delays,
+                            agreement_tolerance)
+    for source_id, reading in nearby.items():
+        average.add_reading(source_id, reading.celsius)
+    return average
+
+
+def _run_in_background(coroutine) -> asyncio.Task:
+    """
+    Schedule a coroutine whose result may never be awaited
+    """
+    task = asyncio.ensure_future(coroutine)
+    task.add_done_callback(lambda done_task: done_task.cancelled() or done_task.exception())
+    return task
@@ -0,0 +1,77 @@
+"""
+This module holds the latency budget of the request being served: a deadline set once, when the request arrives, that
+bounds everything done on its behalf.
+
+Every upstream call (Google Maps API and the sources) only gets the part of the budget that is left as its timeout, and
+so do the waits for a turn of the rate limiters, for another worker filling the shared cache and for a request in
+flight. Once the budget runs out, no more upstream calls are performed for the request.
+
+The budget is carried by a context variable, so it follows the request into the coroutines and tasks it starts, and
+into the fetch loop and the fetch executor, which run everything in the context it was submitted from. Work that must
+outlive the request, like background refreshes, is started with no budget.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Tuple
+
+
+_deadline = ContextVar('deadline', default=None)  # the monotonic time the budget runs out at, or None if there's none
+
+
+@contextmanager
+def latency_budget(seconds: float):
+    """
+    Bound everything done within the context to a given amount of time
+
+    :param seconds: the budget, or None to lift any budget
+    :return: a context manager
+    """
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float:
+    """
+    Get the seconds left of the current budget
+
+    :return: the seconds left, 0 if it ran out, or None if there's no budget
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0., deadline - time.monotonic())
+
+
+def expired() -> bool:
+    """
+    Tell whether the current budget ran out
+    """
+    return remaining() == 0.
+
+
+def bound(seconds: float) -> float:
+    """
+    Clip a timeout to the current budget
+
+    :param seconds: the timeout, or None for no timeout
+    :return: the clipped timeout, or None if there's neither a timeout nor a budget
+    """
+    left = remaining()
+    if left is None:
+        return seconds
+    if seconds is None:
+        return left
+    return min(seconds, left)
+
+
+def bound_timeouts(connect_timeout: float, read_timeout: float) -> Tuple[float, float]:
+    """
+    Clip the timeouts of an HTTP request to the current budget
+
+    :return: the connect and read timeouts
+    """
+    return bound(connect_timeout), bound(read_timeout)
@@ -0,0 +1,215 @@
+"""
+This module provides the in-memory caches used to avoid requesting the upstream services over and over
+"""
+from collections import namedtuple, OrderedDict
+import math
+import threading
+import time
+from typing import Hashable, Tuple
+
+
+CacheStats = namedtuple('CacheStats', [
+    'hits',  # amount of lookups that found a fresh entry
+    'misses',  # amount of lookups that found no entry, or an expired one
+    'evictions',  # amount of entries dropped to make room for newer ones
+    'expirations',  # amount of entries dropped because they outlived the TTL and the grace period
+    'stale_hits',  # amount of lookups that accepted a stale entry, within the grace period
+    'size',  # amount of entries currently stored
+])
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded, least recently used cache whose entries optionally expire after a TTL
+
+    Expired entries can be kept for a grace period, during which they are stale: get ignores them, but get_stale still
+    returns them.
+    """
+    MISSING = object()  # returned by get when there's no fresh entry, so None can be cached
+
+    def __init__(self, max_entries: int, ttl: float = None, grace: float = 0):
+        """
+        :param max_entries: the maximum amount of entries. When full, the least recently used one is evicted
+        :param ttl: seconds an entry is considered fresh, or None if entries never expire
+        :param grace: seconds an entry is kept as stale once it outlived the TTL
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.grace = grace
+
+        self._entries = OrderedDict()  # key -> (value, stored_at), from least to most recently used
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._stale_hits = 0
+
+    def get(self, key: Hashable):
+        """
+        Get a fresh value from the cache
+
+        :param key: the entry's key
+        :return: the cached value, or LRUCache.MISSING if there's no fresh value for the key
+        """
+        value, _ = self._get(key, accept_stale=False)
+        return value
+
+    def get_stale(self, key: Hashable) -> Tuple[object, bool]:
+        """
+        Get a value from the cache, even if it's stale
+
+        :param key: the entry's key
+        :return: the cached value, or LRUCache.MISSING if there's no fresh nor stale value for the key, and whether it
+        is fresh
+        """
+        return self._get(key, accept_stale=True)
+
+    def put(self, key: Hashable, value, age: float = 0) -> None:
+        """
+        Store a value in the cache, evicting the least recently used entry if it is full
+
+        :param key: the entry's key
+        :param value: the value to store
+        :param age: seconds since the value was obtained, if it was obtained before
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() - age)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def age(self, key: Hashable) -> float:
+        """
+        Get how long ago an entry was stored, without accounting it as a lookup
+
+        :param key: the entry's key
+        :return: the entry's age in seconds, or None if there's no entry for the key
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else time.monotonic() - entry[1]
+
+    def clear(self) -> None:
+        """
+        Drop all the entries and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = self._expirations = self._stale_hits = 0
+
+    def stats(self) -> CacheStats:
+        """
+        Get a snapshot of the cache counters
+
+        :return: the cache stats
+        """
+        with self._lock:
+            return CacheStats(hits=self._hits,
+                              misses=self._misses,
+                              evictions=self._evictions,
+                              expirations=self._expirations,
+                              stale_hits=self._stale_hits,
+                              size=len(self._entries))
+
+    def _get(self, key: Hashable, accept_stale: bool) -> Tuple[object, bool]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if self.ttl is None or age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value, True
+
+                if age < self.ttl + self.grace:
+                    if accept_stale:
+                        self._entries.move_to_end(key)
+                        self._stale_hits += 1
+                        return value, False
+                else:
+                    del self._entries[key]
+                    self._expirations += 1
+
+            self._misses += 1
+            return self.MISSING, False
+
+
+class ReadingCache(LRUCache):
+    """
+    Caches the current temperature read from every source, by location
+
+    Locations are quantised to a grid, so that near enough coordinates share the same readings. Readings are kept per
+    source, so any subset of sources can be served from them.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, grid_size: float, grace: float = 0):
+        """
+        :param max_entries: the maximum amount of readings
+        :param ttl: seconds a reading is considered fresh
+        :param grid_size: the side of a grid cell, in degrees
+        :param grace: seconds a reading is kept as stale once it outlived the TTL
+        """
+        super().__init__(max_entries, ttl, grace)
+        self.grid_size = grid_size
+
+    def location_key(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """
+        Get the grid cell a location belongs to
+
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: the cell's indexes
+        """
+        return math.floor(latitude / self.grid_size), math.floor(longitude / self.grid_size)
+
+    def get_reading(self, source_id: str, latitude: float, longitude: float) -> float:
+        """
+        Get a fresh reading of a source near the given location
+
+        :param source_id: the source's identifier
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: the current temperature in celsius degrees, or None if there's no fresh reading
+        """
+        reading = self.get((source_id, self.location_key(latitude, longitude)))
+        return None if reading is self.MISSING else reading
+
+    def get_stale_reading(self, source_id: str, latitude: float, longitude: float) -> Tuple[float, bool]:
+        """
+        Get a fresh or stale reading of a source near the given location
+
+        :param source_id: the source's identifier
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: the current temperature in celsius degrees, or None if there's no fresh nor stale reading, and
+        whether it is fresh
+        """
+        reading, is_fresh = self.get_stale((source_id, self.location_key(latitude, longitude)))
+        return (None, False) if reading is self.MISSING else (reading, is_fresh)
+
+    def put_reading(self, source_id: str, latitude: float, longitude: float, temperature: float,
+                    age: float = 0) -> None:
+        """
+        Store the reading of a source at a given location
+
+        :param source_id: the source's identifier
+        :param latitude: the reading's latitude
+        :param longitude: the reading's longitude
+        :param temperature: the current temperature in celsius degrees
+        :param age: seconds since the reading was taken, if it was taken before
+        """
+        self.put((source_id, self.location_key(latitude, longitude)), temperature, age)
+
+    def get_reading_age(self, source_id: str, latitude: float, longitude: float) -> float:
+        """
+        Get how long ago the reading of a source near the given location was stored
+
+        :param source_id: the source's identifier
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: the reading's age in seconds, or None if there's no reading
+        """
+        return self.age((source_id, self.location_key(latitude, longitude)))
@@ -0,0 +1,167 @@
+"""
+This module provides circuit breakers, to stop requesting an upstream service while it's failing
+
+A breaker is closed while the service is healthy, and every request is let through. Once too many of the recent
+requests failed, or were too slow, it opens and rejects every request, so callers fail fast instead of waiting for
+timeouts. After a while it becomes half-open: a few probe requests are let through, and depending on their outcome
+the breaker closes or opens again.
+"""
+from collections import deque, namedtuple
+import threading
+import time
+
+
+CircuitBreakerStats = namedtuple('CircuitBreakerStats', [
+    'state',  # the current state: closed, open or half-open
+    'failure_rate',  # the rate of failed requests in the window
+    'slow_request_rate',  # the rate of slow requests in the window
+    'rejected',  # amount of requests rejected since the breaker was created
+    'opened',  # amount of times the breaker opened since it was created
+])
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker, whose failure and slowness rates are computed over a window of recent requests
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, window: int, min_requests: int, failure_rate: float, slow_request_duration: float,
+                 slow_request_rate: float, open_duration: float, probes: int):
+        """
+        :param window: the amount of recent requests the rates are computed over
+        :param min_requests: the amount of requests in the window needed to open the breaker
+        :param failure_rate: the rate of failed requests that opens the breaker
+        :param slow_request_duration: seconds after which a successful request is considered slow
+        :param slow_request_rate: the rate of slow requests that opens the breaker
+        :param open_duration: seconds the breaker stays open before letting probes through
+        :param probes: the amount of successful probes needed to close the breaker
+        """
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.slow_request_duration = slow_request_duration
+        self.slow_request_rate = slow_request_rate
+        self.open_duration = open_duration
+        self.probes = probes
+
+        self._outcomes = deque(maxlen=window)  # (failed, slow) of the recent requests
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+        self._rejected = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._get_state()
+
+    def is_open(self) -> bool:
+        """
+        Tell whether a request would be rejected right now
+        """
+        with self._lock:
+            state = self._get_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._probes_in_flight >= self.probes)
+
+    def allow_request(self) -> bool:
+        """
+        Ask for permission to perform a request. Every allowed request must be followed by a call to record_success,
+        record_failure or release.
+
+        :return: whether the request can be performed
+        """
+        with self._lock:
+            state = self._get_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes_in_flight < self.probes:
+                self._probes_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, duration: float) -> None:
+        """
+        Account a request that succeeded
+
+        :param duration: the request's duration, in seconds
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.probes:
+                    self._close()
+            elif self._state == self.CLOSED:
+                self._outcomes.append((False, duration >= self.slow_request_duration))
+                self._trip_if_unhealthy()
+
+    def record_failure(self) -> None:
+        """
+        Account a request that failed
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._open()
+            elif self._state == self.CLOSED:
+                self._outcomes.append((True, False))
+                self._trip_if_unhealthy()
+
+    def release(self) -> None:
+        """
+        Account a request that ended without telling anything about the service's health, e.g. it was cancelled
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def reset(self) -> None:
+        """
+        Close the breaker and forget the recent requests
+        """
+        with self._lock:
+            self._close()
+
+    def stats(self) -> CircuitBreakerStats:
+        with self._lock:
+            failure_rate, slow_request_rate = self._get_rates()
+            return CircuitBreakerStats(state=self._get_state(), failure_rate=failure_rate,
+                                       slow_request_rate=slow_request_rate, rejected=self._rejected,
+                                       opened=self._opened)
+
+    def _get_state(self) -> str:
+        # an open breaker becomes half-open once open_duration elapsed
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probes_succeeded = 0
+        return self._state
+
+    def _get_rates(self):
+        if not self._outcomes:
+            return 0., 0.
+        failures = sum(failed for failed, _ in self._outcomes)
+        slow_requests = sum(slow for _, slow in self._outcomes)
+        return failures / len(self._outcomes), slow_requests / len(self._outcomes)
+
+    def _trip_if_unhealthy(self) -> None:
+        if len(self._outcomes) < self.min_requests:
+            return
+        failure_rate, slow_request_rate = self._get_rates()
+        if failure_rate >= self.failure_rate or slow_request_rate >= self.slow_request_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._opened += 1
+
+    def _close(self) -> None:
+        self._state = self.CLOSED
+        self._outcomes.clear()
@@ -0,0 +1,116 @@
+"""
+This module provides the process-wide event loop the fetch layer runs on, in a background thread.
+
+The upstream requests are performed asynchronously (see fetch.py), and every entry point of the business logic runs
+them on this loop: the blocking ones wait for their result, and the asynchronous ones await it from the loop of the
+caller. So there's a single implementation of every lookup, and the work that outlives a request (background
+refreshes, keep-alive connections, requests in flight shared by concurrent lookups) is not tied to the loop of the
+caller, which may be as short-lived as the request: under WSGI, Django runs every asynchronous view on a new loop.
+
+Every coroutine runs in a copy of the context it was submitted from, as the latency budget of the request (see
+budget.py) must bound it as well.
+
+The loop is started on first use, and again in a forked process, as threads don't survive a fork.
+"""
+import asyncio
+from concurrent import futures
+import os
+import threading
+
+
+class BackgroundEventLoop:
+    """
+    An event loop running forever on a daemon thread, which any thread can run coroutines on
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: the name of the thread running the loop
+        """
+        self.name = name
+
+        self._loop = None
+        self._thread = None
+        self._pid = None  # the process that started the loop
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Get the loop, starting it on the first call in this process
+
+        :return: the running event loop
+        """
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid():
+            return loop
+
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coroutine) -> futures.Future:
+        """
+        Run a coroutine on the loop, without waiting for it
+
+        :param coroutine: the coroutine to run
+        :return: the Future of its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.get_loop())
+
+    async def call(self, coroutine):
+        """
+        Await a coroutine on the loop from any event loop. Cancelling the caller cancels the coroutine.
+
+        :param coroutine: the coroutine to await
+        :return: its result
+        :raises the coroutine's exception
+        """
+        if threading.current_thread() is self._thread:
+            return await coroutine
+        return await asyncio.wrap_future(self.submit(coroutine))
+
+    def run(self, coroutine):
+        """
+        Run a coroutine on the loop, and wait for it
+
+        :param coroutine: the coroutine to run
+        :return: its result
+        :raises the coroutine's exception, or RuntimeError if called from the loop itself, which would never get to run
+        it
+        """
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError('The {} event loop cannot block waiting for itself'.format(self.name))
+        return self.submit(coroutine).result()
+
+    def stop(self) -> None:
+        """
+        Cancel the tasks still running on the loop and stop it. It's started again if used afterwards
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            started_here = loop is not None and self._pid == os.getpid()
+            self._loop = self._thread = self._pid = None
+
+        if started_here:
+            asyncio.run_coroutine_threadsafe(_cancel_tasks(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+async def _cancel_tasks() -> None:
+    """
+    Cancel every other task of the running loop, and wait for them to finish
+    """
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+fetch_loop = BackgroundEventLoop('fetch-loop')
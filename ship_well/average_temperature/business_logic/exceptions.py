@@ -14,6 +14,27 @@ class ServiceConnectionError(TemperatureAverageException):
     pass
 
 
+class ServiceRateLimited(TemperatureAverageException):
+    """
+    This exception is raised when a request to an underlying service waited for too long for its turn
+    """
+    pass
+
+
+class ServiceTimeout(TemperatureAverageException):
+    """
+    This exception is raised when the latency budget of the request ran out before an underlying service answered
+    """
+    pass
+
+
+class ServiceNotConfigured(TemperatureAverageException):
+    """
+    This exception is raised when an underlying service is needed, but it's not configured
+    """
+    pass
+
+
 class ServiceUnexpectedResponse(TemperatureAverageException):
     def __init__(self, response, error_description):
         self.response = response
@@ -24,5 +45,13 @@ class ServiceUnexpectedResponse(TemperatureAverageException):
 
 
 class ServiceUnexpectedStatusCode(ServiceUnexpectedResponse):
-    def __init__(self, response):
+    def __init__(self, response, status_code: int = None):
         super().__init__(response, 'Unexpected status code')
+        self.status_code = status_code
+
+
+class TemperatureAverageTimeout(TemperatureAverageException):
+    """
+    This exception is raised when no source answered in time
+    """
+    pass
@@ -0,0 +1,188 @@
+"""
+This module renders the metrics of the app in Prometheus text format
+
+Besides the metrics of the requests to the upstream services (see metrics.py), it reports the state of the caches,
+the cache shared with the other workers, the index of nearby readings, the fetch executor, the coalesced requests,
+the circuit breakers, the rate limiters and the prefetch scheduler, all of them read when rendering so they add
+nothing to the hot path.
+
+Format: https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+from typing import Dict, List
+
+from .circuit_breaker import CircuitBreaker
+from .fetch import reading_cache, nearby_readings, in_flight
+from .fetch_executor import get_fetch_executor
+from .geolocation import geocoding_cache
+from .metrics import upstream_metrics
+from .prefetch import prefetch_scheduler
+from .shared_cache import shared_cache
+from .temperature_source.registry import WEATHER_SOURCE
+
+
+PREFIX = 'shipwell_'
+
+
+class _MetricsWriter:
+    """
+    Accumulates the lines of the exposition
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name: str, metric_type: str, description: str, samples: List[tuple]) -> None:
+        """
+        Write a metric
+
+        :param name: the metric name, without prefix
+        :param metric_type: counter, gauge or histogram
+        :param description: the help text
+        :param samples: (labels, value) of every sample, or (suffix, labels, value) to add a suffix to the name
+        """
+        name = PREFIX + name
+        self.lines.append('# HELP {} {}'.format(name, description))
+        self.lines.append('# TYPE {} {}'.format(name, metric_type))
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ('',) + sample
+            self.lines.append('{}{}{} {}'.format(name, suffix, _format_labels(labels), _format_value(value)))
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+def render_metrics() -> str:
+    """
+    Render all the metrics of the app
+
+    :return: the exposition, in Prometheus text format
+    """
+    writer = _MetricsWriter()
+    _write_upstream_metrics(writer)
+    _write_circuit_breakers(writer)
+    _write_rate_limiters(writer)
+    _write_cache(writer, 'reading_cache', 'temperature readings', reading_cache.stats())
+    _write_cache(writer, 'geocoding_cache', 'zip code coordinates kept in memory', geocoding_cache.stats())
+    _write_shared_cache(writer)
+    _write_nearby_readings(writer)
+    _write_fetch_executor(writer)
+    _write_single_flight(writer)
+    _write_prefetch(writer)
+    return writer.render()
+
+
+def _write_upstream_metrics(writer: _MetricsWriter) -> None:
+    snapshot = upstream_metrics.snapshot()
+
+    samples = []
+    for service, histogram in sorted(snapshot.durations.items()):
+        cumulative = 0
+        for upper_bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            samples.append(('_bucket', {'service': service, 'le': upper_bound}, cumulative))
+        samples.append(('_sum', {'service': service}, histogram.sum))
+        samples.append(('_count', {'service': service}, histogram.count))
+    writer.metric('upstream_request_duration_seconds', 'histogram',
+                  'Duration of the requests to the upstream services', samples)
+
+    writer.metric('upstream_request_errors_total', 'counter', 'Failed requests to the upstream services',
+                  [({'service': service, 'exception': exception}, amount)
+                   for (service, exception), amount in sorted(snapshot.errors.items())])
+    writer.metric('upstream_requests_in_flight', 'gauge', 'Requests to the upstream services in flight',
+                  [({'service': service}, amount) for service, amount in sorted(snapshot.in_flight.items())])
+
+
+def _write_circuit_breakers(writer: _MetricsWriter) -> None:
+    stats = {source: source_class.circuit_breaker.stats() for source, source_class in sorted(WEATHER_SOURCE.items())}
+    states = (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+    writer.metric('circuit_breaker_state', 'gauge', 'Current state of the circuit breaker of every source',
+                  [({'source': source, 'state': state}, int(source_stats.state == state))
+                   for source, source_stats in stats.items() for state in states])
+    writer.metric('circuit_breaker_failure_rate', 'gauge', 'Rate of failed requests in the circuit breaker window',
+                  [({'source': source}, source_stats.failure_rate) for source, source_stats in stats.items()])
+    writer.metric('circuit_breaker_rejected_total', 'counter', 'Requests rejected by the circuit breaker',
+                  [({'source': source}, source_stats.rejected) for source, source_stats in stats.items()])
+    writer.metric('circuit_breaker_opened_total', 'counter', 'Times the circuit breaker opened',
+                  [({'source': source}, source_stats.opened) for source, source_stats in stats.items()])
+
+
+def _write_rate_limiters(writer: _MetricsWriter) -> None:
+    stats = {source: source_class.rate_limiter.stats() for source, source_class in sorted(WEATHER_SOURCE.items())}
+    writer.metric('rate_limiter_admitted_total', 'counter', 'Requests let through by the rate limiter',
+                  [({'source': source}, source_stats.admitted) for source, source_stats in stats.items()])
+    writer.metric('rate_limiter_queued_total', 'counter', 'Requests that waited for their turn in the rate limiter',
+                  [({'source': source}, source_stats.queued) for source, source_stats in stats.items()])
+    writer.metric('rate_limiter_rejected_total', 'counter', 'Requests rejected after waiting too long for their turn',
+                  [({'source': source}, source_stats.rejected) for source, source_stats in stats.items()])
+    writer.metric('rate_limiter_concurrency_limit', 'gauge', 'Current adaptive limit of concurrent requests',
+                  [({'source': source}, source_stats.concurrency_limit) for source, source_stats in stats.items()])
+    writer.metric('rate_limiter_in_flight', 'gauge', 'Requests let through by the rate limiter in flight',
+                  [({'source': source}, source_stats.in_flight) for source, source_stats in stats.items()])
+
+
+def _write_cache(writer: _MetricsWriter, name: str, description: str, stats) -> None:
+    for counter in ('hits', 'misses', 'stale_hits', 'evictions', 'expirations'):
+        writer.metric('{}_{}_total'.format(name, counter), 'counter',
+                      'Cache {} of the {}'.format(counter.replace('_', ' '), description),
+                      [({}, getattr(stats, counter))])
+    writer.metric('{}_size'.format(name), 'gauge', 'Amount of {}'.format(description), [({}, stats.size)])
+
+
+def _write_shared_cache(writer: _MetricsWriter) -> None:
+    stats = shared_cache.stats()
+    writer.metric('shared_cache_hits_total', 'counter', 'Lookups answered by a value computed by another worker',
+                  [({}, stats.hits)])
+    writer.metric('shared_cache_fills_total', 'counter', 'Values computed by this worker on behalf of all of them',
+                  [({}, stats.fills)])
+    writer.metric('shared_cache_waits_total', 'counter', 'Lookups that waited for another worker computing the value',
+                  [({}, stats.waits)])
+    writer.metric('shared_cache_timeouts_total', 'counter',
+                  'Waits for another worker that timed out, and computed the value anyway', [({}, stats.timeouts)])
+
+
+def _write_nearby_readings(writer: _MetricsWriter) -> None:
+    stats = nearby_readings.stats()
+    writer.metric('nearby_readings_hits_total', 'counter', 'Lookups answered by a recent reading of a nearby location',
+                  [({}, stats.hits)])
+    writer.metric('nearby_readings_misses_total', 'counter', 'Lookups with no recent reading of a nearby location',
+                  [({}, stats.misses)])
+    writer.metric('nearby_readings_size', 'gauge', 'Amount of recent readings indexed by location', [({}, stats.size)])
+
+
+def _write_fetch_executor(writer: _MetricsWriter) -> None:
+    stats = get_fetch_executor().stats()
+    writer.metric('fetch_executor_workers', 'gauge', 'Alive threads of the fetch executor', [({}, stats.workers)])
+    writer.metric('fetch_executor_busy_workers', 'gauge', 'Threads of the fetch executor running a task',
+                  [({}, stats.busy_workers)])
+    writer.metric('fetch_executor_queue_depth', 'gauge', 'Tasks waiting for a thread of the fetch executor',
+                  [({}, stats.queue_depth)])
+
+
+def _write_single_flight(writer: _MetricsWriter) -> None:
+    stats = in_flight.stats()
+    writer.metric('source_requests_total', 'counter', 'Requests actually performed to the sources',
+                  [({}, stats.executions)])
+    writer.metric('source_requests_coalesced_total', 'counter', 'Lookups that joined a request already in flight',
+                  [({}, stats.coalesced)])
+
+
+def _write_prefetch(writer: _MetricsWriter) -> None:
+    stats = prefetch_scheduler.stats()
+    writer.metric('prefetch_refreshes_total', 'counter', 'Readings of popular locations refreshed ahead of expiration',
+                  [({}, stats.refreshes)])
+    writer.metric('prefetch_skipped_total', 'counter',
+                  'Readings of popular locations not refreshed for lack of budget', [({}, stats.skipped)])
+
+
+def _format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels.items()) + '}'
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
@@ -0,0 +1,251 @@
+"""
+This module is the fetch layer: it retrieves the current temperature from a single source, serving it from the
+readings cache when possible.
+
+It's asynchronous only: the blocking entry points of the business logic run it on the fetch loop (see event_loop.py).
+
+Stale readings (see READING_CACHE_STALE_GRACE) are served as well, and a refresh is requested in the background, so
+only the lookups with no reading at all wait for the source. There's at most one refresh in flight per source and
+location.
+
+Concurrent lookups of the same source and location share a single upstream request, so a burst of identical lookups
+results in one call to the source. The shared request runs with no latency budget, and every lookup waits for it as
+long as its own budget lasts. The latency of every upstream request is recorded.
+
+Every reading is also indexed by location (see nearby.py), so it can answer the requests for nearby locations.
+
+Readings are shared with the other worker processes of the host (see shared_cache.py). Before requesting a source, a
+fresh reading taken by another worker is adopted, and while another worker requests the same source and location,
+this one waits for its reading.
+
+Every upstream request goes through the circuit breaker of its source: while it is open, the source is not requested
+and TemperatureSourceUnavailable is raised right away. Only connection errors, 5xx responses and requests that ran out
+of the latency budget of the request (see budget.py) once the source was slow by the circuit breaker's standards count
+as failures of the source. Other errors, like 4xx responses to invalid coordinates, tell the source is up, and
+requests rejected by the rate limiter of the source (see rate_limiter.py) tell nothing about it.
+
+Background refreshes outlive the request that started them, so they run with no latency budget.
+"""
+import asyncio
+import threading
+import time
+
+from ship_well.settings import (
+    READING_CACHE_GRID_SIZE,
+    READING_CACHE_TTL,
+    READING_CACHE_MAX_ENTRIES,
+    READING_CACHE_STALE_GRACE,
+    NEARBY_READING_RADIUS,
+    NEARBY_READING_MAX_AGE,
+    NEARBY_READING_MAX_ENTRIES,
+)
+from . import budget
+from .cache import ReadingCache
+from .exceptions import ServiceConnectionError, ServiceUnexpectedStatusCode
+from .latency import LatencyTracker
+from .nearby import NearbyReadings
+from .shared_cache import shared_cache
+from .single_flight import AsyncSingleFlight
+from .temperature_source.exceptions import (
+    TemperatureSourceException,
+    TemperatureSourceRateLimited,
+    TemperatureSourceTimeout,
+    TemperatureSourceUnavailable,
+)
+
+
+reading_cache = ReadingCache(READING_CACHE_MAX_ENTRIES, READING_CACHE_TTL, READING_CACHE_GRID_SIZE,
+                             READING_CACHE_STALE_GRACE)
+nearby_readings = NearbyReadings(NEARBY_READING_RADIUS, NEARBY_READING_MAX_AGE, NEARBY_READING_MAX_ENTRIES)
+in_flight = AsyncSingleFlight()
+latency_tracker = LatencyTracker()
+
+_revalidations = {}  # request key -> Task of the background refresh in flight
+_revalidations_lock = threading.Lock()
+
+
+async def fetch_temperature(source_class, latitude: float, longitude: float) -> float:
+    """
+    Get the current temperature from a source, requesting it only if there's no fresh reading nearby
+
+    A stale reading is returned right away, and refreshed in the background on the running event loop.
+
+    :param source_class: the WebAppTemperatureSource subclass to request
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: the current temperature in celsius degrees
+    :raise TemperatureSourceException the temperature can't be retrieved
+    """
+    temperature, is_fresh = reading_cache.get_stale_reading(source_class.ID, latitude, longitude)
+    if temperature is None:
+        temperature = await refresh_temperature(source_class, latitude, longitude)
+    elif not is_fresh:
+        _revalidate(source_class, latitude, longitude)
+    return temperature
+
+
+async def refresh_temperature(source_class, latitude: float, longitude: float) -> float:
+    """
+    Request the current temperature to a source even if there's a fresh reading, unless there's a request in flight
+
+    :param source_class: the WebAppTemperatureSource subclass to request
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: the current temperature in celsius degrees
+    :raise TemperatureSourceException the temperature can't be retrieved
+    """
+    try:
+        return await in_flight.do(_get_request_key(source_class, latitude, longitude),
+                                  _fill_temperature, source_class, latitude, longitude)
+    except asyncio.TimeoutError:
+        raise _get_timeout_error(source_class)
+
+
+async def refetch_temperature(source_class, latitude: float, longitude: float) -> float:
+    """
+    Request the current temperature to a source again, even if there's a fresh reading or a request in flight
+
+    :param source_class: the WebAppTemperatureSource subclass to request
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: the current temperature in celsius degrees
+    :raise TemperatureSourceException the temperature can't be retrieved
+    """
+    return await _request_temperature(source_class, latitude, longitude)
+
+
+def _get_request_key(source_class, latitude: float, longitude: float) -> tuple:
+    """
+    Requests to the same source for locations in the same cache cell are interchangeable
+    """
+    return source_class.ID, reading_cache.location_key(latitude, longitude)
+
+
+def _get_shared_key(source_class, latitude: float, longitude: float) -> str:
+    row, column = reading_cache.location_key(latitude, longitude)
+    return 'reading:{}:{}:{}'.format(source_class.ID, row, column)
+
+
+async def _fill_temperature(source_class, latitude: float, longitude: float) -> float:
+    return await shared_cache.fill_async(_get_shared_key(source_class, latitude, longitude),
+                                         _get_shared_lookup(source_class, latitude, longitude),
+                                         _request_temperature, source_class, latitude, longitude)
+
+
+def _get_shared_lookup(source_class, latitude: float, longitude: float):
+    """
+    Get the lookup of a fresh reading taken by another worker, newer than the one this worker has, if any. The reading
+    found is stored in the readings cache. The lookup blocks, so it's run on the fetch executor (see shared_cache.py)
+
+    :return: a function returning the temperature in celsius degrees, or None if there's no such reading
+    """
+    age = reading_cache.get_reading_age(source_class.ID, latitude, longitude)
+    stored_after = 0. if age is None else time.time() - age
+    key = _get_shared_key(source_class, latitude, longitude)
+
+    def lookup():
+        entry = shared_cache.get(key)
+        if entry is None or entry.stored_at <= stored_after:
+            return None
+        age = max(0., time.time() - entry.stored_at)
+        if age >= reading_cache.ttl:
+            return None
+        reading_cache.put_reading(source_class.ID, latitude, longitude, entry.value, age)
+        return entry.value
+
+    return lookup
+
+
+def _revalidate(source_class, latitude: float, longitude: float) -> None:
+    """
+    Refresh a stale reading in the background, on the running event loop, unless it's already being refreshed
+    """
+    key = _get_request_key(source_class, latitude, longitude)
+    with _revalidations_lock:
+        if key in _revalidations:
+            return
+        with budget.latency_budget(None):
+            _revalidations[key] = revalidation = asyncio.ensure_future(
+                refresh_temperature(source_class, latitude, longitude))
+    revalidation.add_done_callback(lambda _: _forget_revalidation(key, revalidation))
+
+
+def _forget_revalidation(key: tuple, revalidation) -> None:
+    with _revalidations_lock:
+        if _revalidations.get(key) is revalidation:
+            del _revalidations[key]
+    if not revalidation.cancelled():
+        revalidation.exception()  # a failed refresh leaves the stale reading in place
+
+
+async def _request_temperature(source_class, latitude: float, longitude: float) -> float:
+    if budget.expired():
+        raise _get_timeout_error(source_class)
+    circuit_breaker = _allow_request(source_class)
+    started = time.monotonic()
+    try:
+        temperature = await source_class.get_current_temperature_async(latitude, longitude)
+    except TemperatureSourceRateLimited:
+        circuit_breaker.release()
+        raise
+    except TemperatureSourceTimeout:
+        _record_timeout(circuit_breaker, time.monotonic() - started)
+        raise
+    except TemperatureSourceException as exc:
+        _record_error(circuit_breaker, exc, time.monotonic() - started)
+        raise
+    except BaseException:
+        circuit_breaker.release()
+        raise
+    _record_success(source_class, time.monotonic() - started)
+    await _store_reading(source_class, latitude, longitude, temperature)
+    return temperature
+
+
+def _allow_request(source_class):
+    """
+    Ask the source's circuit breaker for permission to request it
+
+    :return: the circuit breaker
+    :raise TemperatureSourceUnavailable if the circuit breaker is open
+    """
+    if not source_class.circuit_breaker.allow_request():
+        raise TemperatureSourceUnavailable('Source {} is unavailable'.format(source_class.ID))
+    return source_class.circuit_breaker
+
+
+def _record_timeout(circuit_breaker, duration: float) -> None:
+    """
+    Account a request that ran out of the latency budget: it only counts as a failure if the source was slow
+    """
+    if duration >= circuit_breaker.slow_request_duration:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.release()
+
+
+def _record_error(circuit_breaker, error: TemperatureSourceException, duration: float) -> None:
+    """
+    Account a request that failed: it only counts as a failure if the source couldn't be reached or answered 5xx, as
+    the rest of the errors depend on the request, not on the health of the source
+    """
+    if isinstance(error, ServiceConnectionError) or (isinstance(error, ServiceUnexpectedStatusCode) and
+                                                     (error.status_code is None or error.status_code >= 500)):
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success(duration)
+
+
+def _get_timeout_error(source_class) -> TemperatureSourceTimeout:
+    return TemperatureSourceTimeout('Source {} did not answer within the latency budget'.format(source_class.ID))
+
+
+async def _store_reading(source_class, latitude: float, longitude: float, temperature: float) -> None:
+    reading_cache.put_reading(source_class.ID, latitude, longitude, temperature)
+    nearby_readings.record(source_class.ID, latitude, longitude, temperature)
+    await shared_cache.put_async(_get_shared_key(source_class, latitude, longitude), temperature)
+
+
+def _record_success(source_class, latency: float) -> None:
+    source_class.circuit_breaker.record_success(latency)
+    latency_tracker.record(source_class.ID, latency)
@@ -0,0 +1,241 @@
+"""
+This module provides the process-wide executor the blocking work of the fetch layer is run on, like the lookups of the
+caches shared by the worker processes, so the fetch loop (see event_loop.py) is never blocked waiting for it.
+
+Instead of spawning threads on every call, a single pool is shared by all of them. Its size follows the load: the
+amount of workers needed is estimated from the arrival rate and the observed task latency (Little's law), and is never
+below the amount of tasks already in flight or queued. Workers are spawned on demand and exit when they have been idle
+for a while and are no longer needed.
+
+Every task runs in a copy of the context it was submitted from, as asyncio tasks do, so the latency budget of the
+request (see budget.py) bounds its tasks as well.
+"""
+import asyncio
+from collections import namedtuple
+from concurrent import futures
+import contextvars
+import math
+import queue
+import threading
+import time
+
+from ship_well.settings import (
+    FETCH_MIN_WORKERS,
+    FETCH_MAX_WORKERS,
+    FETCH_WORKER_IDLE_TIMEOUT,
+)
+
+
+ExecutorStats = namedtuple('ExecutorStats', [
+    'workers',  # amount of alive worker threads
+    'busy_workers',  # amount of workers running a task
+    'queue_depth',  # amount of tasks waiting for a worker
+    'utilization',  # busy workers over alive workers, between 0 and 1
+    'average_latency',  # smoothed task duration, in seconds
+    'arrival_rate',  # smoothed amount of tasks submitted per second
+])
+
+
+class _WorkItem:
+    __slots__ = ('future', 'fn', 'args', 'kwargs', 'context')
+
+    def __init__(self, future, fn, args, kwargs):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context = contextvars.copy_context()
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = self.context.run(self.fn, *self.args, **self.kwargs)
+        except BaseException as exc:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(result)
+
+
+class AdaptiveThreadPoolExecutor(futures.Executor):
+    """
+    A thread pool executor that grows and shrinks its amount of workers according to the load
+    """
+    SMOOTHING = 0.2  # weight of the newest sample in the latency and arrival rate moving averages
+    RATE_WINDOW = 1.0  # seconds between arrival rate samples
+    HEADROOM = 1.5  # extra workers kept over the estimated concurrency, to absorb bursts
+
+    def __init__(self, min_workers: int, max_workers: int, idle_timeout: float, thread_name_prefix: str = 'fetch'):
+        """
+        :param min_workers: the amount of workers that are kept alive even if idle
+        :param max_workers: the maximum amount of workers
+        :param idle_timeout: seconds a worker waits for a task before considering to exit
+        :param thread_name_prefix: the prefix of the worker threads' names
+        """
+        if max_workers <= 0 or min_workers < 0 or min_workers > max_workers:
+            raise ValueError('Invalid amount of workers: min {}, max {}'.format(min_workers, max_workers))
+
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.thread_name_prefix = thread_name_prefix
+
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._threads = set()
+        self._spawned = 0
+
+        # these are protected by _lock
+        self._workers = 0
+        self._busy = 0
+        self._queued = 0
+        self._average_latency = 0.
+        self._arrival_rate = 0.
+        self._arrivals = 0
+        self._window_start = time.monotonic()
+
+    def submit(self, fn, *args, **kwargs) -> futures.Future:
+        future = futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot schedule new tasks after shutdown')
+
+            self._queued += 1
+            self._arrivals += 1
+            self._queue.put(_WorkItem(future, fn, args, kwargs))
+            self._update_arrival_rate()
+
+            missing_workers = self._target_workers() - self._workers
+            for _ in range(missing_workers):
+                self._spawn_worker()
+
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+            for _ in threads:
+                self._queue.put(None)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def stats(self) -> ExecutorStats:
+        """
+        Get a snapshot of the executor's load, useful to size it
+
+        :return: the executor stats
+        """
+        with self._lock:
+            self._update_arrival_rate()
+            return ExecutorStats(
+                workers=self._workers,
+                busy_workers=self._busy,
+                queue_depth=self._queued,
+                utilization=self._busy / self._workers if self._workers else 0.,
+                average_latency=self._average_latency,
+                arrival_rate=self._arrival_rate,
+            )
+
+    def _target_workers(self) -> int:
+        """
+        The amount of workers needed for the current load. Must be called holding _lock.
+        """
+        estimated = math.ceil(self._arrival_rate * self._average_latency * self.HEADROOM)
+        needed = max(estimated, self._busy + self._queued, self.min_workers)
+        return min(needed, self.max_workers)
+
+    def _update_arrival_rate(self) -> None:
+        """
+        Fold the arrivals of the last window into the arrival rate average. Must be called holding _lock.
+        """
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self.RATE_WINDOW:
+            rate = self._arrivals / elapsed
+            self._arrival_rate += self.SMOOTHING * (rate - self._arrival_rate)
+            self._arrivals = 0
+            self._window_start = now
+
+    def _spawn_worker(self) -> None:
+        """
+        Start a new worker thread. Must be called holding _lock.
+        """
+        self._spawned += 1
+        thread = threading.Thread(target=self._work,
+                                  name='{}-{}'.format(self.thread_name_prefix, self._spawned),
+                                  daemon=True)
+        self._workers += 1
+        self._threads.add(thread)
+        thread.start()
+
+    def _work(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if self._workers > self._target_workers():
+                        self._retire_worker()
+                        return
+                continue
+
+            if item is None:
+                # shutdown was requested
+                with self._lock:
+                    self._retire_worker()
+                return
+
+            with self._lock:
+                self._queued -= 1
+                self._busy += 1
+
+            started = time.monotonic()
+            item.run()
+            latency = time.monotonic() - started
+            del item
+
+            with self._lock:
+                self._busy -= 1
+                self._average_latency += self.SMOOTHING * (latency - self._average_latency)
+
+    def _retire_worker(self) -> None:
+        """
+        Account the current worker thread as gone. Must be called holding _lock.
+        """
+        self._workers -= 1
+        self._threads.discard(threading.current_thread())
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_fetch_executor() -> AdaptiveThreadPoolExecutor:
+    """
+    Get the process-wide executor to run the blocking work of the fetch layer on
+
+    :return: the shared executor, created on the first call
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = AdaptiveThreadPoolExecutor(FETCH_MIN_WORKERS, FETCH_MAX_WORKERS, FETCH_WORKER_IDLE_TIMEOUT)
+    return _executor
+
+
+async def run_blocking(function, *args):
+    """
+    Run a blocking function on the process-wide executor, without blocking the running event loop
+
+    :param function: the function to run
+    :param args: the arguments to call it with
+    :return: its result
+    :raises the function's exception
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_fetch_executor(), function, *args)
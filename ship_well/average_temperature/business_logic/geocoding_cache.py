@@ -0,0 +1,117 @@
+"""
+This module provides a durable cache of the coordinates of every zip code translated so far.
+
+Zip code coordinates essentially never change, so they are stored in a SQLite database that survives restarts, with an
+in-memory LRU cache in front of it so repeated zip codes cost a dictionary lookup.
+
+The asynchronous methods only use the database on the fetch executor (see fetch_executor.py), as SQLite calls block.
+"""
+import sqlite3
+import threading
+from typing import Tuple
+
+from .cache import LRUCache
+from .fetch_executor import run_blocking
+
+
+class GeocodingCache:
+    """
+    A thread-safe, SQLite backed cache of zip code coordinates
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """
+        :param path: the path of the SQLite database. It's created if it doesn't exist
+        :param max_entries: the maximum amount of zip codes kept in memory
+        """
+        self.path = path
+        self._memory = LRUCache(max_entries)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def get(self, zip_code: str) -> Tuple[float, float]:
+        """
+        Get the coordinates of a zip code
+
+        :param zip_code: the desired zip code
+        :return: the latitude - longitude coordinates, or None if the zip code was not cached
+        """
+        coordinates = self._memory.get(zip_code)
+        if coordinates is not LRUCache.MISSING:
+            return coordinates
+
+        with self._lock:
+            row = self._get_connection().execute(
+                'SELECT latitude, longitude FROM zip_code WHERE zip_code = ?', (zip_code,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        self._memory.put(zip_code, row)
+        return row
+
+    def put(self, zip_code: str, coordinates: Tuple[float, float]) -> None:
+        """
+        Store the coordinates of a zip code
+
+        :param zip_code: the zip code
+        :param coordinates: its latitude - longitude coordinates
+        """
+        latitude, longitude = coordinates
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO zip_code (zip_code, latitude, longitude) VALUES (?, ?, ?)',
+                                   (zip_code, latitude, longitude))
+        self._memory.put(zip_code, (latitude, longitude))
+
+    async def get_async(self, zip_code: str) -> Tuple[float, float]:
+        """
+        Get the coordinates of a zip code without blocking the running event loop. The database is only read if the
+        zip code is not in memory
+
+        :param zip_code: the desired zip code
+        :return: the latitude - longitude coordinates, or None if the zip code was not cached
+        """
+        coordinates = self._memory.get(zip_code)
+        if coordinates is not LRUCache.MISSING:
+            return coordinates
+        return await run_blocking(self.get, zip_code)
+
+    async def put_async(self, zip_code: str, coordinates: Tuple[float, float]) -> None:
+        """
+        Store the coordinates of a zip code without blocking the running event loop
+
+        :param zip_code: the zip code
+        :param coordinates: its latitude - longitude coordinates
+        """
+        await run_blocking(self.put, zip_code, coordinates)
+
+    def stats(self):
+        """
+        Get a snapshot of the in-memory cache counters
+
+        :return: the cache stats
+        """
+        return self._memory.stats()
+
+    def close(self) -> None:
+        """
+        Close the database connection. It's opened again if this instance is used again.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the database connection, opening it on the first call. Must be called holding _lock.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('CREATE TABLE IF NOT EXISTS zip_code '
+                               '(zip_code TEXT PRIMARY KEY, latitude REAL NOT NULL, longitude REAL NOT NULL)')
+            self._connection = connection
+        return self._connection
@@ -1,32 +1,175 @@
 """
 This modules isolates the logic to interact with the internals to communicate with Google Maps API to
 perform google_api and reverse google_api
+
+The Google Maps API client, along with the HTTP libraries it depends on, is only imported the first time it's needed,
+as most zip codes and coordinates are resolved offline.
 """
 from typing import Tuple
 
-from ship_well.settings import GOOGLE_MAPS_API_KEY
-from .google_api.client import GoogleApiClient
+from ship_well.settings import (
+    GOOGLE_MAPS_API_KEY,
+    GEOCODING_CACHE_PATH,
+    GEOCODING_CACHE_MAX_ENTRIES,
+    ENABLE_OFFLINE_COORDINATES_CHECKING,
+    LAND_MASK_PATH,
+    ENABLE_OFFLINE_ZIP_CODES,
+    ZIP_CODE_INDEX_PATH,
+)
+from .event_loop import fetch_loop
+from .exceptions import ServiceNotConfigured
+from .geocoding_cache import GeocodingCache
+from .land_mask import LandMask
+from .shared_cache import shared_cache
+from .zip_code_index import ZipCodeIndex
+
+
+geocoding_cache = GeocodingCache(GEOCODING_CACHE_PATH, GEOCODING_CACHE_MAX_ENTRIES)
+land_mask = LandMask(LAND_MASK_PATH)
+zip_code_index = ZipCodeIndex(ZIP_CODE_INDEX_PATH)
 
 
 def validate_coordinates(latitude: float, longitude: float) -> bool:
     """
     Check a given latitude - longitude coordinates belongs to an existing location
 
+    Coordinates are checked offline first, and Google Maps API is only requested if they are not on land.
+
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: True if the coordinates are valid. False otherwise
+    """
+    are_valid = _validate_coordinates_offline(latitude, longitude)
+    if are_valid is None:
+        are_valid = fetch_loop.run(_validate_coordinates_online(latitude, longitude))
+    return are_valid
+
+
+async def validate_coordinates_async(latitude: float, longitude: float) -> bool:
+    """
+    Check a given latitude - longitude coordinates belongs to an existing location, without blocking the event loop
+
+    Coordinates are checked offline first, and Google Maps API is only requested if they are not on land.
+
     :param latitude: the desired latitude
     :param longitude: the desired longitude
     :return: True if the coordinates are valid. False otherwise
     """
-    geocode = GoogleApiClient(GOOGLE_MAPS_API_KEY)
-    return geocode.check_coordinates_validity(latitude, longitude)
+    are_valid = _validate_coordinates_offline(latitude, longitude)
+    if are_valid is None:
+        are_valid = await fetch_loop.call(_validate_coordinates_online(latitude, longitude))
+    return are_valid
 
 
 def get_coordinates_from_zip_code(zip_code: str) -> Tuple[float, float]:
     """
     Get the coordinates of a location given its zip_code
 
+    Zip codes are looked up in the bundled zip code index first. Google Maps API is only requested the first time a
+    zip code missing from it is translated, as coordinates are cached afterwards, and by a single worker process at a
+    time.
+
     :param zip_code: the desired zip_code
     :return: the tuple latitude - longitude, or None if the zip_code is invalid
+    :raises ServiceNotConfigured if the zip code is missing from the index and there's no Google API key
     :raises TemperatureAverageException if translation fails
     """
-    geocode = GoogleApiClient(GOOGLE_MAPS_API_KEY)
-    return geocode.get_location_from_zip_code(zip_code)
+    coordinates = _get_coordinates_offline(zip_code)
+    if coordinates is None:
+        coordinates = fetch_loop.run(_get_coordinates_online(zip_code))
+    return coordinates
+
+
+async def get_coordinates_from_zip_code_async(zip_code: str) -> Tuple[float, float]:
+    """
+    Get the coordinates of a location given its zip_code, without blocking the event loop
+
+    Zip codes are looked up in the bundled zip code index first. Google Maps API is only requested the first time a
+    zip code missing from it is translated, as coordinates are cached afterwards, and by a single worker process at a
+    time.
+
+    :param zip_code: the desired zip_code
+    :return: the tuple latitude - longitude, or None if the zip_code is invalid
+    :raises ServiceNotConfigured if the zip code is missing from the index and there's no Google API key
+    :raises TemperatureAverageException if translation fails
+    """
+    coordinates = _get_coordinates_offline(zip_code)
+    if coordinates is None:
+        coordinates = await fetch_loop.call(_get_coordinates_online(zip_code))
+    return coordinates
+
+
+async def _validate_coordinates_online(latitude: float, longitude: float) -> bool:
+    """
+    Check coordinates belong to an existing location with Google Maps API, on the fetch loop (see event_loop.py)
+    """
+    geocode = _get_google_api_client(required=False)
+    return await geocode.check_coordinates_validity_async(latitude, longitude)
+
+
+async def _get_coordinates_online(zip_code: str) -> Tuple[float, float]:
+    """
+    Get the coordinates of a zip code from the geocoding cache, or from Google Maps API, on the fetch loop (see
+    event_loop.py)
+    """
+    coordinates = await geocoding_cache.get_async(zip_code)
+    if coordinates is None:
+        geocode = _get_google_api_client()
+        coordinates = await shared_cache.fill_async('zip_code:' + zip_code, lambda: geocoding_cache.get(zip_code),
+                                                    _translate_zip_code_async, geocode, zip_code)
+    return coordinates
+
+
+async def _translate_zip_code_async(geocode, zip_code: str) -> Tuple[float, float]:
+    coordinates = await geocode.get_location_from_zip_code_async(zip_code)
+    if coordinates is not None:
+        await geocoding_cache.put_async(zip_code, coordinates)
+    return coordinates
+
+
+def _get_coordinates_offline(zip_code: str) -> Tuple[float, float]:
+    """
+    Get the coordinates of a zip code from the bundled zip code index
+
+    :param zip_code: the desired zip_code
+    :return: the tuple latitude - longitude, or None if the zip code is missing from the index
+    """
+    if not ENABLE_OFFLINE_ZIP_CODES:
+        return None
+    return zip_code_index.get(zip_code)
+
+
+def _get_google_api_client(required: bool = True):
+    """
+    Get a client for Google Maps API, importing it on the first call
+
+    :param required: whether the Google API key is required
+    :return: the GoogleApiClient
+    :raises ServiceNotConfigured if there's no Google API key, and it's required
+    """
+    if required and GOOGLE_MAPS_API_KEY is None:
+        raise ServiceNotConfigured('Google API Key not configured')
+    from .google_api.client import GoogleApiClient
+    return GoogleApiClient(GOOGLE_MAPS_API_KEY)
+
+
+def _validate_coordinates_offline(latitude: float, longitude: float) -> bool:
+    """
+    Check coordinates belong to an existing location using the bundled land mask
+
+    Only land cells are trusted: the mask is too coarse for small islands, which fall in water cells, so coordinates
+    on water are as ambiguous as the ones near a coastline.
+
+    :param latitude: the desired latitude
+    :param longitude: the desired longitude
+    :return: True if the coordinates are on land, False if they are out of range, or None if the land mask can't tell
+    """
+    if not ENABLE_OFFLINE_COORDINATES_CHECKING:
+        return None
+
+    try:
+        location = land_mask.classify(latitude, longitude)
+    except ValueError:
+        return False
+
+    return True if location == LandMask.LAND else None
@@ -3,14 +3,28 @@ This modules provides a client to communicate with Google Maps API
 
 Source: https://developers.google.com/maps/documentation/geocoding/start
 """
+import asyncio
 import logging
 from typing import Tuple
 
-import requests
-from requests.exceptions import ConnectionError
+from aiohttp import ClientError, ClientTimeout
+from requests.exceptions import ConnectionError, Timeout
 
+from ship_well.settings import (
+    UPSTREAM_POOL_SIZE,
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_READ_TIMEOUT,
+)
+from .. import budget
+from ..metrics import upstream_metrics
+from ..sessions import (
+    PooledSession,
+    AsyncPooledSession,
+    BufferedResponse,
+)
 from .exceptions import (
     GoogleAPIConnectionError,
+    GoogleAPITimeout,
     GoogleAPIUnexpectedResponse,
     GoogleAPIUnexpectedStatusCode,
 )
@@ -24,9 +38,15 @@ class GoogleApiClient:
     This class contains the internals to communicate with Google Maps API
     """
 
+    ID = 'google_maps'  # identifies the service in the metrics
     GOOGLE_MAPS_API_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
     STATUS_CODE_SUCCESS = 200
     STATUS_OK = "OK"
+    TIMEOUT = (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)  # connect and read timeouts, in seconds
+
+    # all the clients share the same keep-alive connections
+    _session = PooledSession(UPSTREAM_POOL_SIZE)
+    _async_session = AsyncPooledSession(UPSTREAM_POOL_SIZE)
 
     def __init__(self, api_key: str):
         """
@@ -43,13 +63,79 @@ class GoogleApiClient:
         if there's no location for the given zip code
         :raises GeoCodeException if the coordinates can't be retrieved
         """
-        payload = {
+        with upstream_metrics.track(self.ID):
+            response = self._get(self._get_zip_code_payload(zip_code))
+            return self._parse_location(response, zip_code)
+
+    async def get_location_from_zip_code_async(self, zip_code: str) -> Tuple[float, float]:
+        """
+        Get latitude - longitude coordinates from zip code, without blocking the running event loop
+
+        :param zip_code: the desired zip code
+        :return: the latitude - longitude coordinates that corresponds to the given zip code, or None
+        if there's no location for the given zip code
+        :raises GeoCodeException if the coordinates can't be retrieved
+        """
+        with upstream_metrics.track(self.ID):
+            response = await self._get_async(self._get_zip_code_payload(zip_code))
+            return self._parse_location(response, zip_code)
+
+    def check_coordinates_validity(self, latitude: float, longitude: float) -> bool:
+        """
+        Check latitude and longitude coordinates are valid
+
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return True if coordinates are valid. False otherwise
+
+        :raises GeoCodeServiceUnexpectedResponse on communication issues
+        """
+        with upstream_metrics.track(self.ID):
+            response = self._get(self._get_coordinates_payload(latitude, longitude))
+            return self._parse_validity(response)
+
+    async def check_coordinates_validity_async(self, latitude: float, longitude: float) -> bool:
+        """
+        Check latitude and longitude coordinates are valid, without blocking the running event loop
+
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return True if coordinates are valid. False otherwise
+
+        :raises GeoCodeServiceUnexpectedResponse on communication issues
+        """
+        with upstream_metrics.track(self.ID):
+            response = await self._get_async(self._get_coordinates_payload(latitude, longitude))
+            return self._parse_validity(response)
+
+    @classmethod
+    async def close_async_session(cls) -> None:
+        """
+        Close the keep-alive aiohttp session of the running event loop, before the loop is closed
+        """
+        await cls._async_session.close()
+
+    def _get_zip_code_payload(self, zip_code: str) -> dict:
+        return {
             "key": self.key,
             "components": 'postal_code:{}'.format(zip_code)
         }
 
-        response = self._get(payload)
+    def _get_coordinates_payload(self, latitude: float, longitude: float) -> dict:
+        return {
+            "key": self.key,
+            "latlng": ','.join([str(latitude), str(longitude)])
+        }
+
+    def _parse_location(self, response, zip_code: str) -> Tuple[float, float]:
+        """
+        Extract the coordinates from a geocoding response
 
+        :param response: the HTTP response
+        :param zip_code: the zip code the response belongs to
+        :return: the latitude - longitude coordinates, or None if there's no location for the zip code
+        :raises GeoCodeException if the response is not as expected
+        """
         if response.status_code == self.STATUS_CODE_SUCCESS:
             json_response = response.json()
             self._verify_status(json_response)
@@ -67,25 +153,16 @@ class GoogleApiClient:
         else:
             logger.error('Failed to retrieve location from postal code. '
                          'Status code: {r.status_code} - text: {r.text}'.format(r=response))
-            raise GoogleAPIUnexpectedStatusCode(response)
+            raise GoogleAPIUnexpectedStatusCode(response, response.status_code)
 
-    def check_coordinates_validity(self, latitude: float, longitude: float) -> bool:
+    def _parse_validity(self, response) -> bool:
         """
-        Check latitude and longitude coordinates are valid
-
-        :param latitude: the desired latitude
-        :param longitude: the desired longitude
-        :return True if coordinates are valid. False otherwise
+        Tell whether a reverse geocoding response found a location
 
-        :raises GeoCodeServiceUnexpectedResponse on communication issues
+        :param response: the HTTP response
+        :return True if there's a location. False otherwise
+        :raises GeoCodeServiceUnexpectedResponse if the response is not as expected
         """
-        payload = {
-            "key": self.key,
-            "latlng": ','.join([str(latitude), str(longitude)])
-        }
-
-        response = self._get(payload)
-
         if response.status_code == self.STATUS_CODE_SUCCESS:
             json_response = response.json()
             self._verify_status(json_response)
@@ -95,7 +172,7 @@ class GoogleApiClient:
         else:
             logger.error('Failed to retrieve location from postal code. '
                          'Status code: {r.status_code} - text: {r.text}'.format(r=response))
-            raise GoogleAPIUnexpectedStatusCode(response)
+            raise GoogleAPIUnexpectedStatusCode(response, response.status_code)
 
     def _get(self, payload: dict):
         """
@@ -104,12 +181,44 @@ class GoogleApiClient:
         :param payload: the query
         :return: the corresponding response
         :raises GeoCodeServiceConnectionError on connection errors
+        :raises GoogleAPITimeout if the latency budget of the request ran out (see budget.py)
+        """
+        self._check_budget()
+        try:
+            return self._session.get().get(self.GOOGLE_MAPS_API_URL, params=payload,
+                                           timeout=budget.bound_timeouts(*self.TIMEOUT))
+        except (ConnectionError, Timeout):
+            self._check_budget()
+            raise GoogleAPIConnectionError('Google Maps API is down')
+
+    async def _get_async(self, payload: dict) -> BufferedResponse:
+        """
+        Perform a GET on Google Maps API, without blocking the running event loop
+
+        :param payload: the query
+        :return: the corresponding response
+        :raises GeoCodeServiceConnectionError on connection errors
+        :raises GoogleAPITimeout if the latency budget of the request ran out (see budget.py)
         """
+        self._check_budget()
+        connect_timeout, read_timeout = budget.bound_timeouts(*self.TIMEOUT)
+        timeout = ClientTimeout(total=budget.remaining(), sock_connect=connect_timeout, sock_read=read_timeout)
         try:
-            return requests.get(self.GOOGLE_MAPS_API_URL, params=payload)
-        except ConnectionError:
+            async with self._async_session.get().get(self.GOOGLE_MAPS_API_URL, params=payload,
+                                                     timeout=timeout) as response:
+                return await BufferedResponse.read(response)
+        except (ClientError, asyncio.TimeoutError):
+            self._check_budget()
             raise GoogleAPIConnectionError('Google Maps API is down')
 
+    @staticmethod
+    def _check_budget() -> None:
+        """
+        :raise GoogleAPITimeout if the latency budget of the request ran out
+        """
+        if budget.expired():
+            raise GoogleAPITimeout('Google Maps API did not answer within the latency budget')
+
     @classmethod
     def _verify_status(cls, json_response: dict) -> None:
         """
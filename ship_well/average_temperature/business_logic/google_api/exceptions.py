@@ -5,7 +5,8 @@ from ..exceptions import (
     TemperatureAverageException,
     ServiceUnexpectedResponse,
     ServiceConnectionError,
-    ServiceUnexpectedStatusCode
+    ServiceUnexpectedStatusCode,
+    ServiceTimeout,
 )
 
 
@@ -23,6 +24,13 @@ class GoogleAPIConnectionError(GoogleAPIException, ServiceConnectionError):
     pass
 
 
+class GoogleAPITimeout(GoogleAPIException, ServiceTimeout):
+    """
+    This exception is raised when the geo code service did not answer within the latency budget of the request
+    """
+    pass
+
+
 class GoogleAPIUnexpectedResponse(GoogleAPIException, ServiceUnexpectedResponse):
     """
     This exception is raised when the response from the geo code service is not as expected
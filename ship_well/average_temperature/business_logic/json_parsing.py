@@ -0,0 +1,35 @@
+"""
+This module decodes the JSON responses of the upstream services as fast as possible
+
+Documents are decoded with orjson, which parses the responses of the sources about twice as fast as the standard
+library does, and with the standard library if orjson is not installed.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(content: bytes):
+    """
+    Decode a whole JSON document
+
+    :param content: the raw document
+    :return: the decoded document
+    :raises ValueError if it's not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def get_parser_name() -> str:
+    """
+    Get the name of the library documents are decoded with
+    """
+    return 'orjson' if orjson is not None else 'json'
+
+
+__all__ = [loads, get_parser_name]
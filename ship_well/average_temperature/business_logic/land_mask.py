@@ -0,0 +1,89 @@
+"""
+This module allows checking whether coordinates belong to an existing location without any external service.
+
+It relies on a land mask: a grid covering the whole world where every cell is classified as water, land or coast. It's
+compiled from Natural Earth polygons (see the build_land_mask management command) and bundled with the app. The grid is
+its own spatial index, so classifying coordinates is a single array lookup. Coast cells are the ones close enough to a
+coastline for the polygons' resolution to be unreliable; coordinates falling in them are ambiguous.
+"""
+import math
+import struct
+import threading
+import zlib
+
+
+class LandMask:
+    """
+    A lazily loaded, thread-safe land mask
+    """
+    WATER = 0
+    LAND = 1
+    COAST = 2
+
+    # magic, width, height, cell size in degrees
+    HEADER = struct.Struct('<4sHHd')
+    MAGIC = b'LMSK'
+
+    def __init__(self, path: str):
+        """
+        :param path: the path of the compiled land mask
+        """
+        self.path = path
+        self._cells = None
+        self._width = None
+        self._height = None
+        self._cell_size = None
+        self._lock = threading.Lock()
+
+    def classify(self, latitude: float, longitude: float) -> int:
+        """
+        Tell whether a location is on water, land or near a coast
+
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: one of LandMask.WATER, LandMask.LAND or LandMask.COAST
+        :raises ValueError if the coordinates are out of range
+        """
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('Coordinates out of range ({}, {})'.format(latitude, longitude))
+
+        if self._cells is None:
+            self._load()
+
+        row = min(math.floor((latitude + 90) / self._cell_size), self._height - 1)
+        column = min(math.floor((longitude + 180) / self._cell_size), self._width - 1)
+        return self._cells[row * self._width + column]
+
+    def load(self) -> None:
+        """
+        Load the mask now, instead of on the first classification
+        """
+        if self._cells is None:
+            self._load()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._cells is None:
+                with open(self.path, 'rb') as mask_file:
+                    data = mask_file.read()
+                magic, width, height, cell_size = self.HEADER.unpack_from(data)
+                if magic != self.MAGIC:
+                    raise ValueError('{} is not a land mask'.format(self.path))
+
+                self._width, self._height, self._cell_size = width, height, cell_size
+                self._cells = zlib.decompress(data[self.HEADER.size:])
+
+    @classmethod
+    def save(cls, path: str, cells: bytes, width: int, height: int, cell_size: float) -> None:
+        """
+        Write a compiled land mask
+
+        :param path: the destination path
+        :param cells: one byte per cell with its class, row by row from the south-west corner
+        :param width: the amount of columns
+        :param height: the amount of rows
+        :param cell_size: the side of every cell, in degrees
+        """
+        with open(path, 'wb') as mask_file:
+            mask_file.write(cls.HEADER.pack(cls.MAGIC, width, height, cell_size))
+            mask_file.write(zlib.compress(bytes(cells), 9))
@@ -0,0 +1,59 @@
+"""
+This module keeps track of the latency observed for every upstream service
+"""
+from collections import deque
+import math
+import threading
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent latency samples of every source, to estimate their percentiles
+
+    Recording a sample is a deque append. Percentiles are computed on demand and memoized until a new sample arrives.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        :param window: the amount of recent samples kept per source
+        :param min_samples: the amount of samples needed to estimate a percentile
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}  # source -> deque of latencies, in seconds
+        self._percentiles = {}  # (source, percentile) -> memoized value
+        self._lock = threading.Lock()
+
+    def record(self, source_id: str, latency: float) -> None:
+        """
+        Record the latency of a request to a source
+
+        :param source_id: the source's identifier
+        :param latency: the request's duration, in seconds
+        """
+        samples = self._samples.get(source_id)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(source_id, deque(maxlen=self.window))
+        samples.append(latency)
+        self._percentiles.clear()
+
+    def percentile(self, source_id: str, percentile: float) -> float:
+        """
+        Estimate a latency percentile of a source
+
+        :param source_id: the source's identifier
+        :param percentile: the desired percentile, between 0 and 100
+        :return: the latency, in seconds, or None if there are not enough samples
+        """
+        key = source_id, percentile
+        value = self._percentiles.get(key)
+        if value is None:
+            samples = self._samples.get(source_id)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+
+            samples = sorted(samples.copy())  # copying a deque is atomic, iterating it while appending is not
+            rank = max(0, math.ceil(percentile / 100 * len(samples)) - 1)
+            value = self._percentiles[key] = samples[rank]
+        return value
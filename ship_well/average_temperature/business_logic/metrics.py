@@ -0,0 +1,120 @@
+"""
+This module instruments the requests to the upstream services: temperature sources and Google Maps API.
+
+For every service it keeps a latency histogram, the amount of errors by exception class and the amount of requests in
+flight. Recording a request takes a couple of increments under an uncontended lock, so it's cheap enough for the hot
+path. See exposition.py to render them.
+"""
+from bisect import bisect_left
+from collections import Counter, namedtuple
+import threading
+import time
+from typing import List
+
+
+# upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HistogramSnapshot = namedtuple('HistogramSnapshot', [
+    'buckets',  # upper bounds of the buckets
+    'counts',  # amount of observations of every bucket, not cumulative. The last one is for the +Inf bucket
+    'sum',  # sum of the observations
+    'count',  # amount of observations
+])
+
+UpstreamMetricsSnapshot = namedtuple('UpstreamMetricsSnapshot', [
+    'durations',  # service -> HistogramSnapshot of the request durations, in seconds
+    'errors',  # (service, exception class name) -> amount of failed requests
+    'in_flight',  # service -> amount of requests in flight
+])
+
+
+class Histogram:
+    """
+    Counts observations in buckets. It's not thread-safe on its own, see UpstreamMetrics.
+    """
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(self.buckets, list(self.counts), self.sum, self.count)
+
+
+class UpstreamMetrics:
+    """
+    Keeps the metrics of the requests to every upstream service
+    """
+
+    def __init__(self, buckets: List[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds of the latency buckets, in seconds
+        """
+        self.buckets = buckets
+        self._durations = {}  # service -> Histogram
+        self._errors = Counter()  # (service, exception class name) -> amount
+        self._in_flight = Counter()  # service -> amount
+        self._lock = threading.Lock()
+
+    def track(self, service: str) -> '_TrackedRequest':
+        """
+        Track a request to a service, as a context manager. Its duration is always observed, and it's accounted as
+        failed if it raises.
+
+        :param service: the service's identifier
+        """
+        return _TrackedRequest(self, service)
+
+    def snapshot(self) -> UpstreamMetricsSnapshot:
+        with self._lock:
+            return UpstreamMetricsSnapshot(
+                durations={service: histogram.snapshot() for service, histogram in self._durations.items()},
+                errors=dict(self._errors),
+                in_flight=dict(self._in_flight),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._errors.clear()
+            self._in_flight.clear()
+
+    def _start(self, service: str) -> None:
+        with self._lock:
+            self._in_flight[service] += 1
+
+    def _finish(self, service: str, duration: float, error: type = None) -> None:
+        with self._lock:
+            self._in_flight[service] -= 1
+            histogram = self._durations.get(service)
+            if histogram is None:
+                histogram = self._durations[service] = Histogram(self.buckets)
+            histogram.observe(duration)
+            if error is not None:
+                self._errors[service, error.__name__] += 1
+
+
+class _TrackedRequest:
+    __slots__ = ('metrics', 'service', 'started')
+
+    def __init__(self, metrics: UpstreamMetrics, service: str):
+        self.metrics = metrics
+        self.service = service
+
+    def __enter__(self):
+        self.metrics._start(self.service)
+        self.started = time.monotonic()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics._finish(self.service, time.monotonic() - self.started, exc_type)
+
+
+upstream_metrics = UpstreamMetrics()
@@ -0,0 +1,156 @@
+"""
+This module allows answering a request with the readings recently taken at nearby locations.
+
+Every reading is indexed by source in a grid of buckets whose side is the search radius, so the readings within the
+radius of a location are in the buckets around it. The index only keeps the readings younger than the maximum age, and
+at most a fixed amount of them: the oldest readings are dropped first.
+"""
+from collections import deque, namedtuple
+import math
+import threading
+import time
+from typing import Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # along a meridian
+
+NearbyReading = namedtuple('NearbyReading', [
+    'celsius',  # the current temperature read at the nearby location
+    'distance_km',  # the distance from the requested location to the nearby one
+    'age',  # seconds since the reading was taken
+])
+
+NearbyReadingsStats = namedtuple('NearbyReadingsStats', [
+    'hits',  # amount of lookups that found a reading in range
+    'misses',  # amount of lookups that found no reading in range
+    'size',  # amount of readings currently indexed
+])
+
+
+def get_distance(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    """
+    Get the great-circle distance between two locations
+
+    :return: the distance in kilometres
+    """
+    latitude, longitude, other_latitude, other_longitude = map(
+        math.radians, (latitude, longitude, other_latitude, other_longitude))
+    haversine = (math.sin((other_latitude - latitude) / 2) ** 2 +
+                 math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1., math.sqrt(haversine)))
+
+
+class NearbyReadings:
+    """
+    A thread-safe spatial index of the recent readings of every source
+    """
+
+    def __init__(self, radius: float, max_age: float, max_entries: int):
+        """
+        :param radius: the maximum distance of a reusable reading, in kilometres. If it's 0, no reading is reused
+        :param max_age: seconds a reading can be reused
+        :param max_entries: the maximum amount of readings. When full, the oldest one is dropped
+        """
+        self.radius = radius
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.bucket_size = max(radius, 1.) / KM_PER_DEGREE  # the side of a bucket, in degrees
+        self.columns = math.ceil(360 / self.bucket_size)
+
+        self._buckets = {}  # (source, row, column) -> {(latitude, longitude): (temperature, recorded_at)}
+        self._recorded = deque()  # (recorded_at, bucket, location) of every reading, from the oldest
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def record(self, source_id: str, latitude: float, longitude: float, temperature: float) -> None:
+        """
+        Index the reading of a source at a given location
+
+        :param source_id: the source's identifier
+        :param latitude: the reading's latitude
+        :param longitude: the reading's longitude
+        :param temperature: the current temperature in celsius degrees
+        """
+        if not self.radius:
+            return
+
+        now = time.monotonic()
+        row, column = self._get_bucket(latitude, longitude)
+        bucket = source_id, row, column
+        with self._lock:
+            self._buckets.setdefault(bucket, {})[latitude, longitude] = temperature, now
+            self._recorded.append((now, bucket, (latitude, longitude)))
+            self._drop_old_readings(now)
+
+    def nearest(self, source_id: str, latitude: float, longitude: float) -> NearbyReading:
+        """
+        Get the nearest reading of a source within the radius of a location
+
+        :param source_id: the source's identifier
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return: the nearest reading and its distance, or None if there's no recent reading in range
+        """
+        if not self.radius:
+            return None
+
+        row, column = self._get_bucket(latitude, longitude)
+        # buckets get narrower towards the poles, so there are more of them within the radius
+        width = self.bucket_size * max(math.cos(math.radians(min(89.9, abs(latitude) + self.bucket_size))), 1e-6)
+        column_span = min(self.columns // 2, math.ceil(self.radius / KM_PER_DEGREE / width))
+
+        nearest = None
+        now = time.monotonic()
+        oldest = now - self.max_age
+        with self._lock:
+            for bucket_row in range(row - 1, row + 2):
+                for bucket_column in range(column - column_span, column + column_span + 1):
+                    readings = self._buckets.get((source_id, bucket_row, bucket_column % self.columns))
+                    if not readings:
+                        continue
+                    for (other_latitude, other_longitude), (temperature, recorded_at) in readings.items():
+                        if recorded_at < oldest:
+                            continue
+                        distance = get_distance(latitude, longitude, other_latitude, other_longitude)
+                        if distance <= self.radius and (nearest is None or distance < nearest.distance_km):
+                            nearest = NearbyReading(temperature, distance, now - recorded_at)
+
+            if nearest is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return nearest
+
+    def clear(self) -> None:
+        """
+        Drop all the readings and reset the counters
+        """
+        with self._lock:
+            self._buckets.clear()
+            self._recorded.clear()
+            self._hits = self._misses = 0
+
+    def stats(self) -> NearbyReadingsStats:
+        with self._lock:
+            return NearbyReadingsStats(hits=self._hits, misses=self._misses,
+                                       size=sum(map(len, self._buckets.values())))
+
+    def _get_bucket(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor((latitude + 90) / self.bucket_size),
+                math.floor((longitude + 180) / self.bucket_size) % self.columns)
+
+    def _drop_old_readings(self, now: float) -> None:
+        """
+        Drop the readings older than max_age and, if still full, the oldest ones. Must be called holding _lock.
+        """
+        while self._recorded and (self._recorded[0][0] < now - self.max_age or
+                                  len(self._recorded) > self.max_entries):
+            recorded_at, bucket, location = self._recorded.popleft()
+            readings = self._buckets.get(bucket)
+            # the location may have been recorded again since
+            if readings is not None and readings.get(location, (None, None))[1] == recorded_at:
+                del readings[location]
+                if not readings:
+                    del self._buckets[bucket]
@@ -0,0 +1,204 @@
+"""
+This module keeps the readings of the most requested locations fresh, so requests for them are served from cache.
+
+The popularity of every location is tracked from the incoming requests, and decays over time so it follows the
+current traffic. A background scheduler periodically refreshes, from every source, the readings of the most popular
+locations that are about to expire, without exceeding a budget of upstream requests per minute.
+"""
+from collections import namedtuple
+import logging
+import threading
+import time
+from typing import List, Tuple
+
+from ship_well.settings import (
+    READING_CACHE_TTL,
+    PREFETCH_TOP_LOCATIONS,
+    PREFETCH_BUDGET_PER_MINUTE,
+    PREFETCH_INTERVAL,
+    PREFETCH_POPULARITY_HALF_LIFE,
+)
+from .event_loop import fetch_loop
+from .fetch import reading_cache, refresh_temperature
+from .temperature_source.registry import WEATHER_SOURCE
+
+logger = logging.getLogger(__name__)
+
+
+PrefetchStats = namedtuple('PrefetchStats', [
+    'runs',  # amount of times the hot locations were checked
+    'refreshes',  # amount of readings requested ahead of their expiration
+    'skipped',  # amount of readings about to expire that were not requested for lack of budget
+])
+
+
+class LocationPopularity:
+    """
+    Counts the requests for every location, by reading cache cell, with a score that decays over time
+    """
+
+    def __init__(self, max_locations: int, half_life: float):
+        """
+        :param max_locations: the amount of locations worth tracking. The least popular ones are dropped beyond it
+        :param half_life: seconds for a location's score to halve
+        """
+        self.max_locations = max_locations
+        self.half_life = half_life
+
+        self._scores = {}  # cell -> score
+        self._coordinates = {}  # cell -> coordinates of the latest request
+        self._decayed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, latitude: float, longitude: float) -> None:
+        """
+        Account a request for a location
+
+        :param latitude: the requested latitude
+        :param longitude: the requested longitude
+        """
+        cell = reading_cache.location_key(latitude, longitude)
+        with self._lock:
+            self._scores[cell] = self._scores.get(cell, 0.) + 1.
+            self._coordinates[cell] = latitude, longitude
+            if len(self._scores) > 2 * self.max_locations:
+                self._drop_least_popular()
+
+    def top(self, amount: int) -> List[Tuple[float, float]]:
+        """
+        Get the most popular locations
+
+        :param amount: the amount of locations
+        :return: the coordinates of the locations, from the most popular
+        """
+        with self._lock:
+            self._decay()
+            cells = sorted(self._scores, key=self._scores.get, reverse=True)[:amount]
+            return [self._coordinates[cell] for cell in cells]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+            self._coordinates.clear()
+
+    def _decay(self) -> None:
+        """
+        Decay the scores by the time elapsed since the last decay. Must be called holding _lock.
+        """
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self._decayed_at) / self.half_life)
+        self._decayed_at = now
+        for cell, score in list(self._scores.items()):
+            score *= factor
+            if score < 0.01:
+                del self._scores[cell]
+                del self._coordinates[cell]
+            else:
+                self._scores[cell] = score
+
+    def _drop_least_popular(self) -> None:
+        """
+        Keep only the max_locations most popular locations. Must be called holding _lock.
+        """
+        for cell in sorted(self._scores, key=self._scores.get)[:len(self._scores) - self.max_locations]:
+            del self._scores[cell]
+            del self._coordinates[cell]
+
+
+class PrefetchScheduler:
+    """
+    Refreshes the readings of the most popular locations before they expire, on a background thread
+    """
+
+    def __init__(self, popularity: LocationPopularity, top_locations: int, budget_per_minute: int, interval: float,
+                 ttl: float):
+        """
+        :param popularity: the popularity of the locations
+        :param top_locations: the amount of most popular locations to keep fresh
+        :param budget_per_minute: the maximum amount of upstream requests per minute
+        :param interval: seconds between checks
+        :param ttl: seconds a reading is fresh
+        """
+        self.popularity = popularity
+        self.top_locations = top_locations
+        self.budget_per_minute = budget_per_minute
+        self.interval = interval
+        # a reading is refreshed if it would expire before the check after the next one
+        self.refresh_age = max(0., ttl - 2 * interval)
+
+        self._tokens = float(budget_per_minute)  # the upstream requests that can be made right now
+        self._refilled_at = time.monotonic()
+        self._runs = 0
+        self._refreshes = 0
+        self._skipped = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """
+        Start checking the popular locations periodically, on a daemon thread
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> int:
+        """
+        Request the readings of the popular locations that are missing or about to expire, within the budget
+
+        Sources whose circuit breaker is open are not requested.
+
+        :return: the amount of readings requested
+        """
+        self._refill()
+        self._runs += 1
+        requested = 0
+
+        for latitude, longitude in self.popularity.top(self.top_locations):
+            for source_class in WEATHER_SOURCE.values():
+                age = reading_cache.get_reading_age(source_class.ID, latitude, longitude)
+                if (age is not None and age < self.refresh_age) or source_class.circuit_breaker.is_open():
+                    continue
+
+                if self._tokens < 1:
+                    self._skipped += 1
+                    continue
+
+                self._tokens -= 1
+                request = fetch_loop.submit(refresh_temperature(source_class, latitude, longitude))
+                request.add_done_callback(lambda done_request: done_request.exception())  # failures are not retried
+                requested += 1
+
+        self._refreshes += requested
+        return requested
+
+    def stats(self) -> PrefetchStats:
+        return PrefetchStats(runs=self._runs, refreshes=self._refreshes, skipped=self._skipped)
+
+    def _refill(self) -> None:
+        """
+        Earn the budget for the time elapsed since the last refill, up to a minute worth of requests
+        """
+        now = time.monotonic()
+        earned = (now - self._refilled_at) * self.budget_per_minute / 60
+        self._tokens = min(float(self.budget_per_minute), self._tokens + earned)
+        self._refilled_at = now
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Could not prefetch the popular locations')
+
+
+location_popularity = LocationPopularity(PREFETCH_TOP_LOCATIONS, PREFETCH_POPULARITY_HALF_LIFE)
+prefetch_scheduler = PrefetchScheduler(location_popularity, PREFETCH_TOP_LOCATIONS, PREFETCH_BUDGET_PER_MINUTE,
+                                       PREFETCH_INTERVAL, READING_CACHE_TTL)
@@ -0,0 +1,146 @@
+"""
+This module decides when an average temperature can be returned without waiting for every source.
+
+QuorumAverage holds no I/O: a driver requests the sources (on threads or on an event loop), waits at most timeout()
+seconds for the next answer, feeds every answer with add_reading or add_error, requests again the sources returned by
+sources_to_hedge(), and stops once is_done().
+
+With a tolerance, only readings within the tolerance of each other count towards the quorum: the average is returned
+as soon as enough sources agree, and it's the average of the ones that agree.
+"""
+from collections import Counter, namedtuple
+from statistics import mean
+import time
+from typing import Dict, List
+
+from .exceptions import TemperatureAverageTimeout
+
+
+AverageTemperature = namedtuple('AverageTemperature', [
+    'celsius',  # the average current temperature
+    'sources',  # the names of the sources the average was computed from
+    'distance_km',  # the distance to the farthest nearby location whose reading was reused, or 0 if none was
+    'max_age',  # seconds until the first of the readings it was computed from is no longer fresh
+], defaults=[0., 0.])
+
+
+class QuorumAverage:
+    """
+    Tracks the answers of the sources requested for an average
+    """
+
+    def __init__(self, source_ids: List[str], quorum: int = None, deadline: float = None,
+                 hedge_delays: Dict[str, float] = None, tolerance: float = None):
+        """
+        :param source_ids: the requested sources
+        :param quorum: the amount of readings needed. All the sources are needed if it's None
+        :param deadline: seconds to wait for the quorum, or None to wait for every source to answer
+        :param hedge_delays: seconds to wait for every source before requesting it again. Sources without a delay are
+        never requested again
+        :param tolerance: the most celsius degrees the readings in the quorum may differ by, or None if any reading
+        counts
+        """
+        now = time.monotonic()
+        self.source_ids = source_ids
+        self.quorum = min(quorum, len(source_ids)) if quorum else len(source_ids)
+        self.deadline_at = now + deadline if deadline is not None else None
+        self.tolerance = tolerance
+        self.readings = {}  # source -> temperature
+        self.errors = []
+
+        self._pending = Counter(source_ids)  # source -> amount of requests in flight
+        self._hedge_at = {source_id: now + delay
+                          for source_id, delay in (hedge_delays or {}).items()
+                          if delay is not None and source_id in self._pending}
+
+    def add_reading(self, source_id: str, temperature: float) -> None:
+        """
+        Account a successful answer. If the source was hedged, only the first answer is kept.
+        """
+        self._pending[source_id] -= 1
+        self.readings.setdefault(source_id, temperature)
+        self._hedge_at.pop(source_id, None)
+
+    def add_error(self, source_id: str, error: Exception) -> None:
+        """
+        Account a failed answer. If the source was hedged, it only fails if every request failed.
+        """
+        self._pending[source_id] -= 1
+        if not self._pending[source_id] and source_id not in self.readings:
+            self.errors.append(error)
+            self._hedge_at.pop(source_id, None)
+
+    def is_done(self) -> bool:
+        """
+        Tell whether the quorum was reached, every source settled, or the deadline expired
+        """
+        if len(self._get_quorum_sources()) >= self.quorum:
+            return True
+        if all(source_id in self.readings or not self._pending[source_id] for source_id in self.source_ids):
+            return True
+        return self.deadline_at is not None and time.monotonic() >= self.deadline_at
+
+    def timeout(self) -> float:
+        """
+        Get the seconds to wait for the next answer, until the deadline or the next hedge
+
+        :return: the seconds to wait, or None to wait indefinitely
+        """
+        moments = list(self._hedge_at.values())
+        if self.deadline_at is not None:
+            moments.append(self.deadline_at)
+        if not moments:
+            return None
+        return max(0., min(moments) - time.monotonic())
+
+    def sources_to_hedge(self) -> List[str]:
+        """
+        Get the sources that must be requested again now. Every source is hedged at most once.
+        """
+        now = time.monotonic()
+        due = [source_id for source_id, hedge_at in self._hedge_at.items() if hedge_at <= now]
+        for source_id in due:
+            del self._hedge_at[source_id]
+            self._pending[source_id] += 1
+        return due
+
+    def agreed(self) -> bool:
+        """
+        Tell whether enough readings agree within the tolerance. Always False without a tolerance.
+        """
+        return self.tolerance is not None and len(self._get_quorum_sources()) >= self.quorum
+
+    def result(self) -> AverageTemperature:
+        """
+        Get the average of the readings so far, or of the ones that agree if enough of them do
+
+        :return: the average temperature, and the sources it was computed from
+        :raises the error of the first source that failed if there are no readings, or TemperatureAverageTimeout if
+        no source answered in time
+        """
+        if self.agreed():
+            sources = self._get_quorum_sources()
+            return AverageTemperature(mean(self.readings[source] for source in sources), sorted(sources))
+        if self.readings:
+            return AverageTemperature(mean(self.readings.values()), sorted(self.readings))
+        if self.errors:
+            raise self.errors[0]
+        raise TemperatureAverageTimeout('No source answered in time')
+
+    def _get_quorum_sources(self) -> List[str]:
+        """
+        Get the sources whose readings count towards the quorum: all of them without a tolerance, or else the largest
+        group of sources whose readings are within the tolerance of each other
+        """
+        if self.tolerance is None:
+            return list(self.readings)
+
+        by_temperature = sorted(self.readings, key=self.readings.get)
+        agreeing = []
+        first = 0
+        for last, source_id in enumerate(by_temperature):
+            while self.readings[source_id] - self.readings[by_temperature[first]] > self.tolerance:
+                first += 1
+            if last + 1 - first > len(agreeing):
+                agreeing = by_temperature[first:last + 1]
+        return agreeing
@@ -0,0 +1,333 @@
+"""
+This module provides rate limiters, to keep the requests to an upstream service within what it can take
+
+A limiter combines a token bucket, which caps the requests per second, with an adaptive limit of concurrent requests.
+The concurrency limit grows by one request per limit's worth of successful requests (additive increase), and halves
+when the service signals it's overloaded (multiplicative decrease): an HTTP status code 429 or 5xx, or a latency well
+above its usual one. Requests over the limits wait for their turn, up to a maximum wait, and are rejected afterwards.
+
+Requests waiting for a token sleep until it's due. Requests waiting for a slot are woken up as requests in flight are
+released, as many as slots are free, whichever thread or event loop they wait on.
+"""
+import asyncio
+from collections import deque, namedtuple
+from contextlib import asynccontextmanager, contextmanager
+import math
+import threading
+import time
+
+from . import budget
+from .exceptions import ServiceRateLimited
+
+
+RateLimiterStats = namedtuple('RateLimiterStats', [
+    'admitted',  # amount of requests let through
+    'queued',  # amount of requests that waited for their turn before being let through or rejected
+    'rejected',  # amount of requests rejected after waiting for too long
+    'concurrency_limit',  # the current limit of concurrent requests
+    'in_flight',  # amount of requests currently in flight
+])
+
+
+class TokenBucket:
+    """
+    Caps the rate of requests, letting bursts of up to a given size through. Not thread-safe
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        :param rate: the tokens added per second. If it's None, the rate is not capped
+        :param burst: the maximum amount of tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Fill the bucket
+        """
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Take a token, if there's one
+
+        :param now: the current monotonic time
+        :return: 0 if a token was taken. Otherwise, the seconds until there's one
+        """
+        if not self.rate:
+            return 0
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+class AIMDConcurrencyLimit:
+    """
+    An additive increase, multiplicative decrease limit of concurrent requests. Not thread-safe
+    """
+    LATENCY_SMOOTHING = 0.05  # the weight of every sample in the usual latency, an exponential moving average
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_tolerance: float, backoff: float):
+        """
+        :param initial: the limit to start with
+        :param minimum: the lowest the limit can get
+        :param maximum: the highest the limit can get
+        :param latency_tolerance: how many times the usual latency a request must take to signal an overload
+        :param backoff: the factor the limit is multiplied by on overload
+        """
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Go back to the initial limit, and forget the usual latency
+        """
+        self.limit = float(self.initial)
+        self.usual_latency = None
+        self._decreased_at = None
+
+    def record(self, latency: float, overloaded: bool, now: float) -> None:
+        """
+        Adapt the limit to the outcome of a request
+
+        :param latency: the seconds the request took
+        :param overloaded: whether the service signaled it's overloaded
+        :param now: the current monotonic time
+        """
+        if self.usual_latency is None:
+            self.usual_latency = latency
+        slow = latency > self.usual_latency * self.latency_tolerance
+        self.usual_latency += (latency - self.usual_latency) * self.LATENCY_SMOOTHING
+
+        if overloaded or slow:
+            # the requests in flight when the service got overloaded all signal it: decrease once per usual latency
+            if self._decreased_at is None or now - self._decreased_at >= self.usual_latency:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class Admission:
+    """
+    A request let through by a rate limiter
+    """
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.status_code = None  # the HTTP status code of the response, if any. 429 and 5xx signal an overload
+
+    @property
+    def overloaded(self) -> bool:
+        return self.status_code is not None and (self.status_code == 429 or self.status_code >= 500)
+
+
+class RateLimiter:
+    """
+    A thread-safe limiter of the rate and concurrency of the requests to an upstream service
+    """
+
+    def __init__(self, requests_per_second: float, burst: int, initial_concurrency: int, min_concurrency: int,
+                 max_concurrency: int, latency_tolerance: float, backoff: float, max_wait: float):
+        """
+        :param requests_per_second: the maximum rate of requests. If it's None, the rate is not capped
+        :param burst: the maximum amount of requests let through at once, after an idle period
+        :param initial_concurrency: the limit of concurrent requests to start with
+        :param min_concurrency: the lowest the limit of concurrent requests can get
+        :param max_concurrency: the highest the limit of concurrent requests can get
+        :param latency_tolerance: how many times its usual latency a request must take to signal an overload
+        :param backoff: the factor the limit of concurrent requests is multiplied by on overload
+        :param max_wait: seconds a request waits for its turn before being rejected, if the latency budget of the
+        request (see budget.py) doesn't run out earlier
+        """
+        self.max_wait = max_wait
+        self._token_bucket = TokenBucket(requests_per_second, burst)
+        self._concurrency_limit = AIMDConcurrencyLimit(initial_concurrency, min_concurrency, max_concurrency,
+                                                       latency_tolerance, backoff)
+        self._condition = threading.Condition()
+        self._waiters = deque()  # (loop, Future) of the coroutines waiting for a slot, in order of arrival
+        self._in_flight = 0
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+
+    @contextmanager
+    def limit(self):
+        """
+        Perform a request within the limits, waiting for its turn
+
+        The response's status code must be set in the admission, so overloads are detected.
+
+        :return: a context manager giving the Admission of the request
+        :raises ServiceRateLimited if the request waited for too long
+        """
+        admission = self._admit()
+        try:
+            yield admission
+        finally:
+            self._release(admission)
+
+    @asynccontextmanager
+    async def limit_async(self):
+        """
+        Perform a request within the limits, waiting for its turn without blocking the running event loop
+
+        The response's status code must be set in the admission, so overloads are detected.
+
+        :return: an asynchronous context manager giving the Admission of the request
+        :raises ServiceRateLimited if the request waited for too long
+        """
+        deadline = time.monotonic() + budget.bound(self.max_wait)
+        loop = asyncio.get_running_loop()
+        queued = False
+        while True:
+            waiter = None
+            with self._condition:
+                wait = self._try_admit(deadline, queued)
+                if wait is None:
+                    break
+                if self._is_full():
+                    waiter = (loop, loop.create_future())
+                    self._waiters.append(waiter)
+            queued = True
+            if waiter is None:
+                await asyncio.sleep(wait)  # a token is due by then
+            else:
+                await self._wait_for_slot(waiter, wait)
+
+        admission = Admission(time.monotonic())
+        try:
+            yield admission
+        finally:
+            self._release(admission)
+
+    def reset(self) -> None:
+        """
+        Go back to the initial limits, as if no request was performed
+        """
+        with self._condition:
+            self._token_bucket.reset()
+            self._concurrency_limit.reset()
+            self._wake_waiters()
+
+    def stats(self) -> RateLimiterStats:
+        """
+        Get a snapshot of the limiter counters
+
+        :return: the rate limiter stats
+        """
+        with self._condition:
+            return RateLimiterStats(admitted=self._admitted, queued=self._queued, rejected=self._rejected,
+                                    concurrency_limit=int(self._concurrency_limit.limit), in_flight=self._in_flight)
+
+    def _admit(self) -> Admission:
+        deadline = time.monotonic() + budget.bound(self.max_wait)
+        queued = False
+        with self._condition:
+            while True:
+                wait = self._try_admit(deadline, queued)
+                if wait is None:
+                    return Admission(time.monotonic())
+                queued = True
+                self._condition.wait(wait)  # a released request wakes it up earlier
+
+    def _try_admit(self, deadline: float, queued: bool) -> float:
+        """
+        Let a request through if it's within the limits. Must be called holding _condition.
+
+        :param deadline: the monotonic time the request is rejected at
+        :param queued: whether the request already waited
+        :return: None if the request was let through. Otherwise, the seconds to wait before trying again
+        :raises ServiceRateLimited if the deadline passed
+        """
+        now = time.monotonic()
+        wait = None
+        if self._is_full():
+            wait = math.inf  # until a request is released
+        else:
+            token_wait = self._token_bucket.take(now)
+            if token_wait:
+                wait = token_wait
+
+        if wait is None:
+            self._in_flight += 1
+            self._admitted += 1
+            return None
+        if now >= deadline:
+            self._rejected += 1
+            raise ServiceRateLimited()
+        if not queued:
+            self._queued += 1
+        return max(0., min(wait, deadline - now))
+
+    def _is_full(self) -> bool:
+        """
+        Tell whether the limit of concurrent requests is reached. Must be called holding _condition.
+        """
+        return self._in_flight >= max(1, int(self._concurrency_limit.limit))
+
+    async def _wait_for_slot(self, waiter: tuple, timeout: float) -> None:
+        """
+        Wait until the coroutine is woken up by a released request, or for timeout seconds. If it's cancelled once
+        woken up, the next one is woken up instead, so the slot is not lost
+
+        :param waiter: the loop of the coroutine, and the Future it's woken up through
+        :param timeout: the most seconds to wait
+        """
+        _, woken_up = waiter
+        try:
+            await asyncio.wait([woken_up], timeout=timeout)
+        except asyncio.CancelledError:
+            with self._condition:
+                if not self._forget_waiter(waiter):
+                    self._wake_waiters(1)
+            raise
+        with self._condition:
+            self._forget_waiter(waiter)
+
+    def _forget_waiter(self, waiter: tuple) -> bool:
+        """
+        Stop waking up a coroutine. Must be called holding _condition.
+
+        :return: whether it was still waiting, i.e. no released request woke it up
+        """
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return False
+        return True
+
+    def _wake_waiters(self, amount: int = None) -> None:
+        """
+        Wake up the threads waiting for a slot, and the first coroutines waiting for one: as many as slots are free, or
+        the given amount. Must be called holding _condition.
+        """
+        self._condition.notify_all()
+        if amount is None:
+            amount = max(1, int(self._concurrency_limit.limit)) - self._in_flight
+        for _ in range(min(amount, len(self._waiters))):
+            loop, woken_up = self._waiters.popleft()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_set_woken_up, woken_up)
+
+    def _release(self, admission: Admission) -> None:
+        now = time.monotonic()
+        with self._condition:
+            self._in_flight -= 1
+            self._concurrency_limit.record(now - admission.started_at, admission.overloaded, now)
+            self._wake_waiters()
+
+
+def _set_woken_up(woken_up: asyncio.Future) -> None:
+    if not woken_up.done():
+        woken_up.set_result(None)
@@ -0,0 +1,166 @@
+"""
+This module provides the pooled keep-alive HTTP sessions used to communicate with every upstream service
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .json_parsing import loads
+
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """
+    Lazily builds, and then holds, a single keep-alive session with a bounded connection pool.
+
+    A requests.Session with its own HTTPAdapter is safe to share among threads, as urllib3 pools are thread-safe.
+    Only its creation must be synchronized, so that every thread ends up sharing the very same pool.
+    """
+
+    def __init__(self, pool_size: int):
+        """
+        :param pool_size: the maximum amount of connections kept alive per host
+        """
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    def get(self) -> requests.Session:
+        """
+        Get the underlying session, creating it on the first call
+
+        :return: the pooled session
+        """
+        session = self._session
+        if session is None:
+            with self._lock:
+                session = self._session
+                if session is None:
+                    session = self._session = self._build_session()
+        return session
+
+    def close(self) -> None:
+        """
+        Close all the pooled connections. A new session is created if this instance is used again.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _build_session(self) -> requests.Session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+class AsyncPooledSession:
+    """
+    Holds one keep-alive aiohttp session, with a bounded connection pool, per event loop.
+
+    aiohttp sessions are bound to the loop they are created in, so each loop gets its own. Usually, there's a single
+    long-lived loop per process (the one the ASGI server runs on).
+    """
+
+    def __init__(self, pool_size: int):
+        """
+        :param pool_size: the maximum amount of connections kept alive
+        """
+        self.pool_size = pool_size
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def get(self) -> aiohttp.ClientSession:
+        """
+        Get the session for the running event loop, creating it on the first call
+
+        :return: the pooled aiohttp.ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            session = self._sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    async def warm_up(self, url: str, connections: int, timeout) -> None:
+        """
+        Open up to the given amount of connections to url from the running event loop, and leave them idle in the pool
+
+        Connections are opened concurrently, otherwise the pool would hand over the same connection again and again.
+        Any failure is logged and ignored, as an unavailable upstream must not prevent the app from starting.
+
+        :param url: an URL on the host to connect to
+        :param connections: the amount of connections to open
+        :param timeout: the connect and read timeouts, in seconds
+        """
+        connections = min(connections, self.pool_size)
+        if connections <= 0:
+            return
+
+        session = self.get()
+        connect_timeout, read_timeout = timeout
+        client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+        async def head():
+            async with session.head(url, timeout=client_timeout):
+                pass
+
+        results = await asyncio.gather(*[head() for _ in range(connections)], return_exceptions=True)
+        for result in results:
+            if isinstance(result, (aiohttp.ClientError, asyncio.TimeoutError)):
+                logger.warning('Could not pre-warm connection to %s', url)
+            elif isinstance(result, BaseException):
+                raise result
+
+    async def close(self) -> None:
+        """
+        Close the session for the running event loop, if any
+        """
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+class BufferedResponse:
+    """
+    A fully read HTTP response, exposing the same interface as requests' responses do
+
+    This allows parsing the responses retrieved asynchronously with the very same code as the synchronous ones.
+    """
+
+    def __init__(self, status_code: int, content: bytes, encoding: str = 'utf-8'):
+        """
+        :param status_code: the HTTP status code
+        :param content: the raw body
+        :param encoding: the body's encoding
+        """
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return loads(self.content)
+
+    @classmethod
+    async def read(cls, response: aiohttp.ClientResponse):
+        """
+        Read the whole body of an aiohttp response
+
+        :param response: the aiohttp response
+        :return: the corresponding BufferedResponse
+        """
+        content = await response.read()
+        return cls(response.status, content, response.get_encoding())
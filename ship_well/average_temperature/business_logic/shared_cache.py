@@ -0,0 +1,258 @@
+"""
+This module provides a cache shared by the worker processes of a host, so a value computed by one of them is visible to
+all of them.
+
+Entries are stored in a SQLite database, meant to live in memory backed storage (/dev/shm), which every process opens
+on its own. Besides the entries, it holds a fill lock per key: while a process computes a value, the rest of the
+processes wait for it instead of computing it as well, so a burst of lookups of the same key from every worker results
+in a single upstream request. Locks expire after the fill timeout, so a process that dies holding one doesn't block the
+rest.
+
+The asynchronous methods use the database on the fetch executor (see fetch_executor.py), as SQLite calls block, and the
+lock guarding the connection is never taken on the event loop.
+"""
+import asyncio
+from collections import namedtuple
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+from ship_well.settings import (
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_FILL_TIMEOUT,
+    SHARED_CACHE_POLL_INTERVAL,
+    READING_CACHE_TTL,
+    READING_CACHE_STALE_GRACE,
+)
+from . import budget
+from .fetch_executor import run_blocking
+
+
+SharedEntry = namedtuple('SharedEntry', [
+    'value',  # the value stored
+    'stored_at',  # when it was stored, as seconds since the epoch
+])
+
+SharedCacheStats = namedtuple('SharedCacheStats', [
+    'hits',  # amount of lookups answered by a value stored by another process
+    'fills',  # amount of values computed by this process, holding the fill lock
+    'waits',  # amount of lookups that waited for another process computing the same value
+    'timeouts',  # amount of waits that gave up and computed the value anyway
+])
+
+
+class SharedCache:
+    """
+    A thread-safe cache shared by processes through a SQLite database. Values must be numbers, strings or bytes
+    """
+    PRUNE_INTERVAL = 60  # seconds between the removal of the old entries and expired locks
+
+    def __init__(self, path: str, max_age: float, fill_timeout: float, poll_interval: float):
+        """
+        :param path: the path of the SQLite database. It's created if it doesn't exist. If it's None, nothing is
+        shared: values are always computed by the process looking them up
+        :param max_age: seconds an entry is kept
+        :param fill_timeout: seconds a process waits for another one computing a value before computing it itself,
+        if the latency budget of the request (see budget.py) doesn't run out earlier
+        :param poll_interval: seconds between lookups while waiting for another process
+        """
+        self.path = path
+        self.max_age = max_age
+        self.fill_timeout = fill_timeout
+        self.poll_interval = poll_interval
+
+        self._connection = None
+        self._pid = None  # the process that opened the connection, as connections don't survive a fork
+        self._lock = threading.Lock()  # guards the connection
+        self._stats_lock = threading.Lock()  # guards the counters, never held while the database is used
+        self._pruned_at = 0.
+        self._hits = 0
+        self._fills = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    def get(self, key: str) -> SharedEntry:
+        """
+        Get an entry from the cache
+
+        :param key: the entry's key
+        :return: the entry, or None if there's no entry for the key or it's older than max_age
+        """
+        if not self.path:
+            return None
+        oldest = time.time() - self.max_age
+        with self._lock:
+            row = self._get_connection().execute(
+                'SELECT value, stored_at FROM entry WHERE key = ? AND stored_at >= ?', (key, oldest)
+            ).fetchone()
+        return None if row is None else SharedEntry(*row)
+
+    def put(self, key: str, value) -> None:
+        """
+        Store a value in the cache
+
+        :param key: the entry's key
+        :param value: the value to store
+        """
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO entry (key, value, stored_at) VALUES (?, ?, ?)',
+                                   (key, value, now))
+                if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                    connection.execute('DELETE FROM entry WHERE stored_at < ?', (now - self.max_age,))
+                    connection.execute('DELETE FROM fill_lock WHERE expires_at < ?', (now,))
+                    self._pruned_at = now
+
+    async def put_async(self, key: str, value) -> None:
+        """
+        Store a value in the cache without blocking the running event loop
+
+        :param key: the entry's key
+        :param value: the value to store
+        """
+        if self.path:
+            await run_blocking(self.put, key, value)
+
+    async def fill_async(self, key: str, lookup: Callable, request: Callable, *args):
+        """
+        Get a value computed by any of the processes without blocking the running event loop, computing it only if no
+        other process is computing it
+
+        :param key: the value's key
+        :param lookup: returns the value if another process already computed it, or None. It's run on the fetch
+        executor
+        :param request: coroutine function that computes and stores the value
+        :param args: the arguments to call request with
+        :return: the value
+        """
+        if not self.path:
+            return await request(*args)
+
+        deadline = time.monotonic() + budget.bound(self.fill_timeout)
+        waited = False
+        while True:
+            value, locked = await run_blocking(self._look_up_or_lock_fill, key, lookup)
+            if value is not None:
+                self._record_hit(waited)
+                return value
+            if locked:
+                self._record_fill()
+                break
+            if time.monotonic() >= deadline:
+                self._record_timeout()
+                return await request(*args)
+            waited = True
+            await asyncio.sleep(self.poll_interval)
+
+        try:
+            return await request(*args)
+        finally:
+            await run_blocking(self._unlock_fill, key)
+
+    def clear(self) -> None:
+        """
+        Drop all the entries and locks, and reset the counters
+        """
+        with self._lock:
+            if self.path:
+                connection = self._get_connection()
+                with connection:
+                    connection.execute('DELETE FROM entry')
+                    connection.execute('DELETE FROM fill_lock')
+        with self._stats_lock:
+            self._hits = self._fills = self._waits = self._timeouts = 0
+
+    def stats(self) -> SharedCacheStats:
+        """
+        Get a snapshot of the counters of this process
+
+        :return: the shared cache stats
+        """
+        with self._stats_lock:
+            return SharedCacheStats(hits=self._hits, fills=self._fills, waits=self._waits, timeouts=self._timeouts)
+
+    def close(self) -> None:
+        """
+        Close the database connection. It's opened again if this instance is used again.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def _lock_fill(self, key: str) -> bool:
+        """
+        Take the fill lock of a key, unless another process holds it
+
+        :return: whether the lock was taken
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('DELETE FROM fill_lock WHERE key = ? AND expires_at < ?', (key, now))
+                cursor = connection.execute('INSERT OR IGNORE INTO fill_lock (key, expires_at) VALUES (?, ?)',
+                                            (key, now + self.fill_timeout))
+        return cursor.rowcount == 1
+
+    def _look_up_or_lock_fill(self, key: str, lookup: Callable) -> tuple:
+        """
+        Look a value up, taking the fill lock of its key if it's not there. It's looked up again once the lock is
+        taken, as the process that held it may have stored the value right before releasing it
+
+        :return: the value, or None, and whether the lock was taken
+        """
+        value = lookup()
+        if value is not None or not self._lock_fill(key):
+            return value, False
+        value = lookup()
+        if value is not None:
+            self._unlock_fill(key)
+            return value, False
+        return None, True
+
+    def _unlock_fill(self, key: str) -> None:
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('DELETE FROM fill_lock WHERE key = ?', (key,))
+
+    def _record_hit(self, waited: bool) -> None:
+        with self._stats_lock:
+            self._hits += 1
+            self._waits += waited
+
+    def _record_fill(self) -> None:
+        with self._stats_lock:
+            self._fills += 1
+
+    def _record_timeout(self) -> None:
+        with self._stats_lock:
+            self._waits += 1
+            self._timeouts += 1
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the database connection of this process, opening it on the first call. Must be called holding _lock.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            # every write takes the database lock right away, so concurrent fill locks are decided in order
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level='IMMEDIATE')
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # entries don't need to survive a crash
+            connection.execute('CREATE TABLE IF NOT EXISTS entry '
+                               '(key TEXT PRIMARY KEY, value NOT NULL, stored_at REAL NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS fill_lock (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, READING_CACHE_TTL + READING_CACHE_STALE_GRACE, SHARED_CACHE_FILL_TIMEOUT,
+                           SHARED_CACHE_POLL_INTERVAL)
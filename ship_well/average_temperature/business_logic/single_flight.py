@@ -0,0 +1,61 @@
+"""
+This module provides request coalescing: concurrent calls for the same key share a single in-flight execution, and all
+of them get its result or its error.
+"""
+import asyncio
+from collections import namedtuple
+from typing import Hashable
+import weakref
+
+from . import budget
+
+SingleFlightStats = namedtuple('SingleFlightStats', [
+    'executions',  # amount of times the underlying function was actually executed
+    'coalesced',  # amount of calls that joined an execution already in flight
+])
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent calls from several coroutines. Calls are only shared within the same event loop.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()  # loop -> {key -> Task of the call in flight}
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, coroutine_function, *args, **kwargs):
+        """
+        Await coroutine_function, unless there's already a call in flight for the same key. In that case, wait for it.
+        Callers wait as long as the latency budget of their request (see budget.py) lasts.
+
+        The shared call runs with no latency budget, as the callers joining it may have more time left than the one
+        that started it. Cancelling a caller doesn't cancel the shared call, as others may be waiting for it.
+
+        :param key: identifies the calls that can share an execution
+        :param coroutine_function: the coroutine function to await
+        :return: the coroutine's result
+        :raises the coroutine's exception, or asyncio.TimeoutError if the budget ran out while waiting
+        """
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is None:
+            with budget.latency_budget(None):
+                task = calls[key] = asyncio.ensure_future(coroutine_function(*args, **kwargs))
+            task.add_done_callback(lambda _: self._forget(calls, key, task))
+            self._executions += 1
+        else:
+            self._coalesced += 1
+
+        return await asyncio.wait_for(asyncio.shield(task), budget.remaining())
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(executions=self._executions, coalesced=self._coalesced)
+
+    @staticmethod
+    def _forget(calls: dict, key: Hashable, task: asyncio.Task) -> None:
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            task.exception()  # the error is retrieved even if every caller was cancelled
@@ -7,6 +7,8 @@ from ..exceptions import (
     ServiceUnexpectedResponse,
     ServiceConnectionError,
     ServiceUnexpectedStatusCode,
+    ServiceRateLimited,
+    ServiceTimeout,
 )
 
 
@@ -36,3 +38,25 @@ class TemperatureSourceUnexpectedStatusCode(TemperatureSourceException, ServiceU
     This exception is raised when the response HTTP_ERROR_CODE is unexpected
     """
     pass
+
+
+class TemperatureSourceUnavailable(TemperatureSourceException):
+    """
+    This exception is raised when the source is not requested, i.e. because its circuit breaker is open
+    """
+    pass
+
+
+class TemperatureSourceRateLimited(TemperatureSourceUnavailable, ServiceRateLimited):
+    """
+    This exception is raised when the source is not requested because too many requests are waiting for their turn,
+    so it's left out like any other unavailable source
+    """
+    pass
+
+
+class TemperatureSourceTimeout(TemperatureSourceException, ServiceTimeout):
+    """
+    This exception is raised when the source did not answer within the latency budget of the request
+    """
+    pass
@@ -0,0 +1,76 @@
+"""
+This module holds the registry of the temperature sources, by identifier.
+
+Sources are registered by the path of their class, and are only imported the first time the registry is asked for one
+of them. Listing the identifiers doesn't import anything, so importing the business logic doesn't import the sources
+nor the HTTP libraries they depend on (requests and aiohttp), which take most of the import time.
+"""
+from collections.abc import Mapping
+from importlib import import_module
+import threading
+from typing import Dict, Iterator
+
+from .constants import (
+    NOAA_SOURCE_NAME,
+    ACCUWEATHER_SOURCE_NAME,
+    WEATHER_DOT_COM_SOURCE_NAME,
+)
+
+
+class SourceRegistry(Mapping):
+    """
+    A read-only mapping from source identifier to WebAppTemperatureSource subclass, imported on first lookup
+    """
+
+    def __init__(self, paths: Dict[str, str], package: str = None):
+        """
+        :param paths: the path of the class of every source, as module.ClassName, by source identifier
+        :param package: the package relative module paths are resolved from
+        """
+        self.paths = paths
+        self.package = package
+        self._sources = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, type]:
+        """
+        Import every source, unless they were already imported
+
+        :return: the source classes, by identifier
+        """
+        sources = self._sources
+        if sources is None:
+            with self._lock:
+                sources = self._sources
+                if sources is None:
+                    sources = self._sources = {source_id: self._import(source_id, path)
+                                               for source_id, path in self.paths.items()}
+        return sources
+
+    def __getitem__(self, source_id: str) -> type:
+        if source_id not in self.paths:
+            raise KeyError(source_id)
+        return self.load()[source_id]
+
+    def __contains__(self, source_id) -> bool:
+        return source_id in self.paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _import(self, source_id: str, path: str) -> type:
+        module_path, _, class_name = path.rpartition('.')
+        source_class = getattr(import_module(module_path, self.package), class_name)
+        if source_class.ID != source_id:
+            raise ValueError('Source {} is registered as {}'.format(source_class.ID, source_id))
+        return source_class
+
+
+WEATHER_SOURCE = SourceRegistry({
+    NOAA_SOURCE_NAME: '.sources.NoaaTemperatureSource',
+    ACCUWEATHER_SOURCE_NAME: '.sources.AccuweatherTemperatureSource',
+    WEATHER_DOT_COM_SOURCE_NAME: '.sources.WeatherDotComTemperatureSource',
+}, __package__)
@@ -2,12 +2,47 @@
 This module isolates all the logic to retrieve current temperature from all allowed sources.
 """
 from abc import ABC, abstractmethod
+import asyncio
 import logging
 from urllib.parse import urljoin
 
-import requests
-from requests.exceptions import ConnectionError
-
+from aiohttp import ClientError, ClientTimeout
+from requests.exceptions import ConnectionError, Timeout
+
+from ship_well.settings import (
+    UPSTREAM_POOL_SIZE,
+    UPSTREAM_CONNECT_TIMEOUT,
+    UPSTREAM_READ_TIMEOUT,
+    CIRCUIT_BREAKER_WINDOW,
+    CIRCUIT_BREAKER_MIN_REQUESTS,
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_SLOW_REQUEST_DURATION,
+    CIRCUIT_BREAKER_SLOW_REQUEST_RATE,
+    CIRCUIT_BREAKER_OPEN_DURATION,
+    CIRCUIT_BREAKER_PROBES,
+    FAST_JSON_PARSING,
+    RATE_LIMIT_REQUESTS_PER_SECOND,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_WAIT,
+    CONCURRENCY_LIMIT_INITIAL,
+    CONCURRENCY_LIMIT_MIN,
+    CONCURRENCY_LIMIT_MAX,
+    CONCURRENCY_LIMIT_LATENCY_TOLERANCE,
+    CONCURRENCY_LIMIT_BACKOFF,
+    RATE_LIMITS_BY_SOURCE,
+)
+from .. import budget
+from ..circuit_breaker import CircuitBreaker
+from ..event_loop import fetch_loop
+from ..exceptions import ServiceRateLimited
+from ..json_parsing import loads
+from ..metrics import upstream_metrics
+from ..rate_limiter import RateLimiter
+from ..sessions import (
+    PooledSession,
+    AsyncPooledSession,
+    BufferedResponse,
+)
 from .constants import (
     MOCK_API_URL,
     NOAA_SOURCE_NAME,
@@ -15,18 +50,39 @@ from .constants import (
     WEATHER_DOT_COM_SOURCE_NAME,
 )
 
+from .registry import WEATHER_SOURCE
 from .utils import translate_from_farenheit_to_celsius
 
 from .exceptions import (
     TemperatureSourceException,
     TemperatureSourceConnectionError,
     TemperatureSourceUnexpectedResponse,
-    TemperatureSourceUnexpectedStatusCode
+    TemperatureSourceUnexpectedStatusCode,
+    TemperatureSourceRateLimited,
+    TemperatureSourceTimeout,
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _get_rate_limiter(source_id: str) -> RateLimiter:
+    """
+    Build the rate limiter of a source, with the settings overridden for it in RATE_LIMITS_BY_SOURCE
+    """
+    settings = {
+        'requests_per_second': RATE_LIMIT_REQUESTS_PER_SECOND,
+        'burst': RATE_LIMIT_BURST,
+        'initial_concurrency': CONCURRENCY_LIMIT_INITIAL,
+        'min_concurrency': CONCURRENCY_LIMIT_MIN,
+        'max_concurrency': CONCURRENCY_LIMIT_MAX,
+        'latency_tolerance': CONCURRENCY_LIMIT_LATENCY_TOLERANCE,
+        'backoff': CONCURRENCY_LIMIT_BACKOFF,
+        'max_wait': RATE_LIMIT_MAX_WAIT,
+    }
+    settings.update(RATE_LIMITS_BY_SOURCE.get(source_id, {}))
+    return RateLimiter(**settings)
+
+
 class WebAppTemperatureSource(ABC):
     """
     Abstract class to perform the retrieval of current temperature from web apps.
@@ -39,6 +95,24 @@ class WebAppTemperatureSource(ABC):
 
     RESPONSE_EXPECTED_STATUS_CODE = [200]   # list of the allowed HTTP ERROR CODE expected to get in the response
 
+    POOL_SIZE = UPSTREAM_POOL_SIZE  # the maximum amount of keep-alive connections to the web app
+    TIMEOUT = (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)  # connect and read timeouts, in seconds
+
+    _session = None  # the pooled session, owned by every subclass. See get_session
+    _async_session = None  # the pooled aiohttp session, owned by every subclass. See get_async_session
+    circuit_breaker = None  # the circuit breaker guarding the web app, owned by every subclass
+    rate_limiter = None  # the limiter of the rate and concurrency of the requests, owned by every subclass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._session = PooledSession(cls.POOL_SIZE)
+        cls._async_session = AsyncPooledSession(cls.POOL_SIZE)
+        cls.circuit_breaker = CircuitBreaker(CIRCUIT_BREAKER_WINDOW, CIRCUIT_BREAKER_MIN_REQUESTS,
+                                             CIRCUIT_BREAKER_FAILURE_RATE, CIRCUIT_BREAKER_SLOW_REQUEST_DURATION,
+                                             CIRCUIT_BREAKER_SLOW_REQUEST_RATE, CIRCUIT_BREAKER_OPEN_DURATION,
+                                             CIRCUIT_BREAKER_PROBES)
+        cls.rate_limiter = _get_rate_limiter(cls.ID)
+
     @classmethod
     def get_current_temperature(cls, latitude: float, longitude: float) -> float:
         """
@@ -50,35 +124,113 @@ class WebAppTemperatureSource(ABC):
         :param latitude: the desired latitude
         :param longitude: the desired longitude
         :return the current temperature in celsius degrees
+        :raise TemperatureSourceRateLimited if the request waited for too long for its turn (see rate_limiter)
+        :raise TemperatureSourceTimeout if the latency budget of the request ran out (see budget.py)
         :raise TemperatureSourceException the temperature can't be retrieved
         """
-        func = getattr(requests, cls.VERB)
+        func = getattr(cls.get_session(), cls.VERB)
         payload = cls._get_payload(latitude, longitude)
 
         try:
-            response = func(cls.BASE_URL, **payload)
-        except ConnectionError:
-            # Could not get to the source
-            logger.exception('Could not connect to %s', cls.ID)
-            raise TemperatureSourceConnectionError('Could not connect to source {}'.format(cls.ID))
-        else:
-            # check if the http status code is one of the expected, parse the response
-            if response.status_code in cls.RESPONSE_EXPECTED_STATUS_CODE:
+            with cls.rate_limiter.limit() as admission, upstream_metrics.track(cls.ID):
+                cls._check_budget()
                 try:
-                    return cls._parse_response(response)
-                except TemperatureSourceException:
-                    # it's one of the expected exception this class must raise. Logging it an re-raise
-                    logger.exception('Could not retrieve current temperature from %s', cls.ID)
-                    raise
-                except Exception:
-                    # it's an unexpected exception. Log it and raise the base exception
-                    logger.exception('Unknown error while parsing response from %s. Response %s',
-                                     cls.ID,
-                                     response.text)
-                    raise TemperatureSourceException('Could not retrieve current temperature from %s', cls.ID)
-            else:
-                # The status code is unexpected... Raise the corresponding exception
-                raise TemperatureSourceUnexpectedStatusCode(response.text)
+                    response = func(cls.BASE_URL, timeout=budget.bound_timeouts(*cls.TIMEOUT), **payload)
+                except (ConnectionError, Timeout):
+                    cls._check_budget()
+                    # Could not get to the source
+                    logger.exception('Could not connect to %s', cls.ID)
+                    raise TemperatureSourceConnectionError('Could not connect to source {}'.format(cls.ID))
+                else:
+                    admission.status_code = response.status_code
+                    return cls._handle_response(response)
+        except ServiceRateLimited:
+            raise TemperatureSourceRateLimited('Too many requests waiting for source {}'.format(cls.ID))
+
+    @classmethod
+    async def get_current_temperature_async(cls, latitude: float, longitude: float) -> float:
+        """
+        Get the current temperature in celsius degrees, without blocking the running event loop
+
+        This is the asynchronous counterpart of get_current_temperature. The request is performed with aiohttp, and
+        the response is parsed by the very same methods.
+
+        :param latitude: the desired latitude
+        :param longitude: the desired longitude
+        :return the current temperature in celsius degrees
+        :raise TemperatureSourceRateLimited if the request waited for too long for its turn (see rate_limiter)
+        :raise TemperatureSourceTimeout if the latency budget of the request ran out (see budget.py)
+        :raise TemperatureSourceException the temperature can't be retrieved
+        """
+        payload = cls._get_payload(latitude, longitude)
+
+        try:
+            async with cls.rate_limiter.limit_async() as admission:
+                with upstream_metrics.track(cls.ID):
+                    cls._check_budget()
+                    connect_timeout, read_timeout = budget.bound_timeouts(*cls.TIMEOUT)
+                    timeout = ClientTimeout(total=budget.remaining(), sock_connect=connect_timeout,
+                                            sock_read=read_timeout)
+                    try:
+                        async with cls.get_async_session().request(cls.VERB, cls.BASE_URL, timeout=timeout,
+                                                                   **payload) as response:
+                            response = await BufferedResponse.read(response)
+                    except (ClientError, asyncio.TimeoutError):
+                        cls._check_budget()
+                        # Could not get to the source, or its reply was cut short or malformed
+                        logger.exception('Could not connect to %s', cls.ID)
+                        raise TemperatureSourceConnectionError('Could not connect to source {}'.format(cls.ID))
+                    else:
+                        admission.status_code = response.status_code
+                        return cls._handle_response(response)
+        except ServiceRateLimited:
+            raise TemperatureSourceRateLimited('Too many requests waiting for source {}'.format(cls.ID))
+
+    @classmethod
+    def _check_budget(cls) -> None:
+        """
+        :raise TemperatureSourceTimeout if the latency budget of the request ran out
+        """
+        if budget.expired():
+            raise TemperatureSourceTimeout('Source {} did not answer within the latency budget'.format(cls.ID))
+
+    @classmethod
+    def get_session(cls):
+        """
+        Get the keep-alive session this source is requested through
+
+        Every subclass owns a single session, shared among all threads, so connections are reused across requests.
+
+        :return: the pooled requests.Session
+        """
+        return cls._session.get()
+
+    @classmethod
+    def warm_up(cls, connections: int) -> None:
+        """
+        Open connections to the web app ahead of time, so the first requests don't pay for the connection setup
+
+        They are opened from the fetch loop (see event_loop.py), which the app requests the web app from.
+
+        :param connections: the amount of connections to open
+        """
+        fetch_loop.run(cls._async_session.warm_up(cls.BASE_URL, connections, cls.TIMEOUT))
+
+    @classmethod
+    def get_async_session(cls):
+        """
+        Get the keep-alive aiohttp session this source is requested through from the running event loop
+
+        :return: the pooled aiohttp.ClientSession
+        """
+        return cls._async_session.get()
+
+    @classmethod
+    async def close_async_session(cls) -> None:
+        """
+        Close the keep-alive aiohttp session of the running event loop, before the loop is closed
+        """
+        await cls._async_session.close()
 
     @classmethod
     def from_source_name(cls, source_name: str):
@@ -94,6 +246,48 @@ class WebAppTemperatureSource(ABC):
         except KeyError:
             raise TemperatureSourceException('Invalid source {}'.format(source_name))
 
+    @classmethod
+    def _handle_response(cls, response) -> float:
+        """
+        Check the status code of a response and parse the current temperature from it
+
+        :param response: the HTTP response
+        :return: the current temperature in celsius degrees
+        :raise TemperatureSourceException the temperature can't be retrieved
+        """
+        # check if the http status code is one of the expected, parse the response
+        if response.status_code in cls.RESPONSE_EXPECTED_STATUS_CODE:
+            try:
+                return cls._parse_response(response)
+            except TemperatureSourceException:
+                # it's one of the expected exception this class must raise. Logging it an re-raise
+                logger.exception('Could not retrieve current temperature from %s', cls.ID)
+                raise
+            except Exception:
+                # it's an unexpected exception. Log it and raise the base exception
+                logger.exception('Unknown error while parsing response from %s. Response %s',
+                                 cls.ID,
+                                 response.text)
+                raise TemperatureSourceException('Could not retrieve current temperature from %s', cls.ID)
+        else:
+            # The status code is unexpected... Raise the corresponding exception
+            raise TemperatureSourceUnexpectedStatusCode(response.text, response.status_code)
+
+    @classmethod
+    def _get_json(cls, response):
+        """
+        Decode the JSON body of a response
+
+        If FAST_JSON_PARSING is enabled, it's decoded with orjson when installed (see json_parsing.py).
+
+        :param response: the HTTP response
+        :return: the decoded body
+        :raises ValueError if the body is not valid JSON
+        """
+        if not FAST_JSON_PARSING:
+            return response.json()
+        return loads(response.content)
+
     @classmethod
     @abstractmethod
     def _get_payload(cls, latitude: float, longitude: float) -> dict:
@@ -161,7 +355,7 @@ class NoaaTemperatureSource(WebAppTemperatureSource):
         :param response: the json response from noaa
         :return: the current temperature in celsius degrees
         """
-        current_weather = response.json()['today']['current']
+        current_weather = cls._get_json(response)['today']['current']
         return float(current_weather["celsius"])
 
 
@@ -223,7 +417,7 @@ class AccuweatherTemperatureSource(WebAppTemperatureSource):
         :return: the current temperature in celsius degrees
         :raises TemperatureSourceUnexpectedResponse if the response can't be parsed successfully
         """
-        json_response = response.json()
+        json_response = cls._get_json(response)
         forecastday = json_response['simpleforecast']['forecastday']
         if len(forecastday) != 1:
             raise TemperatureSourceUnexpectedResponse(json_response,
@@ -307,7 +501,7 @@ class WeatherDotComTemperatureSource(WebAppTemperatureSource):
         :raises TemperatureSourceUnexpectedResponse if the response can't be parsed
         """
         # success
-        json_response = response.json()
+        json_response = cls._get_json(response)
         query = json_response['query']
         if query['count'] != 1:
             raise TemperatureSourceUnexpectedResponse(json_response, 'Found multiple results in weather.com response')
@@ -322,6 +516,3 @@ class WeatherDotComTemperatureSource(WebAppTemperatureSource):
                 return translate_from_farenheit_to_celsius(temperature)
             else:
                 raise TemperatureSourceUnexpectedResponse(json_response, 'Unknown temperature unit {}'.format(unit))
-
-
-WEATHER_SOURCE = {cls.ID: cls for cls in WebAppTemperatureSource.__subclasses__()}
@@ -0,0 +1,123 @@
+"""
+This module translates zip codes into coordinates without any external service.
+
+It relies on a zip code index: a file with the coordinates of every zip code, compiled from a public dataset (see the
+build_zip_code_index management command) and bundled with the app. Its records have a fixed size and are sorted by
+zip code, so the file is memory-mapped rather than read and a zip code is found with a binary search over it. Nothing
+is loaded up front, and the pages of the file are shared by every process of the app through the page cache.
+"""
+import mmap
+import struct
+import threading
+from typing import Iterable, Optional, Tuple
+
+
+class ZipCodeIndex:
+    """
+    A lazily mapped, thread-safe zip code index
+    """
+    # magic, amount of records, size of the zip codes in bytes
+    HEADER = struct.Struct('<4sIB')
+    MAGIC = b'ZIPI'
+    # latitude and longitude, in 1 / COORDINATES_PRECISION degrees
+    COORDINATES = struct.Struct('<ii')
+    COORDINATES_PRECISION = 100000
+
+    def __init__(self, path: str):
+        """
+        :param path: the path of the compiled index
+        """
+        self.path = path
+        self._data = None
+        self._count = None
+        self._key_size = None
+        self._record_size = None
+        self._lock = threading.Lock()
+
+    def get(self, zip_code: str) -> Optional[Tuple[float, float]]:
+        """
+        Get the coordinates of a zip code
+
+        :param zip_code: the desired zip code. Surrounding blanks and case are ignored
+        :return: the tuple latitude - longitude, or None if the zip code is not in the index
+        """
+        if self._data is None:
+            self._load()
+
+        key = self.normalize(zip_code).encode('ascii', errors='replace')
+        if len(key) > self._key_size:
+            return None
+        key = key.ljust(self._key_size, b'\0')
+
+        data, key_size, record_size = self._data, self._key_size, self._record_size
+        low, high = 0, self._count
+        offset = self.HEADER.size
+        while low < high:
+            middle = (low + high) // 2
+            start = offset + middle * record_size
+            if data[start:start + key_size] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        start = offset + low * record_size
+        if low == self._count or data[start:start + key_size] != key:
+            return None
+
+        latitude, longitude = self.COORDINATES.unpack_from(data, start + key_size)
+        return latitude / self.COORDINATES_PRECISION, longitude / self.COORDINATES_PRECISION
+
+    def __len__(self) -> int:
+        if self._data is None:
+            self._load()
+        return self._count
+
+    def load(self) -> None:
+        """
+        Map the index now, instead of on the first lookup
+        """
+        if self._data is None:
+            self._load()
+
+    @staticmethod
+    def normalize(zip_code: str) -> str:
+        return zip_code.strip().upper()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._data is None:
+                with open(self.path, 'rb') as index_file:
+                    # the mapping outlives the file object
+                    data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, count, key_size = self.HEADER.unpack_from(data)
+                if magic != self.MAGIC:
+                    data.close()
+                    raise ValueError('{} is not a zip code index'.format(self.path))
+
+                self._count, self._key_size = count, key_size
+                self._record_size = key_size + self.COORDINATES.size
+                self._data = data
+
+    @classmethod
+    def save(cls, path: str, entries: Iterable[Tuple[str, float, float]]) -> int:
+        """
+        Write a compiled zip code index
+
+        :param path: the destination path
+        :param entries: the zip code, latitude and longitude of every location. If a zip code is repeated, the
+        latest entry is kept
+        :return: the amount of zip codes written
+        """
+        coordinates = {}
+        for zip_code, latitude, longitude in entries:
+            key = cls.normalize(zip_code).encode('ascii')
+            coordinates[key] = (round(latitude * cls.COORDINATES_PRECISION),
+                                round(longitude * cls.COORDINATES_PRECISION))
+
+        key_size = max(map(len, coordinates), default=0)
+        with open(path, 'wb') as index_file:
+            index_file.write(cls.HEADER.pack(cls.MAGIC, len(coordinates), key_size))
+            for key in sorted(coordinates, key=lambda key: key.ljust(key_size, b'\0')):
+                index_file.write(key.ljust(key_size, b'\0'))
+                index_file.write(cls.COORDINATES.pack(*coordinates[key]))
+        return len(coordinates)
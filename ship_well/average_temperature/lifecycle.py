@@ -0,0 +1,86 @@
+"""
+This module starts and stops the per-process work of the app: the connections kept alive to every source and the
+prefetch of the most requested locations.
+
+Threads and sockets don't survive a fork, so this work must be started in every process that serves requests, after
+it's forked. Everything that can be shared by the processes (the code, the source registry and the offline datasets)
+is loaded by preload instead, before forking, so the processes share its memory copy-on-write. The sources and the
+Google Maps API client are imported lazily otherwise (see temperature_source/registry.py).
+
+Single process servers start it when loading the app (see ship_well/wsgi.py and ship_well/asgi.py). The prefork server
+(see the serve management command) preloads the app and starts it in every worker.
+"""
+from importlib import import_module
+import logging
+import threading
+
+from ship_well.settings import UPSTREAM_PREWARM_CONNECTIONS, PREFETCH_HOT_LOCATIONS
+from .business_logic.event_loop import fetch_loop
+from .business_logic.fetch_executor import get_fetch_executor
+from .business_logic.geolocation import geocoding_cache, land_mask, zip_code_index
+from .business_logic.prefetch import prefetch_scheduler
+from .business_logic.shared_cache import shared_cache
+from .business_logic.temperature_source.registry import WEATHER_SOURCE
+
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_lock = threading.Lock()
+
+
+def preload() -> None:
+    """
+    Load everything the serving processes can share: the sources, the Google Maps API client and the offline datasets
+    """
+    WEATHER_SOURCE.load()
+    import_module('.business_logic.google_api.client', __package__)
+    logger.info('Preloaded %s sources', len(WEATHER_SOURCE))
+    land_mask.load()
+    zip_code_index.load()
+
+
+def start_worker() -> None:
+    """
+    Start the work of a serving process. It does nothing if it was already started in this process.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    # open the connections to every source before serving the first request
+    for source_class in WEATHER_SOURCE.values():
+        source_class.warm_up(UPSTREAM_PREWARM_CONNECTIONS)
+
+    # keep the readings of the most requested locations fresh
+    if PREFETCH_HOT_LOCATIONS:
+        prefetch_scheduler.start()
+
+
+def stop_worker() -> None:
+    """
+    Stop the work of a serving process that is exiting, once it served its last request
+    """
+    global _started
+    with _lock:
+        if not _started:
+            return
+        _started = False
+
+    prefetch_scheduler.stop()
+    fetch_loop.run(_close_upstream_sessions())
+    fetch_loop.stop()
+    get_fetch_executor().shutdown(wait=False)
+    geocoding_cache.close()
+    shared_cache.close()
+
+
+async def _close_upstream_sessions() -> None:
+    """
+    Close the keep-alive sessions to the upstream services, which belong to the fetch loop
+    """
+    for source_class in WEATHER_SOURCE.values():
+        await source_class.close_async_session()
+    await import_module('.business_logic.google_api.client', __package__).GoogleApiClient.close_async_session()
@@ -0,0 +1,156 @@
+"""
+Measure the throughput and latency of the average_temperature endpoint against an in-process stand-in for the
+upstream services, and report them as JSON.
+"""
+import asyncio
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from average_temperature.benchmark.load import (
+    get_request_paths,
+    google_maps_enabled,
+    run_level,
+    upstream_services_at,
+)
+from average_temperature.benchmark.stand_in import (
+    ServiceProfile,
+    StandInServer,
+    close_upstream_sessions,
+    NOAA_PATH,
+    ACCUWEATHER_PATH,
+    WEATHER_DOT_COM_PATH,
+    GOOGLE_MAPS_PATH,
+)
+from average_temperature.business_logic.event_loop import fetch_loop
+from average_temperature.business_logic.fetch import reading_cache, nearby_readings
+from average_temperature.business_logic.geocoding_cache import GeocodingCache
+from average_temperature.business_logic.prefetch import prefetch_scheduler
+from average_temperature.business_logic.shared_cache import shared_cache
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+
+
+SERVICE_PATHS = {
+    'noaa': NOAA_PATH,
+    'accuweather': ACCUWEATHER_PATH,
+    'weather.com': WEATHER_DOT_COM_PATH,
+    'google_maps': GOOGLE_MAPS_PATH,
+}
+
+
+def parse_profile(value: str):
+    """
+    Parse a service profile given as SERVICE=MEDIAN_MS,SIGMA,ERROR_RATE
+    """
+    try:
+        service, _, profile = value.partition('=')
+        median_ms, sigma, error_rate = profile.split(',')
+        return service, ServiceProfile(float(median_ms) / 1000, float(sigma), float(error_rate))
+    except ValueError:
+        raise CommandError('Invalid profile {}, expected SERVICE=MEDIAN_MS,SIGMA,ERROR_RATE'.format(value))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the average_temperature endpoint against a stand-in for the upstream services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50],
+                            help='the amounts of concurrent clients to measure, one run each')
+        parser.add_argument('--requests', type=int, default=1000, help='the amount of requests of every run')
+        parser.add_argument('--locations', type=int, default=100,
+                            help='the amount of distinct locations requested. The less, the more cache hits')
+        parser.add_argument('--zip-code-ratio', type=float, default=0.,
+                            help='the share of requests by zip code. The ones missing from the zip code index are '
+                                 'translated by the Google Maps stand-in')
+        parser.add_argument('--latency-ms', type=float, default=50., help='the median latency of every service')
+        parser.add_argument('--latency-sigma', type=float, default=0.5,
+                            help='the shape of the log-normal latency of every service. The larger, the longer tail')
+        parser.add_argument('--error-rate', type=float, default=0., help='the share of failed upstream requests')
+        parser.add_argument('--profile', action='append', default=[], type=parse_profile,
+                            help='the profile of a single service ({}), as SERVICE=MEDIAN_MS,SIGMA,ERROR_RATE'.format(
+                                ', '.join(SERVICE_PATHS)))
+        parser.add_argument('--warm', action='store_true',
+                            help='keep the caches between runs, instead of starting every run with empty caches')
+        parser.add_argument('--seed', type=int, default=None, help='seeds the locations, latencies and errors')
+        parser.add_argument('--output', default=None, help='where to write the report. By default, to stdout')
+
+    def handle(self, *args, **options):
+        for service, _ in options['profile']:
+            if service not in SERVICE_PATHS:
+                raise CommandError('Unknown service {}'.format(service))
+
+        # the background refreshes would add upstream requests the runs didn't ask for
+        prefetch_scheduler.stop()
+
+        report = asyncio.run(self._run(options))
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    async def _run(self, options) -> dict:
+        default_profile = ServiceProfile(options['latency_ms'] / 1000, options['latency_sigma'], options['error_rate'])
+        profiles = {SERVICE_PATHS[service]: profile for service, profile in options['profile']}
+        stand_in = StandInServer(profiles, default_profile, options['seed'])
+        url = await stand_in.start()
+
+        levels = []
+        geocoding_cache = None
+        shared_cache_path = shared_cache.path
+        with tempfile.TemporaryDirectory() as directory, upstream_services_at(url):
+            try:
+                for index, concurrency in enumerate(options['concurrency']):
+                    if geocoding_cache is None or not options['warm']:
+                        geocoding_cache = self._reset(geocoding_cache, os.path.join(directory, str(index)))
+                    stand_in.reset_counters()
+
+                    paths = get_request_paths(options['requests'], options['locations'], options['zip_code_ratio'],
+                                              options['seed'])
+                    with google_maps_enabled(geocoding_cache):
+                        level = await run_level(paths, concurrency)
+                    level['upstream_calls'] = {service: stand_in.calls[path]
+                                               for service, path in SERVICE_PATHS.items()}
+                    level['upstream_errors'] = {service: stand_in.errors[path]
+                                                for service, path in SERVICE_PATHS.items()}
+                    levels.append(level)
+            finally:
+                if geocoding_cache is not None:
+                    geocoding_cache.close()
+                shared_cache.close()
+                shared_cache.path = shared_cache_path
+                await fetch_loop.call(close_upstream_sessions())
+                await stand_in.stop()
+
+        return {
+            'parameters': {
+                name: options[name]
+                for name in ('requests', 'locations', 'zip_code_ratio', 'latency_ms', 'latency_sigma', 'error_rate',
+                             'warm', 'seed')
+            },
+            'profiles': {service: profile._asdict() for service, profile in options['profile']},
+            'levels': levels,
+        }
+
+    @staticmethod
+    def _reset(geocoding_cache: GeocodingCache, path: str) -> GeocodingCache:
+        """
+        Start a run from scratch: empty caches, closed circuit breakers and initial rate limits
+
+        :param geocoding_cache: the geocoding cache of the previous run, if any
+        :param path: where to store the new geocoding cache, and next to it the new shared cache
+        :return: the new geocoding cache
+        """
+        if geocoding_cache is not None:
+            geocoding_cache.close()
+        shared_cache.close()
+        shared_cache.path = path + '-shared'
+        reading_cache.clear()
+        nearby_readings.clear()
+        for source_class in WEATHER_SOURCE.values():
+            source_class.circuit_breaker.reset()
+            source_class.rate_limiter.reset()
+        return GeocodingCache(path, 1000)
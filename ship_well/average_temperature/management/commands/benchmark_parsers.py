@@ -0,0 +1,40 @@
+"""
+Compare, over recorded responses of every temperature source, the time to parse the current temperature by decoding
+the response with the standard library against the fast JSON parsing, and report them as JSON.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from average_temperature.benchmark.parsers import PAYLOADS_DIR, compare_parsers, load_payloads
+from average_temperature.business_logic.json_parsing import get_parser_name
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the JSON parsing of the temperature sources over recorded responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payloads', default=PAYLOADS_DIR,
+                            help='the directory of the recorded responses, one <source id>.json by source')
+        parser.add_argument('--number', type=int, default=10000, help='the amount of parses of every measure')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='the amount of measures of every parser. The fastest one is reported')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[0, 4096, 16384],
+                            help='the sizes in bytes to grow the recorded responses to. 0 stands for them as recorded')
+
+    def handle(self, *args, **options):
+        payloads = load_payloads(options['payloads'])
+        if not payloads:
+            raise CommandError('There are no recorded responses at {}'.format(options['payloads']))
+
+        try:
+            sources = compare_parsers(payloads, options['number'], options['repeat'], options['sizes'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = {
+            'parameters': {name: options[name] for name in ('number', 'repeat', 'sizes')},
+            'full_document_parser': get_parser_name(),
+            'sources': sources,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,66 @@
+"""
+Measure the cold start of the app, from spawning a new interpreter to its first response, against an in-process
+stand-in for the upstream services, and report it as JSON along with the slowest imports.
+"""
+import asyncio
+import json
+from statistics import median
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ship_well.settings import BASE_DIR
+from average_temperature.benchmark.stand_in import ServiceProfile, StandInServer
+from average_temperature.benchmark.startup import PHASES, measure_startup, summarize_import_times
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the time a new process takes to start the app and answer its first request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='the amount of processes started')
+        parser.add_argument('--top', type=int, default=15, help='the amount of slowest imports to report')
+        parser.add_argument('--latency-ms', type=float, default=1., help='the median latency of every source')
+        parser.add_argument('--output', default=None, help='where to write the report. By default, to stdout')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('At least one run is needed')
+
+        try:
+            report = asyncio.run(self._run(options))
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    async def _run(self, options) -> dict:
+        stand_in = StandInServer({}, ServiceProfile(options['latency_ms'] / 1000, 0., 0.))
+        url = await stand_in.start()
+        try:
+            runs = [await measure_startup(url, BASE_DIR) for _ in range(options['runs'])]
+            # importtime slows down the imports, so it's measured apart
+            import_time = (await measure_startup(url, BASE_DIR, import_time=True))['import_time']
+        finally:
+            await stand_in.stop()
+
+        phases = {}
+        for phase in PHASES:
+            measures = [run[phase] for run in runs]
+            phases[phase] = {'median_ms': round(median(measures), 3), 'max_ms': max(measures)}
+        time_to_first_response = [run['interpreter'] + run['boot'] + run['first_response'] for run in runs]
+
+        return {
+            'parameters': {name: options[name] for name in ('runs', 'latency_ms')},
+            'time_to_first_response_ms': {
+                'median_ms': round(median(time_to_first_response), 3),
+                'max_ms': round(max(time_to_first_response), 3),
+            },
+            'phases': phases,
+            'status_codes': sorted({run['status'] for run in runs}),
+            'slowest_imports': summarize_import_times(import_time, options['top']),
+        }
@@ -0,0 +1,123 @@
+"""
+Compile the land mask used to validate coordinates offline from a polygon shapefile.
+
+The bundled mask was compiled from Natural Earth's 1:110m countries (public domain, https://www.naturalearthdata.com),
+as shipped by geopandas 0.14 in datasets/naturalearth_lowres.
+"""
+import math
+import struct
+
+from django.core.management.base import BaseCommand
+
+from ship_well.settings import LAND_MASK_PATH
+from average_temperature.business_logic.land_mask import LandMask
+
+
+SHAPE_TYPE_POLYGON = 5
+
+
+def read_polygons(path: str):
+    """
+    Read the polygons of an ESRI shapefile
+
+    :param path: the path of the .shp file
+    :return: a list of polygons, each of them a list of rings, each of them a list of (longitude, latitude) points
+    """
+    with open(path, 'rb') as shp_file:
+        data = shp_file.read()
+
+    polygons = []
+    offset = 100  # skip the file header
+    while offset < len(data):
+        _, content_length = struct.unpack_from('>ii', data, offset)
+        offset += 8
+        content = data[offset:offset + content_length * 2]
+        offset += content_length * 2
+
+        shape_type, = struct.unpack_from('<i', content, 0)
+        if shape_type != SHAPE_TYPE_POLYGON:
+            continue
+
+        num_parts, num_points = struct.unpack_from('<ii', content, 36)
+        parts = list(struct.unpack_from('<{}i'.format(num_parts), content, 44)) + [num_points]
+        points = struct.unpack_from('<{}d'.format(num_points * 2), content, 44 + num_parts * 4)
+        polygons.append([
+            list(zip(points[start * 2:end * 2:2], points[start * 2 + 1:end * 2:2]))
+            for start, end in zip(parts, parts[1:])
+        ])
+    return polygons
+
+
+def rasterize(polygons, cell_size: float, coast_margin: int) -> bytearray:
+    """
+    Classify every cell of a world grid as water, land or coast
+
+    A cell is land if its center is inside any polygon. Cells up to coast_margin cells away from a cell of the other
+    class are coast.
+
+    :param polygons: the land polygons, as returned by read_polygons
+    :param cell_size: the side of every cell, in degrees
+    :param coast_margin: the amount of cells around a coastline considered ambiguous
+    :return: the cells' classes, row by row from the south-west corner
+    """
+    width, height = round(360 / cell_size), round(180 / cell_size)
+    cells = bytearray(width * height)
+
+    edges = []  # (min_latitude, max_latitude, (lon1, lat1), (lon2, lat2), polygon index)
+    for index, polygon in enumerate(polygons):
+        for ring in polygon:
+            for start, end in zip(ring, ring[1:] + ring[:1]):
+                edges.append((min(start[1], end[1]), max(start[1], end[1]), start, end, index))
+
+    for row in range(height):
+        latitude = -90 + (row + .5) * cell_size
+
+        # crossings of the row's center line with every polygon, so even-odd intervals are inside the polygon
+        crossings = {}
+        for min_latitude, max_latitude, (lon1, lat1), (lon2, lat2), index in edges:
+            if min_latitude <= latitude < max_latitude:
+                crossings.setdefault(index, []).append(lon1 + (latitude - lat1) * (lon2 - lon1) / (lat2 - lat1))
+
+        for polygon_crossings in crossings.values():
+            polygon_crossings.sort()
+            for west, east in zip(polygon_crossings[::2], polygon_crossings[1::2]):
+                first = max(0, math.ceil((west + 180) / cell_size - .5))
+                last = min(width - 1, math.floor((east + 180) / cell_size - .5))
+                cells[row * width + first:row * width + last + 1] = b'\x01' * max(0, last - first + 1)
+
+    # cells next to one of a different class are on a coastline
+    coastline = []
+    for row in range(height):
+        for column in range(width):
+            cell = cells[row * width + column]
+            if cell != cells[row * width + (column + 1) % width] or \
+                    (row + 1 < height and cell != cells[(row + 1) * width + column]):
+                coastline.append((row, column))
+
+    for row, column in coastline:
+        for coast_row in range(max(0, row - coast_margin), min(height, row + coast_margin + 2)):
+            for coast_column in range(column - coast_margin, column + coast_margin + 2):
+                cells[coast_row * width + coast_column % width] = LandMask.COAST
+
+    return cells
+
+
+class Command(BaseCommand):
+    help = 'Compile the land mask used to validate coordinates offline from a polygon shapefile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shapefile', help='the .shp file with the land (or countries) polygons')
+        parser.add_argument('--output', default=LAND_MASK_PATH, help='where to write the compiled mask')
+        parser.add_argument('--cell-size', type=float, default=.25, help='the side of every cell, in degrees')
+        parser.add_argument('--coast-margin', type=int, default=2,
+                            help='the amount of cells around a coastline considered ambiguous')
+
+    def handle(self, *args, **options):
+        polygons = read_polygons(options['shapefile'])
+        cells = rasterize(polygons, options['cell_size'], options['coast_margin'])
+
+        width, height = round(360 / options['cell_size']), round(180 / options['cell_size'])
+        LandMask.save(options['output'], cells, width, height, options['cell_size'])
+
+        self.stdout.write('Land mask written to {} ({} polygons, {}x{} cells)'.format(
+            options['output'], len(polygons), width, height))
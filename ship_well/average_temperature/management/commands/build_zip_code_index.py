@@ -0,0 +1,53 @@
+"""
+Compile the zip code index used to translate zip codes offline from a CSV file.
+
+The bundled index was compiled from the U.S. zip codes dataset of the zipcodes package 3.0.0 (MIT license,
+https://github.com/seanpianka/zipcodes), exported to CSV as:
+
+    python -c "import csv, sys, zipcodes; writer = csv.writer(sys.stdout);
+               writer.writerow(['zip_code', 'lat', 'long']);
+               writer.writerows((zc['zip_code'], zc['lat'], zc['long']) for zc in zipcodes.list_all())" > zip_codes.csv
+    python manage.py build_zip_code_index zip_codes.csv --latitude-column lat --longitude-column long
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ship_well.settings import ZIP_CODE_INDEX_PATH
+from average_temperature.business_logic.zip_code_index import ZipCodeIndex
+
+
+def read_entries(path: str, zip_code_column: str, latitude_column: str, longitude_column: str):
+    """
+    Read the zip code and coordinates of every row of a CSV file with a header row
+
+    Rows without coordinates are skipped.
+
+    :param path: the path of the CSV file
+    :return: an iterator of (zip code, latitude, longitude)
+    """
+    with open(path, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            if row[latitude_column] and row[longitude_column]:
+                yield row[zip_code_column], float(row[latitude_column]), float(row[longitude_column])
+
+
+class Command(BaseCommand):
+    help = 'Compile the zip code index used to translate zip codes offline from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='the CSV file with the zip code and coordinates of every location')
+        parser.add_argument('--output', default=ZIP_CODE_INDEX_PATH, help='where to write the compiled index')
+        parser.add_argument('--zip-code-column', default='zip_code', help='the column of the zip codes')
+        parser.add_argument('--latitude-column', default='latitude', help='the column of the latitudes')
+        parser.add_argument('--longitude-column', default='longitude', help='the column of the longitudes')
+
+    def handle(self, *args, **options):
+        entries = read_entries(options['csv_file'], options['zip_code_column'], options['latitude_column'],
+                               options['longitude_column'])
+        try:
+            count = ZipCodeIndex.save(options['output'], entries)
+        except KeyError as e:
+            raise CommandError('Missing column {} in {}'.format(e, options['csv_file']))
+
+        self.stdout.write('Zip code index written to {} ({} zip codes)'.format(options['output'], count))
@@ -0,0 +1,123 @@
+"""
+Run the production server: a master process that preloads the app and forks a worker per CPU.
+
+Everything that can be shared (the code, the source registry and the offline datasets) is loaded by the master before
+forking, so the workers share its memory copy-on-write. The per-process work (the connections kept alive to every
+source and the prefetch of the most requested locations) is started by every worker after it's forked, and stopped
+when it exits. See lifecycle.py.
+
+Whether it serves ASGI or WSGI, the upstream requests of a worker are performed on a single long-lived event loop
+(see business_logic/event_loop.py), as wsgi workers run every asynchronous view on a loop of its own, which is gone
+once the response is sent, along with any work it started.
+"""
+import gc
+import os
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+from ship_well.settings import (
+    SERVING_INTERFACE,
+    SERVING_BIND,
+    SERVING_WORKERS,
+    SERVING_THREADS,
+    SERVING_GRACEFUL_TIMEOUT,
+)
+from average_temperature import lifecycle
+
+
+class DjangoUvicornWorker(UvicornWorker):
+    """
+    A uvicorn worker for the Django ASGI app, which doesn't implement the lifespan protocol
+    """
+    CONFIG_KWARGS = dict(UvicornWorker.CONFIG_KWARGS, lifespan='off')
+
+
+def post_fork(server, worker) -> None:
+    lifecycle.start_worker()
+
+
+def worker_exit(server, worker) -> None:
+    lifecycle.stop_worker()
+
+
+class PreforkServer(BaseApplication):
+    """
+    A gunicorn server for an app loaded by this process
+    """
+
+    def __init__(self, application, options: dict):
+        """
+        :param application: the WSGI or ASGI app
+        :param options: the gunicorn settings
+        """
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        return self.application
+
+
+def get_options(interface: str, bind: str, workers: int, threads: int, graceful_timeout: int) -> dict:
+    """
+    Get the gunicorn settings of the server
+
+    :param interface: asgi or wsgi
+    :param bind: the address to listen on, as HOST:PORT
+    :param workers: the amount of worker processes
+    :param threads: the amount of threads of every wsgi worker
+    :param graceful_timeout: the seconds every worker has to finish the requests in progress on restart or shutdown
+    :return: the settings by name
+    """
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'graceful_timeout': graceful_timeout,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+    if interface == 'asgi':
+        options['worker_class'] = '{}.{}'.format(__name__, DjangoUvicornWorker.__name__)
+    else:
+        options['worker_class'] = 'gthread'
+        options['threads'] = threads
+    return options
+
+
+class Command(BaseCommand):
+    help = 'Run the production server, with a worker process per CPU forked from a preloaded app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=['asgi', 'wsgi'], default=SERVING_INTERFACE,
+                            help='asgi runs an event loop per worker, wsgi a pool of threads per worker')
+        parser.add_argument('--bind', default=SERVING_BIND, help='the address to listen on, as HOST:PORT')
+        parser.add_argument('--workers', type=int, default=SERVING_WORKERS or os.cpu_count() or 1,
+                            help='the amount of worker processes. By default, one per CPU')
+        parser.add_argument('--threads', type=int, default=SERVING_THREADS,
+                            help='the amount of threads of every wsgi worker')
+        parser.add_argument('--graceful-timeout', type=int, default=SERVING_GRACEFUL_TIMEOUT,
+                            help='the seconds every worker has to finish the requests in progress on shutdown')
+
+    def handle(self, *args, **options):
+        if options['interface'] == 'asgi':
+            application = get_asgi_application()
+        else:
+            application = get_wsgi_application()
+        lifecycle.preload()
+
+        # move everything loaded so far out of the collector's reach: collections in the workers would otherwise
+        # touch every object, copying the shared pages
+        gc.collect()
+        gc.freeze()
+
+        PreforkServer(application, get_options(options['interface'], options['bind'], options['workers'],
+                                               options['threads'], options['graceful_timeout'])).run()
@@ -0,0 +1,30 @@
+from average_temperature.benchmark.parsers import compare_parsers, grow_payload, load_payloads
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+
+
+def test_compare_parsers():
+    """
+    Test both parsers read the same temperature from the recorded response of every source
+    """
+    payloads = load_payloads()
+    assert set(payloads) == set(WEATHER_SOURCE)
+
+    results = compare_parsers(payloads, number=10, repeat=1, sizes=[0, 4096])
+    assert set(results) == set(WEATHER_SOURCE)
+    for source, celsius in [('noaa', 12), ('accuweather', 12), ('weather.com', 2.8)]:
+        assert [round(result['celsius'], 1) for result in results[source]] == [celsius, celsius]
+        assert results[source][0]['bytes'] == len(payloads[source])
+        assert results[source][1]['bytes'] >= 4096
+    for result in sum(results.values(), []):
+        assert result['full_parse_us'] > 0 and result['fast_parse_us'] > 0
+
+
+def test_grow_payload():
+    """
+    Test recorded responses are grown to about the given size, and larger ones are left as they are
+    """
+    content = b'{"today": {"current": {"celsius": "12"}}}'
+    assert grow_payload(content, 0) == content
+    grown = grow_payload(content, 1000)
+    assert 1000 <= len(grown) < 1200
+    assert grown.startswith(content[:-1])
@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import patch
+from urllib.parse import urljoin
+
+from pytest import raises
+
+from average_temperature.benchmark.stand_in import (
+    ServiceProfile,
+    StandInServer,
+    close_upstream_sessions,
+    NOAA_PATH,
+    GOOGLE_MAPS_PATH,
+)
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+from average_temperature.business_logic.temperature_source.exceptions import TemperatureSourceUnexpectedStatusCode
+
+
+def test_stand_in_answers_as_the_upstream_services():
+    """
+    Check every source and Google Maps API can parse the responses of the stand-in, and that the calls are counted
+    """
+    async def request_all():
+        stand_in = StandInServer({}, ServiceProfile(0.001, 0.5, 0.), seed=1)
+        url = await stand_in.start()
+        try:
+            temperatures = []
+            for source_class in WEATHER_SOURCE.values():
+                with patch.object(source_class, 'BASE_URL', urljoin(url, source_class.BASE_URL.rpartition('/')[2])):
+                    temperatures.append(await source_class.get_current_temperature_async(1.0, 2.0))
+
+            with patch.object(GoogleApiClient, 'GOOGLE_MAPS_API_URL', urljoin(url, GOOGLE_MAPS_PATH)):
+                client = GoogleApiClient('key')
+                coordinates = await client.get_location_from_zip_code_async('10001')
+                is_valid = await client.check_coordinates_validity_async(1.0, 2.0)
+            return temperatures, coordinates, is_valid, dict(stand_in.calls)
+        finally:
+            await close_upstream_sessions()
+            await stand_in.stop()
+
+    temperatures, coordinates, is_valid, calls = asyncio.run(request_all())
+    assert all(isinstance(temperature, float) for temperature in temperatures)
+    assert len(coordinates) == 2
+    assert is_valid
+    assert sum(calls.values()) == 5
+
+
+def test_stand_in_fails_as_configured():
+    """
+    Check the stand-in answers with an error the configured share of the requests of a service
+    """
+    async def request_noaa():
+        noaa = WEATHER_SOURCE['noaa']
+        stand_in = StandInServer({NOAA_PATH: ServiceProfile(0.001, 0.5, 1.)}, ServiceProfile(0.001, 0.5, 0.))
+        url = await stand_in.start()
+        try:
+            with patch.object(noaa, 'BASE_URL', urljoin(url, NOAA_PATH)):
+                with raises(TemperatureSourceUnexpectedStatusCode):
+                    await noaa.get_current_temperature_async(1.0, 2.0)
+            return stand_in.errors[NOAA_PATH]
+        finally:
+            await close_upstream_sessions()
+            await stand_in.stop()
+
+    assert asyncio.run(request_noaa()) == 1
@@ -0,0 +1,19 @@
+from average_temperature.benchmark.startup import summarize_import_times
+
+
+def test_summarize_import_times():
+    """
+    Check only the modules imported directly are reported, from the slowest
+    """
+    output = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       100 |        100 |   urllib3',
+        'import time:       300 |        400 | requests',
+        'import time:      2000 |       2000 | aiohttp',
+        'import time:        50 |         50 | json',
+        'Unclosed client session',
+    ])
+    assert summarize_import_times(output, 2) == [
+        {'module': 'aiohttp', 'self_ms': 2., 'cumulative_ms': 2.},
+        {'module': 'requests', 'self_ms': 0.3, 'cumulative_ms': 0.4},
+    ]
@@ -52,7 +52,8 @@ def test_temperature_successfully_retrieved(requests_mock_get):
     assert current_temperature == 12.0
 
     # check the request is made properly
-    get.assert_called_with(AccuweatherTemperatureSource.BASE_URL, params={'latitude': 1.0, 'longitude': 2.0})
+    get.assert_called_with(AccuweatherTemperatureSource.BASE_URL, params={'latitude': 1.0, 'longitude': 2.0},
+                           timeout=AccuweatherTemperatureSource.TIMEOUT)
 
 
 @mark.parametrize('status_code', [500, 400, 404])
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from aiohttp import ClientConnectionError, ClientPayloadError
+from pytest import (
+    mark,
+    raises,
+)
+
+from average_temperature.business_logic.temperature_source.sources import (
+    NoaaTemperatureSource,
+    AccuweatherTemperatureSource,
+    WeatherDotComTemperatureSource,
+)
+from average_temperature.business_logic.temperature_source.exceptions import (
+    TemperatureSourceConnectionError,
+    TemperatureSourceUnexpectedStatusCode,
+)
+
+
+@mark.parametrize('source_class, body, payload', [
+    (NoaaTemperatureSource,
+     {'today': {'current': {'fahrenheit': '55', 'celsius': '12'}}},
+     {'params': {'latlon': '1.0,2.0'}}),
+    (AccuweatherTemperatureSource,
+     {'simpleforecast': {'forecastday': [{'current': {'fahrenheit': '55', 'celsius': '12'}}]}},
+     {'params': {'latitude': 1.0, 'longitude': 2.0}}),
+    (WeatherDotComTemperatureSource,
+     {'query': {'count': 1, 'results': {'channel': {'units': {'temperature': 'C'}, 'condition': {'temp': '12'}}}}},
+     {'json': {'lat': 1.0, 'lon': 2.0}}),
+])
+def test_temperature_successfully_retrieved(aiohttp_mock_session, source_class, body, payload):
+    """
+    Check that the asynchronous request to every source is properly build and the current temperature
+    is successfully retrieved
+    """
+    session, response = aiohttp_mock_session
+    response.status = 200
+    response.read.return_value = json.dumps(body).encode()
+
+    current_temperature = asyncio.run(source_class.get_current_temperature_async(1.0, 2.0))
+
+    # check the current temperature is successfully retrieved
+    assert current_temperature == 12.0
+
+    # check the request is made properly
+    args, kwargs = session.request.call_args
+    assert args == (source_class.VERB, source_class.BASE_URL)
+    assert {key: value for key, value in kwargs.items() if key != 'timeout'} == payload
+
+
+@mark.parametrize('status_code', [500, 400, 404])
+def test_unexpected_status_code(aiohttp_mock_session, status_code):
+    """
+    Check that the corresponding exception is raised if the status code in the response is unexpected
+    """
+    _, response = aiohttp_mock_session
+    response.status = status_code
+    response.read.return_value = b'This is a dummy text'
+
+    with raises(TemperatureSourceUnexpectedStatusCode) as exc_info:
+        asyncio.run(NoaaTemperatureSource.get_current_temperature_async(1.0, 2.0))
+
+    exc = exc_info.value
+    assert exc.response == 'This is a dummy text'
+
+
+@mark.parametrize('error', [ClientConnectionError(), asyncio.TimeoutError()])
+def test_connection_error(aiohttp_mock_session, error):
+    """
+    Check that the corresponding exception is raised if the source can't be reached
+    """
+    session, _ = aiohttp_mock_session
+    session.request.return_value.__aenter__.side_effect = error
+
+    with raises(TemperatureSourceConnectionError):
+        asyncio.run(NoaaTemperatureSource.get_current_temperature_async(1.0, 2.0))
+
+
+def test_truncated_response(aiohttp_mock_session):
+    """
+    Check that a reply cut short counts as a connection error, so it's accounted as a failure of the source
+    """
+    _, response = aiohttp_mock_session
+    response.status = 200
+    response.read.side_effect = ClientPayloadError('Response payload is not completed')
+
+    with raises(TemperatureSourceConnectionError):
+        asyncio.run(NoaaTemperatureSource.get_current_temperature_async(1.0, 2.0))
@@ -1,10 +1,16 @@
+from unittest.mock import patch
+
 from pytest import (
     mark,
     raises,
 )
 
+from average_temperature.business_logic.budget import latency_budget
+from average_temperature.business_logic.rate_limiter import RateLimiter
 from average_temperature.business_logic.temperature_source.sources import NoaaTemperatureSource
 from average_temperature.business_logic.temperature_source.exceptions import (
+    TemperatureSourceRateLimited,
+    TemperatureSourceTimeout,
     TemperatureSourceUnexpectedStatusCode,
     TemperatureSourceException,
 )
@@ -40,7 +46,8 @@ def test_temperature_successfully_retrieved(requests_mock_get):
     assert current_temperature == 12.0
 
     # check the request is made properly
-    get.assert_called_with(NoaaTemperatureSource.BASE_URL, params={'latlon': '1.0,2.0'})
+    get.assert_called_with(NoaaTemperatureSource.BASE_URL, params={'latlon': '1.0,2.0'},
+                           timeout=NoaaTemperatureSource.TIMEOUT)
 
 
 @mark.parametrize('status_code', [500, 400, 404])
@@ -57,6 +64,7 @@ def test_unexpected_status_code(requests_mock_get, status_code):
 
     exc = exc_info.value
     assert exc.response == response.text
+    assert exc.status_code == status_code
 
 
 @mark.parametrize('invalid_response', [
@@ -76,3 +84,42 @@ def test_unexpected_response(requests_mock_get, invalid_response):
 
     with raises(TemperatureSourceException):
         NoaaTemperatureSource.get_current_temperature(1.0, 2.0)
+
+
+def test_rate_limited(requests_mock_get, monkeypatch):
+    """
+    Check that an overloaded source gets fewer concurrent requests, and requests over its rate are not performed
+    """
+    rate_limiter = RateLimiter(requests_per_second=1, burst=1, initial_concurrency=4, min_concurrency=1,
+                               max_concurrency=4, latency_tolerance=2, backoff=0.5, max_wait=0.01)
+    monkeypatch.setattr(NoaaTemperatureSource, 'rate_limiter', rate_limiter)
+    get, response = requests_mock_get
+    response.status_code = 503
+    response.text = 'Service Unavailable'
+
+    with raises(TemperatureSourceUnexpectedStatusCode):
+        NoaaTemperatureSource.get_current_temperature(1.0, 2.0)
+    assert rate_limiter.stats().concurrency_limit == 2
+
+    with raises(TemperatureSourceRateLimited):
+        NoaaTemperatureSource.get_current_temperature(1.0, 2.0)
+    assert get.call_count == 1
+
+
+def test_latency_budget(requests_mock_get):
+    """
+    Check the request only gets what's left of the latency budget, and it's not performed once the budget ran out
+    """
+    get, response = requests_mock_get
+    response.status_code = 200
+    response.json = lambda: {'today': {'current': {'celsius': '12'}}}
+
+    with patch('time.monotonic', return_value=100.):
+        with latency_budget(2.):
+            assert NoaaTemperatureSource.get_current_temperature(1.0, 2.0) == 12.
+            get.assert_called_with(NoaaTemperatureSource.BASE_URL, params={'latlon': '1.0,2.0'}, timeout=(2., 2.))
+
+    with latency_budget(0.):
+        with raises(TemperatureSourceTimeout):
+            NoaaTemperatureSource.get_current_temperature(1.0, 2.0)
+    assert get.call_count == 1
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+from pytest import raises
+
+from average_temperature.business_logic.temperature_source.registry import SourceRegistry, WEATHER_SOURCE
+from average_temperature.business_logic.temperature_source.sources import (
+    NoaaTemperatureSource,
+    WebAppTemperatureSource,
+)
+from average_temperature.business_logic.temperature_source.exceptions import TemperatureSourceException
+
+
+def test_sources_are_looked_up_by_identifier():
+    """
+    Check every source is registered under its identifier
+    """
+    assert set(WEATHER_SOURCE) == {'noaa', 'accuweather', 'weather.com'}
+    assert set(WEATHER_SOURCE.values()) == set(WebAppTemperatureSource.__subclasses__())
+    assert WebAppTemperatureSource.from_source_name('noaa') is NoaaTemperatureSource
+    with raises(TemperatureSourceException):
+        WebAppTemperatureSource.from_source_name('unknown')
+
+
+def test_sources_are_imported_on_first_lookup():
+    """
+    Check listing the identifiers doesn't import the sources, and a source is checked against its identifier
+    """
+    registry = SourceRegistry({'weather.com': '.sources.NoaaTemperatureSource'}, WEATHER_SOURCE.package)
+    assert list(registry) == ['weather.com']
+    assert 'weather.com' in registry and len(registry) == 1
+    with raises(ValueError):
+        registry['weather.com']
+    with raises(KeyError):
+        registry['noaa']
+
+
+def test_business_logic_import_is_light():
+    """
+    Check importing the views and the business logic doesn't import the sources nor the HTTP libraries
+    """
+    code = ('import os, sys; os.environ["DJANGO_SETTINGS_MODULE"] = "ship_well.settings"; '
+            'import django; django.setup(); import average_temperature.views; '
+            'print(" ".join(sorted(module for module in ("aiohttp", "requests", "{}") if module in sys.modules)))'
+            .format(NoaaTemperatureSource.__module__))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == []
@@ -67,7 +67,8 @@ def test_temperature_successfully_retrieved(requests_mock_post):
     assert current_temperature == 37.0
 
     # check the request is made properly
-    post.assert_called_with(WeatherDotComTemperatureSource.BASE_URL, json={'lat': 1.0, 'lon': 2.0})
+    post.assert_called_with(WeatherDotComTemperatureSource.BASE_URL, json={'lat': 1.0, 'lon': 2.0},
+                            timeout=WeatherDotComTemperatureSource.TIMEOUT)
 
 
 def test_temperature_successfully_retrieved_fahrenheit_conversion(requests_mock_post):
@@ -127,7 +128,8 @@ def test_temperature_successfully_retrieved_fahrenheit_conversion(requests_mock_
     assert current_temperature == (90 - 32) * 5./9.
 
     # check the request is made properly
-    post.assert_called_with(WeatherDotComTemperatureSource.BASE_URL, json={'lat': 1.0, 'lon': 2.0})
+    post.assert_called_with(WeatherDotComTemperatureSource.BASE_URL, json={'lat': 1.0, 'lon': 2.0},
+                            timeout=WeatherDotComTemperatureSource.TIMEOUT)
 
 
 @mark.parametrize('status_code', [500, 400, 404])
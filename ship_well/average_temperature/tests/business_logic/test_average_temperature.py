@@ -0,0 +1,363 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock
+
+from pytest import (
+    approx,
+    fixture,
+    raises,
+)
+
+from average_temperature.business_logic import (
+    get_average_temperature,
+    get_average_temperature_async,
+    get_average_temperature_detail,
+    get_average_temperature_detail_async,
+)
+from average_temperature.business_logic import average_temperature as average_temperature_module
+from average_temperature.business_logic import fetch
+from average_temperature.business_logic.budget import latency_budget
+from average_temperature.business_logic.cache import ReadingCache
+from average_temperature.business_logic.exceptions import ServiceRateLimited
+from average_temperature.business_logic.event_loop import fetch_loop
+from average_temperature.business_logic.latency import LatencyTracker
+from average_temperature.business_logic.nearby import NearbyReadings
+from average_temperature.business_logic.rate_limiter import RateLimiter
+from average_temperature.business_logic.temperature_source.sources import (
+    NoaaTemperatureSource,
+    AccuweatherTemperatureSource,
+    WeatherDotComTemperatureSource,
+)
+from average_temperature.business_logic.temperature_source.exceptions import (
+    TemperatureSourceConnectionError,
+    TemperatureSourceRateLimited,
+    TemperatureSourceTimeout,
+    TemperatureSourceUnavailable,
+    TemperatureSourceUnexpectedStatusCode,
+)
+
+
+@fixture
+def sources_mock(monkeypatch, reading_cache, nearby_readings, circuit_breakers):
+    mocks = {}
+    for source_class, temperature in [(NoaaTemperatureSource, 10.),
+                                      (AccuweatherTemperatureSource, 20.),
+                                      (WeatherDotComTemperatureSource, 30.)]:
+        get = AsyncMock(return_value=temperature)
+        monkeypatch.setattr(source_class, 'get_current_temperature_async', get)
+        mocks[source_class.ID] = get
+    yield mocks
+    # the requests left in the background must not outlive the test
+    fetch_loop.stop()
+
+
+async def _slow_get(*args):
+    return await asyncio.sleep(10, 30.)
+
+
+async def _join_background_requests(timeout: float = 5.):
+    """
+    Wait for the requests left in the background of the fetch loop to finish, for up to timeout seconds
+    """
+    requests = asyncio.all_tasks() - {asyncio.current_task()}
+    if requests:
+        await asyncio.wait(requests, timeout=timeout)
+
+
+def test_average_temperature_from_all_sources(sources_mock):
+    """
+    Check the average is computed from all the sources if there are no filters
+    """
+    assert get_average_temperature(1.0, 2.0) == 20.
+    assert asyncio.run(get_average_temperature_async(1.0, 2.0)) == 20.
+
+
+def test_average_temperature_from_filtered_sources(sources_mock):
+    """
+    Check only the desired sources are requested
+    """
+    assert get_average_temperature(1.0, 2.0, ['noaa', 'weather.com']) == 20.
+
+    sources_mock['accuweather'].assert_not_called()
+
+
+def test_readings_are_served_from_cache(sources_mock):
+    """
+    Check that a source is not requested again for a nearby location, whatever the filters are
+    """
+    assert get_average_temperature_detail(40.7142, -73.9614, ['noaa']).max_age == approx(300, abs=1)
+    assert get_average_temperature(40.7143, -73.9615) == 20.
+    assert asyncio.run(get_average_temperature_async(40.7143, -73.9615)) == 20.
+
+    for get in sources_mock.values():
+        assert get.call_count == 1
+
+
+def test_stale_readings_are_served_while_revalidated(sources_mock, monkeypatch):
+    """
+    Check that a stale reading is served right away, and refreshed once in the background
+    """
+    monkeypatch.setattr(fetch, 'reading_cache', ReadingCache(max_entries=10, ttl=0, grid_size=0.01, grace=60))
+    monkeypatch.setattr(average_temperature_module, 'nearby_readings', NearbyReadings(0, 0, 0))
+    release = threading.Event()
+    get = sources_mock['noaa']
+    answers = iter([10., 16.])
+
+    async def get_side_effect(*args):
+        temperature = next(answers)
+        if temperature == 16.:
+            await asyncio.to_thread(release.wait, 5)
+        return temperature
+
+    get.side_effect = get_side_effect
+
+    assert get_average_temperature(1.0, 2.0, ['noaa']) == 10.
+    assert get_average_temperature(1.0, 2.0, ['noaa']) == 10.
+    [revalidation] = fetch._revalidations.values()
+    assert get_average_temperature(1.0, 2.0, ['noaa']) == 10.
+
+    release.set()
+    assert fetch_loop.run(asyncio.wait_for(revalidation, 5)) == 16.
+    assert fetch.reading_cache.get_stale_reading('noaa', 1.0, 2.0) == (16., False)
+    assert get.call_count == 2
+
+
+def test_background_refreshes_outlive_the_loop_of_the_request(sources_mock, monkeypatch):
+    """
+    Check that a refresh started by a request served on an event loop of its own, as under WSGI, is not cancelled
+    once that loop is closed
+    """
+    monkeypatch.setattr(fetch, 'reading_cache', ReadingCache(max_entries=10, ttl=0, grid_size=0.01, grace=60))
+    monkeypatch.setattr(average_temperature_module, 'nearby_readings', NearbyReadings(0, 0, 0))
+    release = threading.Event()
+    get = sources_mock['noaa']
+    answers = iter([10., 16.])
+
+    async def get_side_effect(*args):
+        temperature = next(answers)
+        if temperature == 16.:
+            await asyncio.to_thread(release.wait, 5)
+        return temperature
+
+    get.side_effect = get_side_effect
+
+    for _ in range(2):
+        assert asyncio.run(get_average_temperature_async(1.0, 2.0, ['noaa'])) == 10.
+    [revalidation] = fetch._revalidations.values()
+
+    release.set()
+    assert fetch_loop.run(asyncio.wait_for(revalidation, 5)) == 16.
+
+
+def test_failed_readings_are_not_cached(sources_mock):
+    """
+    Check that a source failure is propagated and not cached
+    """
+    get = sources_mock['noaa']
+    get.side_effect = TemperatureSourceConnectionError('foo')
+
+    with raises(TemperatureSourceConnectionError):
+        get_average_temperature(1.0, 2.0)
+
+    get.side_effect = None
+    assert get_average_temperature(1.0, 2.0) == 20.
+
+
+def test_latency_oriented_average_skips_failed_and_slow_sources(sources_mock, monkeypatch):
+    """
+    Check that in latency oriented mode the average is returned once the quorum answered, leaving out failed sources
+    """
+    monkeypatch.setattr(average_temperature_module, 'latency_tracker', LatencyTracker())
+    monkeypatch.setattr(average_temperature_module, 'AVERAGE_QUORUM', 1)
+    sources_mock['noaa'].side_effect = TemperatureSourceConnectionError('foo')
+    sources_mock['weather.com'].side_effect = _slow_get
+
+    detail = get_average_temperature_detail(1.0, 2.0, latency_oriented=True)
+    assert detail[:3] == (20., ['accuweather'], 0.)
+
+    detail = asyncio.run(get_average_temperature_detail_async(3.0, 4.0, latency_oriented=True))
+    assert detail[:3] == (20., ['accuweather'], 0.)
+
+
+def test_latency_oriented_average_hedges_slow_sources(sources_mock, monkeypatch):
+    """
+    Check that a source slower than its latency percentile is requested again, and the first answer wins
+    """
+    latency_tracker = LatencyTracker(min_samples=1)
+    latency_tracker.record('noaa', 0.01)
+    monkeypatch.setattr(average_temperature_module, 'latency_tracker', latency_tracker)
+
+    get = sources_mock['noaa']
+    answers = iter([(10, 50.), (0, 10.)])  # the first request is slow
+
+    async def get_side_effect(*args):
+        return await asyncio.sleep(*next(answers))
+
+    get.side_effect = get_side_effect
+
+    detail = get_average_temperature_detail(1.0, 2.0, ['noaa'], latency_oriented=True)
+    assert detail[:3] == (10., ['noaa'], 0.)
+    assert get.call_count == 2
+
+
+def test_latency_budget(sources_mock, monkeypatch):
+    """
+    Check nothing waits for a slow source longer than the latency budget: the average fails, unless in latency
+    oriented mode, where it's computed from the sources that answered
+    """
+    monkeypatch.setattr(average_temperature_module, 'latency_tracker', LatencyTracker())
+    monkeypatch.setattr(average_temperature_module, 'AVERAGE_DEADLINE', None)
+    sources_mock['weather.com'].side_effect = _slow_get
+
+    with latency_budget(0.1):
+        with raises(TemperatureSourceTimeout):
+            get_average_temperature_detail(1.0, 2.0)
+    with latency_budget(0.1):
+        detail = get_average_temperature_detail(3.0, 4.0, latency_oriented=True)
+    assert detail[:3] == (15., ['accuweather', 'noaa'], 0.)
+
+    async def get_details():
+        with latency_budget(0.1):
+            with raises(TemperatureSourceTimeout):
+                await get_average_temperature_detail_async(5.0, 6.0)
+        with latency_budget(0.1):
+            return await get_average_temperature_detail_async(7.0, 8.0, latency_oriented=True)
+
+    detail = asyncio.run(get_details())
+    assert detail[:3] == (15., ['accuweather', 'noaa'], 0.)
+
+
+def test_average_returned_once_sources_agree(sources_mock):
+    """
+    Check that with an agreement tolerance the average of the sources that agree is returned without waiting for the
+    slow one, whose reading still fills the cache, and that every source is waited for if they don't agree
+    """
+    sources_mock['noaa'].return_value = 20.2
+    release = threading.Event()
+
+    async def slow_get_side_effect(*args):
+        await asyncio.to_thread(release.wait)
+        return 30.
+
+    slow_get = sources_mock['weather.com']
+    slow_get.side_effect = slow_get_side_effect
+
+    try:
+        detail = get_average_temperature_detail(1.0, 2.0, agreement_tolerance=0.5)
+        assert detail[:3] == (approx(20.1), ['accuweather', 'noaa'], 0.)
+    finally:
+        release.set()
+    fetch_loop.run(_join_background_requests())
+    assert fetch.reading_cache.get_stale_reading('weather.com', 1.0, 2.0) == (30., True)
+
+    detail = get_average_temperature_detail(3.0, 4.0, agreement_tolerance=0.1)
+    assert detail[:3] == (approx(23.4), ['accuweather', 'noaa', 'weather.com'], 0.)
+
+    slow_get.side_effect = _slow_get
+    detail = asyncio.run(get_average_temperature_detail_async(5.0, 6.0, agreement_tolerance=0.5))
+    assert detail[:3] == (approx(20.1), ['accuweather', 'noaa'], 0.)
+
+
+def test_sources_with_an_open_circuit_breaker_are_left_out(sources_mock, circuit_breakers):
+    """
+    Check that a source that keeps failing stops being requested, and the average is computed from the others
+    """
+    get = sources_mock['noaa']
+    get.side_effect = TemperatureSourceConnectionError('foo')
+
+    for latitude in (1.0, 2.0):
+        with raises(TemperatureSourceConnectionError):
+            get_average_temperature(latitude, 2.0)
+    assert circuit_breakers['noaa'].is_open()
+
+    assert get_average_temperature_detail(3.0, 2.0)[:3] == (25., ['accuweather', 'weather.com'], 0.)
+    assert asyncio.run(get_average_temperature_detail_async(4.0, 2.0))[:3] == (25., ['accuweather', 'weather.com'], 0.)
+    assert get.call_count == 2
+
+    with raises(TemperatureSourceUnavailable):
+        get_average_temperature(5.0, 2.0, ['noaa'])
+
+
+def test_rate_limited_sources_are_left_out(sources_mock):
+    """
+    Check that a source whose rate limiter turns a request away is left out of the average, like an unavailable one
+    """
+    rate_limiter = RateLimiter(requests_per_second=None, burst=1, initial_concurrency=1, min_concurrency=1,
+                               max_concurrency=1, latency_tolerance=2, backoff=0.5, max_wait=0.01)
+
+    async def limited_get(*args):
+        try:
+            async with rate_limiter.limit_async():
+                return await asyncio.sleep(0.1, 10.)
+        except ServiceRateLimited:
+            raise TemperatureSourceRateLimited('foo')
+
+    sources_mock['noaa'].side_effect = limited_get
+
+    async def get_details():
+        return await asyncio.gather(get_average_temperature_detail_async(1.0, 2.0),
+                                    get_average_temperature_detail_async(3.0, 4.0))
+
+    details = asyncio.run(get_details())
+    assert sorted(detail[:2] for detail in details) == [(20., ['accuweather', 'noaa', 'weather.com']),
+                                                        (25., ['accuweather', 'weather.com'])]
+
+
+def test_client_errors_do_not_open_the_circuit_breaker(sources_mock, circuit_breakers):
+    """
+    Check that the errors caused by the request, like 4xx responses, don't count as failures of the source, while
+    5xx responses do
+    """
+    get = sources_mock['noaa']
+    get.side_effect = TemperatureSourceUnexpectedStatusCode('Invalid coordinates', 400)
+    for latitude in (1.0, 2.0, 3.0):
+        with raises(TemperatureSourceUnexpectedStatusCode):
+            get_average_temperature(latitude, 2.0, ['noaa'])
+    assert not circuit_breakers['noaa'].is_open()
+
+    get.side_effect = TemperatureSourceUnexpectedStatusCode('Service unavailable', 503)
+    for latitude in (4.0, 5.0):
+        with raises(TemperatureSourceUnexpectedStatusCode):
+            get_average_temperature(latitude, 2.0, ['noaa'])
+    assert circuit_breakers['noaa'].is_open()
+
+
+def test_nearby_readings_are_reused(sources_mock, circuit_breakers):
+    """
+    Check that the sources with a recent reading nearby are not requested, and the distance to it is reported, even
+    if their circuit breaker is open
+    """
+    get_average_temperature(40.7142, -73.9614, ['noaa', 'accuweather'])
+
+    # 420 m north
+    detail = get_average_temperature_detail(40.7180, -73.9614)
+    assert detail.celsius == 20.
+    assert detail.sources == ['accuweather', 'noaa', 'weather.com']
+    assert round(detail.distance_km, 2) == 0.42
+    assert 59 < detail.max_age <= 60  # the nearby readings are reused for a minute
+
+    circuit_breakers['noaa'].record_failure()
+    circuit_breakers['noaa'].record_failure()
+    assert circuit_breakers['noaa'].is_open()
+    detail = asyncio.run(get_average_temperature_detail_async(40.7180, -73.9600, ['noaa'], latency_oriented=True))
+    assert detail.sources == ['noaa']
+    assert round(detail.distance_km, 2) == 0.44
+
+    for get in sources_mock.values():
+        assert get.call_count == 1
+
+
+def test_readings_of_other_workers_are_reused(sources_mock, reading_cache, nearby_readings):
+    """
+    Check that a source is not requested if another worker has a fresh reading of the location
+    """
+    get_average_temperature(40.7142, -73.9614, ['noaa'])
+
+    # the readings of this worker are gone, as if the source had been requested by another worker
+    reading_cache.clear()
+    nearby_readings.clear()
+    assert get_average_temperature(40.7142, -73.9614, ['noaa']) == 10.
+    assert asyncio.run(get_average_temperature_async(40.7143, -73.9615, ['noaa'])) == 10.
+
+    assert sources_mock['noaa'].call_count == 1
+    assert reading_cache.get_reading_age('noaa', 40.7142, -73.9614) is not None
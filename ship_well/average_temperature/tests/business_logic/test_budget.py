@@ -0,0 +1,45 @@
+import asyncio
+from unittest.mock import patch
+
+from pytest import approx
+
+from average_temperature.business_logic import budget
+from average_temperature.business_logic.budget import latency_budget
+from average_temperature.business_logic.fetch_executor import AdaptiveThreadPoolExecutor
+
+
+def test_timeouts_are_bound_to_the_budget():
+    """
+    Check timeouts are clipped to what's left of the budget, and left alone if there's no budget
+    """
+    assert budget.remaining() is None
+    assert budget.bound_timeouts(3., 10.) == (3., 10.)
+
+    with patch('time.monotonic', return_value=100.):
+        with latency_budget(5.):
+            with patch('time.monotonic', return_value=101.):
+                assert budget.remaining() == 4.
+                assert budget.bound_timeouts(3., 10.) == (3., 4.)
+                assert budget.bound(None) == 4.
+                assert not budget.expired()
+            with patch('time.monotonic', return_value=106.):
+                assert budget.remaining() == 0.
+                assert budget.expired()
+    assert budget.remaining() is None
+
+
+def test_budget_follows_the_request():
+    """
+    Check the budget is seen by the tasks and the executor's threads the request starts, unless it's lifted
+    """
+    executor = AdaptiveThreadPoolExecutor(1, 1, 1)
+
+    async def remaining_in_task():
+        return await asyncio.ensure_future(asyncio.sleep(0, budget.remaining()))
+
+    with latency_budget(5.):
+        assert executor.submit(budget.remaining).result() == approx(5., abs=0.5)
+        assert asyncio.run(remaining_in_task()) == approx(5., abs=0.5)
+        with latency_budget(None):
+            assert executor.submit(budget.remaining).result() is None
+    executor.shutdown()
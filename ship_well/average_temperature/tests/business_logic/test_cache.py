@@ -0,0 +1,81 @@
+import time
+
+from average_temperature.business_logic.cache import (
+    LRUCache,
+    ReadingCache,
+)
+
+
+def test_cached_value_is_retrieved():
+    """
+    Check a stored value is retrieved, and hits and misses are accounted
+    """
+    cache = LRUCache(max_entries=10)
+    cache.put('foo', None)
+
+    assert cache.get('foo') is None
+    assert cache.get('bar') is LRUCache.MISSING
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+
+def test_least_recently_used_value_is_evicted():
+    """
+    Check the least recently used entry is evicted when the cache is full
+    """
+    cache = LRUCache(max_entries=2)
+    cache.put('foo', 1)
+    cache.put('bar', 2)
+    cache.get('foo')
+    cache.put('baz', 3)
+
+    assert cache.get('bar') is LRUCache.MISSING
+    assert cache.get('foo') == 1
+    assert cache.get('baz') == 3
+    assert cache.stats().evictions == 1
+
+
+def test_expired_value_is_not_retrieved():
+    """
+    Check an entry that outlived the TTL is dropped
+    """
+    cache = LRUCache(max_entries=10, ttl=0.05)
+    cache.put('foo', 1)
+    time.sleep(0.1)
+
+    assert cache.get('foo') is LRUCache.MISSING
+
+    stats = cache.stats()
+    assert (stats.expirations, stats.size) == (1, 0)
+
+
+def test_stale_value_is_retrieved_within_the_grace_period():
+    """
+    Check an entry that outlived the TTL is only retrieved as stale during the grace period, and dropped afterwards
+    """
+    cache = LRUCache(max_entries=10, ttl=0.05, grace=0.1)
+    cache.put('foo', 1)
+    assert cache.get_stale('foo') == (1, True)
+    time.sleep(0.06)
+
+    assert cache.get('foo') is LRUCache.MISSING
+    assert cache.get_stale('foo') == (1, False)
+    time.sleep(0.1)
+
+    assert cache.get_stale('foo') == (LRUCache.MISSING, False)
+
+    stats = cache.stats()
+    assert (stats.stale_hits, stats.expirations, stats.size) == (1, 1, 0)
+
+
+def test_readings_are_shared_within_a_grid_cell():
+    """
+    Check that near enough locations share the same reading, which is kept per source
+    """
+    cache = ReadingCache(max_entries=10, ttl=60, grid_size=0.01)
+    cache.put_reading('noaa', 40.7142, -73.9614, 12.0)
+
+    assert cache.get_reading('noaa', 40.7143, -73.9615) == 12.0
+    assert cache.get_reading('noaa', 40.7242, -73.9614) is None
+    assert cache.get_reading('accuweather', 40.7142, -73.9614) is None
@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+from average_temperature.business_logic.circuit_breaker import CircuitBreaker
+
+
+def _get_circuit_breaker():
+    return CircuitBreaker(window=4, min_requests=2, failure_rate=0.5, slow_request_duration=1, slow_request_rate=0.75,
+                          open_duration=30, probes=2)
+
+
+def test_opens_when_too_many_requests_fail():
+    """
+    Check the breaker opens once the failure rate is reached with enough requests, and then rejects requests
+    """
+    circuit_breaker = _get_circuit_breaker()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.state == CircuitBreaker.CLOSED  # not enough requests yet
+
+    circuit_breaker.record_success(0.1)
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+    assert circuit_breaker.is_open()
+    assert not circuit_breaker.allow_request()
+    assert circuit_breaker.stats().rejected == 1
+    assert circuit_breaker.stats().opened == 1
+
+
+def test_opens_when_too_many_requests_are_slow():
+    """
+    Check the breaker opens once the rate of slow requests is reached, even if they succeeded
+    """
+    circuit_breaker = _get_circuit_breaker()
+    for duration in (0.1, 2., 2.):
+        circuit_breaker.record_success(duration)
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    circuit_breaker.record_success(2.)
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+
+
+def test_closes_when_probes_succeed():
+    """
+    Check the breaker lets a limited amount of probes through once half-open, and closes if all of them succeed
+    """
+    circuit_breaker = _get_circuit_breaker()
+    with patch('time.monotonic', return_value=100.):
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+
+    with patch('time.monotonic', return_value=130.):
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        assert circuit_breaker.allow_request()
+        assert circuit_breaker.allow_request()
+        assert not circuit_breaker.allow_request()
+        assert circuit_breaker.is_open()
+
+        circuit_breaker.record_success(0.1)
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        circuit_breaker.record_success(0.1)
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+        assert circuit_breaker.stats().failure_rate == 0.
+
+
+def test_opens_again_when_a_probe_fails():
+    """
+    Check the breaker opens again as soon as a probe fails, and that released probes can be retried
+    """
+    circuit_breaker = _get_circuit_breaker()
+    with patch('time.monotonic', return_value=100.):
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+
+    with patch('time.monotonic', return_value=130.):
+        assert circuit_breaker.allow_request()
+        assert circuit_breaker.allow_request()
+        circuit_breaker.release()
+        assert circuit_breaker.allow_request()
+
+        circuit_breaker.record_failure()
+        assert circuit_breaker.state == CircuitBreaker.OPEN
+        assert not circuit_breaker.allow_request()
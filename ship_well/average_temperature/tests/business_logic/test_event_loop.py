@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from pytest import (
+    approx,
+    fixture,
+    raises,
+)
+
+from average_temperature.business_logic import budget
+from average_temperature.business_logic.event_loop import BackgroundEventLoop
+
+
+@fixture
+def event_loop():
+    event_loop = BackgroundEventLoop('test-loop')
+    yield event_loop
+    event_loop.stop()
+
+
+def test_coroutines_run_on_the_background_thread(event_loop):
+    """
+    Check coroutines run on the loop's thread, in the context of the caller, so the latency budget follows them
+    """
+    async def get_thread_and_budget():
+        return threading.current_thread().name, budget.remaining()
+
+    with budget.latency_budget(10.):
+        thread_name, remaining = event_loop.run(get_thread_and_budget())
+    assert thread_name == 'test-loop'
+    assert remaining == approx(10., abs=1.)
+
+    async def fail():
+        raise ValueError()
+
+    with raises(ValueError):
+        event_loop.run(fail())
+
+
+def test_the_loop_cannot_wait_for_itself(event_loop):
+    """
+    Check a coroutine on the loop can't block it waiting for another one
+    """
+    async def run_nested():
+        return event_loop.run(asyncio.sleep(0))
+
+    with raises(RuntimeError):
+        event_loop.run(run_nested())
+
+
+def test_the_loop_is_started_again_once_stopped(event_loop):
+    """
+    Check the tasks still running are cancelled on stop, and the loop is started again when used afterwards
+    """
+    task = event_loop.submit(asyncio.sleep(10))
+    loop = event_loop.get_loop()
+    event_loop.stop()
+
+    assert task.cancelled()
+    assert loop.is_closed()
+    assert event_loop.run(asyncio.sleep(0, 'foo')) == 'foo'
+    assert event_loop.get_loop() is not loop
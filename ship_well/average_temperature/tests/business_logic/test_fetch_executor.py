@@ -0,0 +1,77 @@
+import threading
+import time
+
+from pytest import (
+    fixture,
+    raises,
+)
+
+from average_temperature.business_logic.fetch_executor import AdaptiveThreadPoolExecutor
+
+
+@fixture
+def executor():
+    executor = AdaptiveThreadPoolExecutor(min_workers=1, max_workers=10, idle_timeout=0.05)
+    yield executor
+    executor.shutdown()
+
+
+def test_tasks_results_are_retrieved(executor):
+    """
+    Check the results of the submitted tasks are successfully retrieved, in order
+    """
+    assert list(executor.map(lambda value: value * 2, range(5))) == [0, 2, 4, 6, 8]
+
+
+def test_tasks_exceptions_are_propagated(executor):
+    """
+    Check an exception raised by a task is raised when retrieving its result
+    """
+    def fail():
+        raise ValueError('foo')
+
+    with raises(ValueError):
+        executor.submit(fail).result()
+
+
+def test_workers_grow_with_the_in_flight_tasks(executor):
+    """
+    Check there are as many workers as blocked tasks, up to the maximum
+    """
+    release = threading.Event()
+    results = [executor.submit(release.wait) for _ in range(15)]
+
+    stats = executor.stats()
+    assert stats.workers == 10
+    assert stats.queue_depth + stats.busy_workers == 15
+
+    release.set()
+    assert all(result.result() for result in results)
+
+
+def test_idle_workers_exit(executor):
+    """
+    Check the workers that are no longer needed exit, but the minimum is kept
+    """
+    release = threading.Event()
+    results = [executor.submit(release.wait) for _ in range(5)]
+    release.set()
+    for result in results:
+        result.result()
+
+    time.sleep(0.3)
+
+    stats = executor.stats()
+    assert stats.workers == 1
+    assert stats.busy_workers == 0
+    assert stats.utilization == 0.
+
+
+def test_submit_after_shutdown_fails(executor):
+    """
+    Check no tasks are accepted once the executor is shut down
+    """
+    executor.shutdown()
+
+    with raises(RuntimeError):
+        executor.submit(lambda: None)
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock
+
+from average_temperature.business_logic import geolocation
+from average_temperature.business_logic.geocoding_cache import GeocodingCache
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+
+
+def test_coordinates_survive_restarts(tmp_path):
+    """
+    Check the stored coordinates are retrieved by a new cache on the same database
+    """
+    path = str(tmp_path / 'geocoding.sqlite3')
+    cache = GeocodingCache(path, max_entries=10)
+    cache.put('10001', (40.75, -73.99))
+    cache.close()
+
+    cache = GeocodingCache(path, max_entries=10)
+    assert cache.get('10001') == (40.75, -73.99)
+    assert cache.get('10002') is None
+
+
+def test_the_database_is_not_used_on_the_event_loop(tmp_path, monkeypatch):
+    """
+    Check the asynchronous methods run every SQLite call on the fetch executor, so they never block the event loop
+    """
+    path = str(tmp_path / 'geocoding.sqlite3')
+    GeocodingCache(path, max_entries=10).put('10001', (40.75, -73.99))
+
+    cache = GeocodingCache(path, max_entries=10)
+    get_connection = cache._get_connection
+    threads = set()
+
+    def get_connection_recording_thread():
+        threads.add(threading.current_thread())
+        return get_connection()
+
+    monkeypatch.setattr(cache, '_get_connection', get_connection_recording_thread)
+
+    async def run():
+        await cache.put_async('10002', (40.72, -73.99))
+        coordinates = await cache.get_async('10001'), await cache.get_async('10002')
+        return coordinates, threading.current_thread()
+
+    coordinates, loop_thread = asyncio.run(run())
+    assert coordinates == ((40.75, -73.99), (40.72, -73.99))
+    assert threads and loop_thread not in threads
+
+
+def test_zip_code_is_translated_once(tmp_path, monkeypatch):
+    """
+    Check Google Maps API is only requested the first time a zip code missing from the zip code index is translated
+    """
+    monkeypatch.setattr(geolocation, 'geocoding_cache', GeocodingCache(str(tmp_path / 'geocoding.sqlite3'), 10))
+    monkeypatch.setattr(geolocation, 'GOOGLE_MAPS_API_KEY', 'key')
+    get_location = AsyncMock(return_value=(51.5, -0.14))
+    monkeypatch.setattr(GoogleApiClient, 'get_location_from_zip_code_async', get_location)
+
+    assert geolocation.get_coordinates_from_zip_code('SW1A 1AA') == (51.5, -0.14)
+    assert geolocation.get_coordinates_from_zip_code('SW1A 1AA') == (51.5, -0.14)
+    assert get_location.call_count == 1
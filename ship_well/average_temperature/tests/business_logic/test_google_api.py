@@ -1,4 +1,11 @@
+import asyncio
+import json
+
+from aiohttp import ClientPayloadError
+from pytest import raises
+
 from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.google_api.exceptions import GoogleAPIConnectionError
 
 
 # TODO: add tests cases for unexpected status_code / response
@@ -30,7 +37,8 @@ def test_location_from_zip_code_successfully_retrieved(requests_mock_get):
 
     # check the request is made properly
     get.assert_called_with(GoogleApiClient.GOOGLE_MAPS_API_URL, params={'key': '1234',
-                                                                        'components': 'postal_code:ABCD'})
+                                                                        'components': 'postal_code:ABCD'},
+                           timeout=GoogleApiClient.TIMEOUT)
 
 
 def test_valid_coordinates_are_successfully_validated(requests_mock_get):
@@ -50,7 +58,8 @@ def test_valid_coordinates_are_successfully_validated(requests_mock_get):
     assert api.check_coordinates_validity(latitude=123456.1, longitude=789.2) is True
 
     # check the request is made properly
-    get.assert_called_with(GoogleApiClient.GOOGLE_MAPS_API_URL, params={'key': '1234', 'latlng': '123456.1,789.2'})
+    get.assert_called_with(GoogleApiClient.GOOGLE_MAPS_API_URL, params={'key': '1234', 'latlng': '123456.1,789.2'},
+                           timeout=GoogleApiClient.TIMEOUT)
 
 
 def test_invalid_coordinates_are_successfully_validated(requests_mock_get):
@@ -70,4 +79,47 @@ def test_invalid_coordinates_are_successfully_validated(requests_mock_get):
     assert api.check_coordinates_validity(latitude=123456.1, longitude=789.2) is False
 
     # check the request is made properly
-    get.assert_called_with(GoogleApiClient.GOOGLE_MAPS_API_URL, params={'key': '1234', 'latlng': '123456.1,789.2'})
+    get.assert_called_with(GoogleApiClient.GOOGLE_MAPS_API_URL, params={'key': '1234', 'latlng': '123456.1,789.2'},
+                           timeout=GoogleApiClient.TIMEOUT)
+
+
+def test_location_from_zip_code_successfully_retrieved_async(aiohttp_mock_session):
+    """
+    Check that location by a given zip_code is successfully retrieved using the google api asynchronously
+    """
+    session, response = aiohttp_mock_session
+    response.status = 200
+    response.read.return_value = json.dumps({
+        'status':  'OK',
+        'results': [{
+            'geometry': {
+                'location': {
+                    'lat': '123456.1', 'lng': '789.2'
+                }
+            }
+        }]
+    }).encode()
+
+    api = GoogleApiClient(api_key='1234')
+    lat, lng = asyncio.run(api.get_location_from_zip_code_async(zip_code='ABCD'))
+
+    # check the coordinates are successfully retrieved
+    assert lat == 123456.1
+    assert lng == 789.2
+
+    # check the request is made properly
+    args, kwargs = session.get.call_args
+    assert args == (GoogleApiClient.GOOGLE_MAPS_API_URL,)
+    assert kwargs['params'] == {'key': '1234', 'components': 'postal_code:ABCD'}
+
+
+def test_truncated_response_async(aiohttp_mock_session):
+    """
+    Check that a reply of Google Maps API cut short counts as a connection error
+    """
+    _, response = aiohttp_mock_session
+    response.status = 200
+    response.read.side_effect = ClientPayloadError('Response payload is not completed')
+
+    with raises(GoogleAPIConnectionError):
+        asyncio.run(GoogleApiClient(api_key='1234').get_location_from_zip_code_async(zip_code='ABCD'))
@@ -0,0 +1,43 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from average_temperature.business_logic import json_parsing
+from average_temperature.business_logic.json_parsing import loads
+
+
+DOCUMENT = {
+    'query': {
+        'count': 1,
+        'results': {
+            'channel': {
+                'description': 'Current Weather',
+                'units': {'temperature': 'F'},
+                'astronomy': {'sunset': '9:6 pm', 'sunrise': '8:42 am'},
+                'condition': {'text': 'Mostly Clear', 'temp': '37'},
+            }
+        },
+    }
+}
+
+
+def test_loads():
+    """
+    Test documents are decoded whole with orjson
+    """
+    assert json_parsing.get_parser_name() == 'orjson'
+    assert loads(json.dumps(DOCUMENT).encode()) == DOCUMENT
+    with pytest.raises(ValueError):
+        loads(b'This is a dummy text')
+
+
+def test_loads_without_orjson():
+    """
+    Test documents are decoded with the standard library if orjson is not installed
+    """
+    with patch.object(json_parsing, 'orjson', None):
+        assert json_parsing.get_parser_name() == 'json'
+        assert loads(json.dumps(DOCUMENT).encode()) == DOCUMENT
+        with pytest.raises(ValueError):
+            loads(b'This is a dummy text')
@@ -0,0 +1,64 @@
+from unittest.mock import AsyncMock
+
+from pytest import (
+    mark,
+    raises,
+)
+
+from average_temperature.business_logic import geolocation
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.land_mask import LandMask
+
+
+@mark.parametrize('latitude, longitude, expected', [
+    (39.74, -104.99, LandMask.LAND),  # Denver
+    (46.8, 8.2, LandMask.LAND),  # Switzerland
+    (30., -40., LandMask.WATER),  # Atlantic ocean
+    (0., -150., LandMask.WATER),  # Pacific ocean
+    (32.30, -64.78, LandMask.WATER),  # Bermuda, too small for the grid
+    (40.7142, -73.9614, LandMask.COAST),  # New York
+])
+def test_bundled_land_mask(latitude, longitude, expected):
+    """
+    Check the bundled land mask classifies well known locations
+    """
+    assert geolocation.land_mask.classify(latitude, longitude) == expected
+
+
+def test_out_of_range_coordinates():
+    """
+    Check out of range coordinates are rejected
+    """
+    with raises(ValueError):
+        geolocation.land_mask.classify(91, 0)
+
+
+def test_land_mask_round_trip(tmp_path):
+    """
+    Check a saved land mask is loaded back
+    """
+    path = str(tmp_path / 'mask.bin')
+    LandMask.save(path, bytes([LandMask.WATER, LandMask.LAND]), width=2, height=1, cell_size=180)
+
+    land_mask = LandMask(path)
+    assert land_mask.classify(0, -90) == LandMask.WATER
+    assert land_mask.classify(0, 90) == LandMask.LAND
+
+
+@mark.parametrize('latitude, longitude, expected, google_calls', [
+    (39.74, -104.99, True, 0),
+    (30., -40., False, 1),
+    (95., 0., False, 0),
+    (40.7142, -73.9614, True, 1),
+    (32.30, -64.78, True, 1),  # Bermuda, too small for the land mask
+])
+def test_google_is_only_requested_off_land(monkeypatch, latitude, longitude, expected, google_calls):
+    """
+    Check Google Maps API is only requested for coordinates the land mask can't tell, which includes water cells as
+    they may hold small islands
+    """
+    check = AsyncMock(side_effect=lambda latitude, longitude: latitude != 30.)
+    monkeypatch.setattr(GoogleApiClient, 'check_coordinates_validity_async', check)
+
+    assert geolocation.validate_coordinates(latitude, longitude) is expected
+    assert check.call_count == google_calls
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from pytest import (
+    fixture,
+    raises,
+)
+
+from average_temperature.business_logic.exposition import render_metrics
+from average_temperature.business_logic.metrics import (
+    UpstreamMetrics,
+    upstream_metrics,
+)
+from average_temperature.business_logic.temperature_source.sources import NoaaTemperatureSource
+from average_temperature.business_logic.temperature_source.exceptions import TemperatureSourceUnexpectedStatusCode
+
+
+@fixture
+def metrics():
+    upstream_metrics.clear()
+    yield upstream_metrics
+    upstream_metrics.clear()
+
+
+def test_requests_are_tracked():
+    """
+    Check the duration of every request is observed in its bucket, and failed requests are counted by exception
+    """
+    metrics = UpstreamMetrics(buckets=[0.1, 1.])
+    with patch('time.monotonic', side_effect=[0., 0.5, 0., 2.]):
+        with metrics.track('noaa'):
+            assert metrics.snapshot().in_flight == {'noaa': 1}
+
+        with raises(ValueError):
+            with metrics.track('noaa'):
+                raise ValueError()
+
+    snapshot = metrics.snapshot()
+    assert snapshot.durations['noaa'] == ((0.1, 1.), [0, 1, 1], 2.5, 2)
+    assert snapshot.errors == {('noaa', 'ValueError'): 1}
+    assert snapshot.in_flight == {'noaa': 0}
+
+
+def test_source_requests_are_exposed(metrics, requests_mock_get):
+    """
+    Check the requests to the sources are instrumented and rendered in Prometheus text format
+    """
+    _, response = requests_mock_get
+    response.status_code = 500
+    response.text = 'This is a dummy text'
+
+    with raises(TemperatureSourceUnexpectedStatusCode):
+        NoaaTemperatureSource.get_current_temperature(1.0, 2.0)
+
+    lines = render_metrics().splitlines()
+    assert '# TYPE shipwell_upstream_request_duration_seconds histogram' in lines
+    assert 'shipwell_upstream_request_duration_seconds_bucket{service="noaa",le="+Inf"} 1' in lines
+    assert 'shipwell_upstream_request_duration_seconds_count{service="noaa"} 1' in lines
+    labels = 'service="noaa",exception="TemperatureSourceUnexpectedStatusCode"'
+    assert 'shipwell_upstream_request_errors_total{%s} 1' % labels in lines
+    assert 'shipwell_upstream_requests_in_flight{service="noaa"} 0' in lines
+    assert 'shipwell_circuit_breaker_state{source="noaa",state="closed"} 1' in lines
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from pytest import approx
+
+from average_temperature.business_logic.nearby import (
+    NearbyReadings,
+    get_distance,
+)
+
+
+def test_distance():
+    """
+    Check the great-circle distance between well known locations
+    """
+    assert get_distance(40.7128, -74.0060, 51.5074, -0.1278) == approx(5570, rel=0.01)  # New York - London
+    assert get_distance(0., 179.99, 0., -179.99) == approx(2.22, rel=0.01)  # across the antimeridian
+    assert get_distance(10., 20., 10., 20.) == 0.
+
+
+def test_nearest_reading_in_range():
+    """
+    Check the nearest reading of the source within the radius is found, with its distance
+    """
+    nearby_readings = NearbyReadings(radius=1., max_age=60, max_entries=10)
+    nearby_readings.record('noaa', 40.7142, -73.9614, 10.)
+    nearby_readings.record('noaa', 40.7180, -73.9614, 11.)  # 420 m north
+    nearby_readings.record('accuweather', 40.7143, -73.9614, 12.)
+
+    reading = nearby_readings.nearest('noaa', 40.7172, -73.9614)
+    assert reading.celsius == 11.
+    assert reading.distance_km == approx(0.089, abs=0.001)
+
+    assert nearby_readings.nearest('noaa', 40.7300, -73.9614) is None  # 1.3 km north
+    assert nearby_readings.nearest('weather.com', 40.7142, -73.9614) is None
+    assert nearby_readings.stats() == (1, 2, 3)
+
+
+def test_nearest_reading_in_another_bucket():
+    """
+    Check readings are found across buckets, even where they are narrow and across the antimeridian
+    """
+    nearby_readings = NearbyReadings(radius=5., max_age=60, max_entries=10)
+    nearby_readings.record('noaa', 0., 179.99, 10.)
+    nearby_readings.record('noaa', 80., 0.1, 20.)
+
+    assert nearby_readings.nearest('noaa', 0., -179.99).celsius == 10.
+    assert nearby_readings.nearest('noaa', 80., -0.1).celsius == 20.
+
+
+def test_old_readings_are_dropped():
+    """
+    Check readings are only reused up to the maximum age, and the oldest are dropped when the index is full
+    """
+    with patch('time.monotonic', return_value=0.):
+        nearby_readings = NearbyReadings(radius=1., max_age=60, max_entries=2)
+        nearby_readings.record('noaa', 1., 1., 10.)
+
+    with patch('time.monotonic', return_value=30.):
+        nearby_readings.record('noaa', 2., 2., 20.)
+        nearby_readings.record('noaa', 3., 3., 30.)
+        assert nearby_readings.nearest('noaa', 1., 1.) is None
+        assert nearby_readings.nearest('noaa', 2., 2.).celsius == 20.
+
+    with patch('time.monotonic', return_value=100.):
+        assert nearby_readings.nearest('noaa', 2., 2.) is None
+        nearby_readings.record('noaa', 3., 3., 31.)
+        assert nearby_readings.nearest('noaa', 3., 3.).celsius == 31.
+    assert nearby_readings.stats().size == 1
+
+
+def test_disabled():
+    """
+    Check no reading is reused if the radius is 0
+    """
+    nearby_readings = NearbyReadings(radius=0, max_age=60, max_entries=10)
+    nearby_readings.record('noaa', 1., 1., 10.)
+    assert nearby_readings.nearest('noaa', 1., 1.) is None
@@ -0,0 +1,82 @@
+from unittest.mock import AsyncMock, patch
+
+from pytest import fixture
+
+from average_temperature.business_logic import prefetch
+from average_temperature.business_logic.prefetch import (
+    LocationPopularity,
+    PrefetchScheduler,
+)
+
+
+@fixture
+def refresh_mock(monkeypatch, reading_cache, circuit_breakers):
+    refresh = AsyncMock()
+    monkeypatch.setattr(prefetch, 'refresh_temperature', refresh)
+    return refresh
+
+
+def test_most_popular_locations():
+    """
+    Check locations are ranked by their amount of requests, sharing the reading cache cells, and that old requests
+    weigh less than new ones
+    """
+    with patch('time.monotonic', return_value=0.):
+        popularity = LocationPopularity(max_locations=10, half_life=60)
+        for latitude, longitude in [(1., 1.), (2., 2.), (1.001, 1.001), (3., 3.)]:
+            popularity.record(latitude, longitude)
+        assert popularity.top(1) == [(1.001, 1.001)]
+
+    with patch('time.monotonic', return_value=120.):
+        for _ in range(2):
+            popularity.record(3., 3.)
+        assert popularity.top(2) == [(3., 3.), (1.001, 1.001)]
+
+
+def test_least_popular_locations_are_dropped():
+    """
+    Check the amount of locations tracked is bounded
+    """
+    popularity = LocationPopularity(max_locations=2, half_life=60)
+    popularity.record(1., 1.)
+    popularity.record(1., 1.)
+    for latitude in range(2, 10):
+        popularity.record(latitude, 0.)
+
+    assert len(popularity.top(10)) <= 4
+    assert popularity.top(1) == [(1., 1.)]
+
+
+def test_popular_locations_about_to_expire_are_refreshed(refresh_mock, reading_cache, circuit_breakers):
+    """
+    Check only the readings that are missing or about to expire are refreshed, skipping the unavailable sources
+    """
+    popularity = LocationPopularity(max_locations=10, half_life=60)
+    popularity.record(1., 1.)
+    scheduler = PrefetchScheduler(popularity, top_locations=10, budget_per_minute=100, interval=10, ttl=60)
+
+    reading_cache.put_reading('noaa', 1., 1., 10.)
+    for _ in range(4):
+        circuit_breakers['weather.com'].record_failure()
+
+    assert scheduler.run_once() == 1
+    refresh_mock.assert_called_once_with(prefetch.WEATHER_SOURCE['accuweather'], 1., 1.)
+
+
+def test_refreshes_are_bounded_by_the_budget(refresh_mock, circuit_breakers):
+    """
+    Check no more upstream requests than the budget are made, and that the budget is earned back over time
+    """
+    with patch('time.monotonic', return_value=0.):
+        popularity = LocationPopularity(max_locations=10, half_life=60)
+        for latitude in range(5):
+            popularity.record(latitude, 0.)
+
+        scheduler = PrefetchScheduler(popularity, top_locations=10, budget_per_minute=6, interval=10, ttl=60)
+        assert scheduler.run_once() == 6
+        assert scheduler.run_once() == 0
+
+    with patch('time.monotonic', return_value=20.):
+        assert scheduler.run_once() == 2
+
+    assert scheduler.stats() == (3, 8, 9 + 15 + 13)
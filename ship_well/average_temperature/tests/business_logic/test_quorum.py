@@ -0,0 +1,123 @@
+from unittest.mock import patch
+
+from pytest import approx, raises
+
+from average_temperature.business_logic.exceptions import (
+    ServiceConnectionError,
+    TemperatureAverageTimeout,
+)
+from average_temperature.business_logic.latency import LatencyTracker
+from average_temperature.business_logic.quorum import QuorumAverage
+
+
+def test_done_once_the_quorum_is_reached():
+    """
+    Check the average is computed from the readings so far once the quorum is reached
+    """
+    average = QuorumAverage(['noaa', 'accuweather', 'weather.com'], quorum=2)
+    average.add_reading('noaa', 10.)
+    assert not average.is_done()
+
+    average.add_reading('weather.com', 30.)
+    assert average.is_done()
+    assert average.result() == (20., ['noaa', 'weather.com'], 0., 0.)
+
+
+def test_failed_sources_are_left_out():
+    """
+    Check that failed sources don't take part of the average, and that the error is raised if every source failed
+    """
+    average = QuorumAverage(['noaa', 'accuweather'], quorum=2)
+    average.add_error('noaa', ServiceConnectionError())
+    average.add_reading('accuweather', 20.)
+    assert average.is_done()
+    assert average.result() == (20., ['accuweather'], 0., 0.)
+
+    average = QuorumAverage(['noaa'])
+    error = ServiceConnectionError()
+    average.add_error('noaa', error)
+    assert average.is_done()
+    with raises(ServiceConnectionError) as exc_info:
+        average.result()
+    assert exc_info.value is error
+
+
+def test_done_once_the_deadline_expires():
+    """
+    Check the deadline bounds the wait, and that an average without readings times out
+    """
+    with patch('time.monotonic', return_value=100.):
+        average = QuorumAverage(['noaa', 'accuweather'], deadline=2.)
+        assert average.timeout() == 2.
+
+    with patch('time.monotonic', return_value=102.):
+        assert average.is_done()
+        assert average.timeout() == 0.
+        with raises(TemperatureAverageTimeout):
+            average.result()
+
+
+def test_slow_sources_are_hedged_once():
+    """
+    Check a source is requested again after its hedge delay, only once, and that its first answer wins
+    """
+    with patch('time.monotonic', return_value=100.):
+        average = QuorumAverage(['noaa', 'accuweather'], hedge_delays={'noaa': 0.5, 'accuweather': None})
+        assert average.timeout() == 0.5
+        assert average.sources_to_hedge() == []
+
+    with patch('time.monotonic', return_value=100.5):
+        assert average.sources_to_hedge() == ['noaa']
+        assert average.sources_to_hedge() == []
+        assert average.timeout() is None
+
+    average.add_reading('accuweather', 20.)
+    average.add_error('noaa', ServiceConnectionError())
+    assert not average.is_done()  # the hedged request is still in flight
+
+    average.add_reading('noaa', 10.)
+    assert average.is_done()
+    assert average.result() == (15., ['accuweather', 'noaa'], 0., 0.)
+
+
+def test_done_once_enough_readings_agree():
+    """
+    Check that with a tolerance only the readings that agree count towards the quorum, and the average is theirs
+    """
+    average = QuorumAverage(['noaa', 'accuweather', 'weather.com'], quorum=2, tolerance=0.5)
+    average.add_reading('noaa', 10.)
+    average.add_reading('weather.com', 20.)
+    assert not average.is_done()
+    assert not average.agreed()
+
+    average.add_reading('accuweather', 19.6)
+    assert average.is_done()
+    assert average.agreed()
+    assert average.result() == (approx(19.8), ['accuweather', 'weather.com'], 0., 0.)
+
+    # once every source answered, the average is computed from all of them if they don't agree
+    average = QuorumAverage(['noaa', 'accuweather'], quorum=2, tolerance=0.5)
+    average.add_reading('noaa', 10.)
+    average.add_reading('accuweather', 20.)
+    assert average.is_done()
+    assert not average.agreed()
+    assert average.result() == (15., ['accuweather', 'noaa'], 0., 0.)
+
+
+def test_latency_percentiles():
+    """
+    Check percentiles are only estimated with enough samples, and that they follow the new samples
+    """
+    tracker = LatencyTracker(window=10, min_samples=5)
+    for latency in [0.1, 0.2, 0.3, 0.4]:
+        tracker.record('noaa', latency)
+    assert tracker.percentile('noaa', 50) is None
+    assert tracker.percentile('accuweather', 50) is None
+
+    tracker.record('noaa', 0.5)
+    assert tracker.percentile('noaa', 50) == 0.3
+    assert tracker.percentile('noaa', 100) == 0.5
+
+    for _ in range(10):
+        tracker.record('noaa', 1.)
+    assert tracker.percentile('noaa', 50) == 1.
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+from pytest import approx, raises
+
+from average_temperature.business_logic.exceptions import ServiceRateLimited
+from average_temperature.business_logic.rate_limiter import (
+    AIMDConcurrencyLimit,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+def _get_rate_limiter(requests_per_second=None, burst=1, max_concurrency=4, max_wait=0.05):
+    return RateLimiter(requests_per_second=requests_per_second, burst=burst, initial_concurrency=max_concurrency,
+                       min_concurrency=1, max_concurrency=max_concurrency, latency_tolerance=2, backoff=0.5,
+                       max_wait=max_wait)
+
+
+def test_token_bucket():
+    """
+    Check bursts are let through, and then the rate is capped
+    """
+    with patch('time.monotonic', return_value=0.):
+        token_bucket = TokenBucket(rate=10, burst=2)
+    assert token_bucket.take(0.) == 0
+    assert token_bucket.take(0.) == 0
+    assert token_bucket.take(0.) == 0.1
+    assert token_bucket.take(0.05) == approx(0.05)
+    assert token_bucket.take(0.1) == 0
+    assert token_bucket.take(10.) == 0  # refilled, up to the burst size
+    assert token_bucket.take(10.) == 0
+    assert token_bucket.take(10.) > 0
+
+    assert TokenBucket(rate=None, burst=0).take(0.) == 0
+
+
+def test_concurrency_limit_increases_additively_and_decreases_multiplicatively():
+    """
+    Check the limit grows by one per limit's worth of good requests, and halves on overload or high latency, once
+    per usual latency
+    """
+    concurrency_limit = AIMDConcurrencyLimit(initial=4, minimum=1, maximum=5, latency_tolerance=2, backoff=0.5)
+    for _ in range(4):
+        concurrency_limit.record(0.1, overloaded=False, now=0.)
+    assert 4.9 < concurrency_limit.limit < 5
+    for _ in range(10):
+        concurrency_limit.record(0.1, overloaded=False, now=0.)
+    assert concurrency_limit.limit == 5
+
+    concurrency_limit.record(0.1, overloaded=True, now=1.)
+    concurrency_limit.record(0.1, overloaded=True, now=1.01)  # same overload
+    assert concurrency_limit.limit == 2.5
+
+    concurrency_limit.record(0.5, overloaded=False, now=2.)  # slow
+    assert concurrency_limit.limit == 1.25
+    concurrency_limit.record(0.1, overloaded=True, now=3.)
+    assert concurrency_limit.limit == 1
+
+
+def test_requests_over_the_rate_wait_or_are_rejected():
+    """
+    Check a request over the rate waits for a token, and is rejected if it can't get one in time
+    """
+    rate_limiter = _get_rate_limiter(requests_per_second=40, burst=1, max_wait=0.1)
+    with rate_limiter.limit():
+        pass
+    with rate_limiter.limit():  # waits 25 ms for a token
+        pass
+    assert rate_limiter.stats()[:3] == (2, 1, 0)
+
+    rate_limiter = _get_rate_limiter(requests_per_second=1, burst=1, max_wait=0.01)
+    with rate_limiter.limit():
+        pass
+    with raises(ServiceRateLimited):
+        with rate_limiter.limit():
+            pass
+    assert rate_limiter.stats()[:3] == (1, 1, 1)
+
+
+def test_concurrent_requests_wait_for_a_slot():
+    """
+    Check requests over the concurrency limit wait until a request in flight finishes
+    """
+    rate_limiter = _get_rate_limiter(max_concurrency=1, max_wait=1)
+    admitted, release = threading.Event(), threading.Event()
+
+    def request():
+        with rate_limiter.limit():
+            admitted.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    assert admitted.wait(5)
+    assert rate_limiter.stats().in_flight == 1
+
+    threading.Timer(0.05, release.set).start()
+
+    async def request_async():
+        async with rate_limiter.limit_async():
+            return rate_limiter.stats().in_flight
+
+    assert asyncio.run(request_async()) == 1
+    thread.join()
+    assert rate_limiter.stats() == (2, 1, 0, 1, 0)
+
+
+def test_coroutines_are_woken_up_by_released_requests(monkeypatch):
+    """
+    Check coroutines waiting for a slot don't poll for it: they are woken up once per released request, in order, and
+    the cancelled ones are skipped
+    """
+    rate_limiter = _get_rate_limiter(max_concurrency=1, max_wait=5)
+    try_admit = rate_limiter._try_admit
+    attempts = []
+
+    def try_admit_counting(*args):
+        attempts.append(None)
+        return try_admit(*args)
+
+    monkeypatch.setattr(rate_limiter, '_try_admit', try_admit_counting)
+    admitted = []
+
+    async def request(name, seconds):
+        async with rate_limiter.limit_async():
+            admitted.append(name)
+            await asyncio.sleep(seconds)
+
+    async def run():
+        first = asyncio.ensure_future(request('first', 0.1))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(request('cancelled', 0))
+        others = [asyncio.ensure_future(request(name, 0.01)) for name in ('second', 'third')]
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        await asyncio.wait_for(asyncio.gather(first, *others), 5)
+
+    asyncio.run(run())
+    assert admitted == ['first', 'second', 'third']
+    assert len(attempts) == 6  # the first attempt of every request, and one more after every release
+    assert rate_limiter.stats() == (3, 3, 0, 1, 0)
+
+
+def test_overloaded_responses_lower_the_concurrency_limit():
+    """
+    Check responses with status code 429 or 5xx lower the concurrency limit, and other failures don't
+    """
+    rate_limiter = _get_rate_limiter(max_concurrency=4)
+    with rate_limiter.limit() as admission:
+        admission.status_code = 404
+    assert rate_limiter.stats().concurrency_limit == 4
+
+    with rate_limiter.limit() as admission:
+        admission.status_code = 429
+    assert rate_limiter.stats().concurrency_limit == 2
+
+    rate_limiter.reset()
+    assert rate_limiter.stats().concurrency_limit == 4
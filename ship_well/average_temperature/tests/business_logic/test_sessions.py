@@ -0,0 +1,51 @@
+import asyncio
+
+from aiohttp import ClientConnectionError
+
+from average_temperature.business_logic.sessions import AsyncPooledSession, PooledSession
+from average_temperature.business_logic.temperature_source.sources import (
+    NoaaTemperatureSource,
+    AccuweatherTemperatureSource,
+)
+
+
+def test_session_is_shared():
+    """
+    Check the same session is handed over on every call, with a pool of the requested size
+    """
+    pooled_session = PooledSession(pool_size=7)
+    session = pooled_session.get()
+
+    assert pooled_session.get() is session
+    assert session.get_adapter('http://example.com')._pool_maxsize == 7
+
+
+def test_session_is_rebuilt_after_close():
+    """
+    Check a closed pooled session builds a new one when used again
+    """
+    pooled_session = PooledSession(pool_size=1)
+    session = pooled_session.get()
+    pooled_session.close()
+
+    assert pooled_session.get() is not session
+
+
+def test_every_source_owns_its_session():
+    """
+    Check each source is requested through its own session
+    """
+    assert NoaaTemperatureSource.get_session() is NoaaTemperatureSource.get_session()
+    assert NoaaTemperatureSource.get_session() is not AccuweatherTemperatureSource.get_session()
+
+
+def test_connections_are_warmed_up(aiohttp_mock_session):
+    """
+    Check as many connections as the pool keeps are opened concurrently, and failures are ignored
+    """
+    session, _ = aiohttp_mock_session
+    session.head.side_effect = [session.get.return_value, ClientConnectionError()]
+
+    asyncio.run(AsyncPooledSession(pool_size=2).warm_up('http://example.com', 3, (1, 2)))
+
+    assert session.head.call_count == 2
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, patch
+
+from pytest import fixture, raises
+
+from average_temperature.business_logic.shared_cache import SharedCache
+
+
+@fixture
+def path(tmp_path):
+    return str(tmp_path / 'shared_cache.sqlite3')
+
+
+def _get_worker_cache(path: str, fill_timeout: float = 5) -> SharedCache:
+    """
+    Get the shared cache of another worker: its own instance, with its own connection to the same database
+    """
+    return SharedCache(path, max_age=60, fill_timeout=fill_timeout, poll_interval=0.001)
+
+
+def test_values_are_shared(path):
+    """
+    Check a value stored by a worker is retrieved by another one, until it's too old
+    """
+    with patch('time.time', return_value=1000.):
+        _get_worker_cache(path).put('key', 12.5)
+
+    other = _get_worker_cache(path)
+    with patch('time.time', return_value=1030.):
+        assert other.get('key') == (12.5, 1000.)
+        assert other.get('missing') is None
+    with patch('time.time', return_value=1061.):
+        assert other.get('key') is None
+
+
+def test_disabled():
+    """
+    Check nothing is shared if there's no path
+    """
+    shared_cache = SharedCache(None, max_age=60, fill_timeout=5, poll_interval=0.001)
+    shared_cache.put('key', 1.)
+    assert shared_cache.get('key') is None
+
+    request = AsyncMock(return_value=2.)
+    assert asyncio.run(shared_cache.fill_async('key', lambda: None, request, 'argument')) == 2.
+    request.assert_awaited_once_with('argument')
+
+
+def test_value_is_computed_once_across_workers(path):
+    """
+    Check that, while a worker computes a value, the others wait for it instead of computing it as well
+    """
+    filler, waiter = _get_worker_cache(path), _get_worker_cache(path)
+    requested, release = threading.Event(), threading.Event()
+
+    async def request():
+        requested.set()
+        await asyncio.to_thread(release.wait, 5)
+        filler.put('key', 12.5)
+        return 12.5
+
+    def lookup(shared_cache):
+        entry = shared_cache.get('key')
+        return None if entry is None else entry.value
+
+    thread = threading.Thread(target=lambda: asyncio.run(filler.fill_async('key', lambda: lookup(filler), request)))
+    thread.start()
+    assert requested.wait(5)
+
+    waiter_request = AsyncMock(return_value=0.)
+    threading.Timer(0.05, release.set).start()
+    assert asyncio.run(waiter.fill_async('key', lambda: lookup(waiter), waiter_request)) == 12.5
+    thread.join(5)
+
+    waiter_request.assert_not_called()
+    assert filler.stats() == (0, 1, 0, 0)
+    assert waiter.stats() == (1, 0, 1, 0)
+
+
+def test_waiting_for_another_worker_times_out(path):
+    """
+    Check a worker computes the value itself if another one takes too long, and that an abandoned lock expires
+    """
+    _get_worker_cache(path)._lock_fill('key')  # a worker died holding the lock
+
+    waiter = _get_worker_cache(path, fill_timeout=0.05)
+    assert asyncio.run(waiter.fill_async('key', lambda: None, AsyncMock(return_value=1.))) == 1.
+    assert waiter.stats() == (0, 0, 1, 1)
+
+    with patch('time.time', return_value=10 ** 10):
+        assert asyncio.run(waiter.fill_async('key', lambda: None, AsyncMock(return_value=2.))) == 2.
+    assert waiter.stats().fills == 1
+
+
+def test_lock_is_released_if_computing_fails(path):
+    """
+    Check a worker that failed to compute a value lets the rest compute it
+    """
+    with raises(ValueError):
+        asyncio.run(_get_worker_cache(path).fill_async('key', lambda: None, AsyncMock(side_effect=ValueError())))
+
+    waiter = _get_worker_cache(path)
+    assert asyncio.run(waiter.fill_async('key', lambda: None, AsyncMock(return_value=1.))) == 1.
+    assert waiter.stats().fills == 1
+
+
+def test_the_database_is_not_used_on_the_event_loop(path, monkeypatch):
+    """
+    Check the asynchronous methods run every SQLite call on the fetch executor, so they never block the event loop
+    """
+    shared_cache = _get_worker_cache(path)
+    get_connection = shared_cache._get_connection
+    threads = set()
+
+    def get_connection_recording_thread():
+        threads.add(threading.current_thread())
+        return get_connection()
+
+    monkeypatch.setattr(shared_cache, '_get_connection', get_connection_recording_thread)
+
+    async def run():
+        await shared_cache.put_async('other key', 1.)
+        value = await shared_cache.fill_async('key', lambda: shared_cache.get('key'), AsyncMock(return_value=2.))
+        return value, threading.current_thread()
+
+    value, loop_thread = asyncio.run(run())
+    assert value == 2.
+    assert threads and loop_thread not in threads
+    assert shared_cache.get('other key').value == 1.
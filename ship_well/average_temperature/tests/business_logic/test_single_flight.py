@@ -0,0 +1,86 @@
+import asyncio
+
+from average_temperature.business_logic import budget
+from average_temperature.business_logic.single_flight import AsyncSingleFlight
+
+
+def test_concurrent_coroutines_share_one_execution():
+    """
+    Check that concurrent coroutines with the same key await the coroutine function once
+    """
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def function(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        return await asyncio.gather(*[single_flight.do('key', function, 'foo') for _ in range(5)],
+                                    single_flight.do('other key', function, 'bar'))
+
+    assert asyncio.run(run()) == ['foo'] * 5 + ['bar']
+    assert calls == ['foo', 'bar']
+
+
+def test_concurrent_coroutines_share_the_error():
+    """
+    Check that all the concurrent callers get the error of the shared execution
+    """
+    single_flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('foo')
+
+    async def run():
+        return await asyncio.gather(*[single_flight.do('key', fail) for _ in range(3)], return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError] * 3
+    assert single_flight.stats() == (1, 2)
+
+
+def test_every_caller_waits_as_long_as_its_own_budget_lasts():
+    """
+    Check that the shared call doesn't inherit the budget of the caller that started it: a caller with less time left
+    gives up, while the one with more time gets the result
+    """
+    single_flight = AsyncSingleFlight()
+    budgets = []
+
+    async def function():
+        budgets.append(budget.remaining())
+        await asyncio.sleep(0.1)
+        return 'foo'
+
+    async def call(seconds):
+        with budget.latency_budget(seconds):
+            return await single_flight.do('key', function)
+
+    async def run():
+        return await asyncio.gather(call(0.01), call(5.), return_exceptions=True)
+
+    short_budget_result, long_budget_result = asyncio.run(run())
+    assert isinstance(short_budget_result, asyncio.TimeoutError)
+    assert long_budget_result == 'foo'
+    assert budgets == [None]
+
+
+def test_calls_are_executed_again_once_finished():
+    """
+    Check that the result is not kept once the execution is finished
+    """
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def function():
+        calls.append(None)
+        return 'foo'
+
+    async def run():
+        await single_flight.do('key', function)
+        await single_flight.do('key', function)
+
+    asyncio.run(run())
+    assert len(calls) == 2
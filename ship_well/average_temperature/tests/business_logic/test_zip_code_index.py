@@ -0,0 +1,72 @@
+from unittest.mock import AsyncMock
+
+from pytest import (
+    mark,
+    raises,
+)
+
+from average_temperature.business_logic import geolocation
+from average_temperature.business_logic.exceptions import ServiceNotConfigured
+from average_temperature.business_logic.google_api.client import GoogleApiClient
+from average_temperature.business_logic.zip_code_index import ZipCodeIndex
+
+
+@mark.parametrize('zip_code, expected', [
+    ('10001', (40.7484, -73.9967)),  # New York
+    ('00501', (40.8154, -73.0451)),  # the first one
+    ('99950', (55.3422, -131.6478)),  # the last one
+    (' 10001 ', (40.7484, -73.9967)),
+    ('00000', None),
+    ('100010', None),
+    ('SW1A 1AA', None),
+])
+def test_bundled_zip_code_index(zip_code, expected):
+    """
+    Check the bundled zip code index translates well known zip codes, and only them
+    """
+    assert geolocation.zip_code_index.get(zip_code) == expected
+
+
+def test_zip_code_index_round_trip(tmp_path):
+    """
+    Check a saved zip code index is loaded back, whatever the length of its zip codes
+    """
+    path = str(tmp_path / 'zip_codes.bin')
+    entries = [('h0h 0h0', 90., -135.), ('10001', 40.75, -73.99), ('1000', -34.6, -58.38), ('10001', 40.7484, -74.)]
+    assert ZipCodeIndex.save(path, entries) == 3
+
+    zip_code_index = ZipCodeIndex(path)
+    assert len(zip_code_index) == 3
+    assert zip_code_index.get('H0H 0H0') == (90., -135.)
+    assert zip_code_index.get('10001') == (40.7484, -74.)
+    assert zip_code_index.get('1000') == (-34.6, -58.38)
+    assert zip_code_index.get('100') is None
+    assert zip_code_index.get('10002') is None
+
+
+def test_not_a_zip_code_index(tmp_path):
+    """
+    Check a file that is not a zip code index is rejected
+    """
+    path = tmp_path / 'zip_codes.bin'
+    path.write_bytes(b'LMSK' + bytes(20))
+    with raises(ValueError):
+        ZipCodeIndex(str(path)).get('10001')
+
+
+def test_google_is_only_requested_for_missing_zip_codes(monkeypatch):
+    """
+    Check Google Maps API is only requested for zip codes missing from the index, and only if it's configured
+    """
+    get_location = AsyncMock(return_value=None)
+    monkeypatch.setattr(GoogleApiClient, 'get_location_from_zip_code_async', get_location)
+    monkeypatch.setattr(geolocation, 'GOOGLE_MAPS_API_KEY', None)
+
+    assert geolocation.get_coordinates_from_zip_code('10001') == (40.7484, -73.9967)
+    with raises(ServiceNotConfigured):
+        geolocation.get_coordinates_from_zip_code('00000')
+    assert get_location.call_count == 0
+
+    monkeypatch.setattr(geolocation, 'GOOGLE_MAPS_API_KEY', 'key')
+    assert geolocation.get_coordinates_from_zip_code('00000') is None
+    assert get_location.call_count == 1
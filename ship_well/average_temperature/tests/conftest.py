@@ -1,20 +1,95 @@
+import json
+import os
 import requests
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, PropertyMock
 
+import django
 from pytest import fixture
 
+from average_temperature.business_logic.sessions import AsyncPooledSession
+
+
+# the views are tested through Django's test client
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ship_well.settings')
+django.setup()
+
+
+def _mock_response():
+    """
+    Mock a requests' response whose raw body is the encoding of whatever its json method is set to return, as it's
+    the other way around in real responses
+    """
+    response = MagicMock()
+    type(response).content = PropertyMock(side_effect=lambda: json.dumps(response.json()).encode())
+    return response
+
 
 @fixture
 def requests_mock_get(monkeypatch):
-    response = MagicMock()
+    response = _mock_response()
     get = MagicMock(return_value=response)
-    monkeypatch.setattr(requests, "get", get)
+    monkeypatch.setattr(requests.Session, "get", get)
     return get, response
 
 
 @fixture
 def requests_mock_post(monkeypatch):
-    response = MagicMock()
+    response = _mock_response()
     post = MagicMock(return_value=response)
-    monkeypatch.setattr(requests, "post", post)
+    monkeypatch.setattr(requests.Session, "post", post)
     return post, response
+
+
+@fixture
+def aiohttp_mock_session(monkeypatch):
+    response = MagicMock()
+    response.read = AsyncMock()
+    response.get_encoding = MagicMock(return_value='utf-8')
+    request_context = MagicMock()
+    request_context.__aenter__.return_value = response
+    session = MagicMock()
+    session.request.return_value = request_context
+    session.get.return_value = request_context
+    monkeypatch.setattr(AsyncPooledSession, "get", lambda self: session)
+    return session, response
+
+
+@fixture
+def reading_cache():
+    from average_temperature.business_logic.fetch import reading_cache
+    reading_cache.clear()
+    yield reading_cache
+    reading_cache.clear()
+
+
+@fixture
+def nearby_readings():
+    from average_temperature.business_logic.fetch import nearby_readings
+    nearby_readings.clear()
+    yield nearby_readings
+    nearby_readings.clear()
+
+
+@fixture
+def circuit_breakers(monkeypatch):
+    from average_temperature.business_logic.circuit_breaker import CircuitBreaker
+    from average_temperature.business_logic.temperature_source.sources import WEATHER_SOURCE
+    breakers = {}
+    for source, source_class in WEATHER_SOURCE.items():
+        breakers[source] = CircuitBreaker(window=4, min_requests=2, failure_rate=0.5, slow_request_duration=1,
+                                          slow_request_rate=0.5, open_duration=60, probes=1)
+        monkeypatch.setattr(source_class, 'circuit_breaker', breakers[source])
+    return breakers
+
+
+@fixture(autouse=True)
+def shared_cache(monkeypatch, tmp_path):
+    """
+    Every test gets a shared cache of its own, so no reading is shared across tests
+    """
+    from average_temperature.business_logic.shared_cache import shared_cache
+    shared_cache.close()
+    monkeypatch.setattr(shared_cache, 'path', str(tmp_path / 'shared_cache.sqlite3'))
+    shared_cache.clear()
+    yield shared_cache
+    shared_cache.close()
@@ -0,0 +1,53 @@
+from unittest.mock import AsyncMock, MagicMock
+
+from pytest import fixture
+
+from average_temperature import lifecycle
+from average_temperature.management.commands.serve import DjangoUvicornWorker, get_options
+
+
+@fixture
+def worker_mocks(monkeypatch):
+    source_class = MagicMock()
+    source_class.close_async_session = AsyncMock()
+    prefetch_scheduler = MagicMock()
+    executor = MagicMock()
+    monkeypatch.setattr(lifecycle, 'WEATHER_SOURCE', {'noaa': source_class})
+    monkeypatch.setattr(lifecycle, 'prefetch_scheduler', prefetch_scheduler)
+    monkeypatch.setattr(lifecycle, 'get_fetch_executor', lambda: executor)
+    monkeypatch.setattr(lifecycle, 'geocoding_cache', MagicMock())
+    monkeypatch.setattr(lifecycle, '_started', False)
+    return source_class, prefetch_scheduler, executor
+
+
+def test_worker_is_started_and_stopped_once(worker_mocks):
+    """
+    Check the per-process work is started once, however many times the app is loaded, and stopped once
+    """
+    source_class, prefetch_scheduler, executor = worker_mocks
+    lifecycle.start_worker()
+    lifecycle.start_worker()
+    source_class.warm_up.assert_called_once()
+    prefetch_scheduler.start.assert_called_once()
+
+    lifecycle.stop_worker()
+    lifecycle.stop_worker()
+    prefetch_scheduler.stop.assert_called_once()
+    source_class.close_async_session.assert_awaited_once()
+    executor.shutdown.assert_called_once_with(wait=False)
+
+
+def test_serving_options():
+    """
+    Check the app is preloaded, and every interface gets its kind of worker
+    """
+    options = get_options('asgi', '127.0.0.1:80', 4, 8, 30)
+    assert options['preload_app']
+    assert options['workers'] == 4
+    assert options['worker_class'].endswith(DjangoUvicornWorker.__name__)
+    assert 'threads' not in options
+    assert DjangoUvicornWorker.CONFIG_KWARGS['lifespan'] == 'off'
+
+    options = get_options('wsgi', '127.0.0.1:80', 4, 8, 30)
+    assert options['worker_class'] == 'gthread'
+    assert options['threads'] == 8
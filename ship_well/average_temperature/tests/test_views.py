@@ -0,0 +1,253 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from django.test import AsyncClient, override_settings
+from pytest import fixture
+
+from average_temperature import views
+from average_temperature.business_logic import AverageTemperature, TemperatureAverageException
+from average_temperature.business_logic.cache import LRUCache
+from average_temperature.views import _etag_matches
+from ship_well.settings import BATCH_STREAM_MAX_BODY_SIZE, BATCH_STREAM_MAX_LOCATIONS
+
+
+@fixture
+def average_mock(monkeypatch):
+    """
+    Mock the average of every location: it's the latitude, and it takes as many hundredths of a second. It fails for
+    latitude 13
+
+    :return: the latitudes the average was computed for
+    """
+    calls = []
+
+    async def get_average(latitude, longitude, filters):
+        calls.append(latitude)
+        await asyncio.sleep(latitude / 100)
+        if latitude == 13:
+            raise TemperatureAverageException('foo')
+        return AverageTemperature(celsius=latitude, sources=['noaa'], distance_km=0., max_age=60.)
+
+    monkeypatch.setattr(views, 'ENABLE_COORDINATES_CHECKING', False)
+    monkeypatch.setattr(views, 'get_average_temperature_detail_async', get_average)
+    return calls
+
+
+@fixture
+def location_popularity():
+    from average_temperature.business_logic import location_popularity
+    location_popularity.clear()
+    yield location_popularity
+    location_popularity.clear()
+
+
+async def _post_batch(body, query: str = ''):
+    """
+    Post a batch, which may be a JSON serializable object or the raw body, and read the whole response
+
+    :return: the response, and its content
+    """
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    response = await AsyncClient().post('/average_temperature/batch' + query, body, content_type='application/json')
+    if response.streaming:
+        return response, b''.join([chunk async for chunk in response.streaming_content])
+    return response, response.content
+
+
+def test_etag_matches():
+    """
+    Check If-None-Match headers are matched with the weak comparison, including lists and the wildcard
+    """
+    assert _etag_matches('"abc"', '"abc"')
+    assert _etag_matches('W/"abc"', '"abc"')
+    assert _etag_matches('"xyz", "abc"', '"abc"')
+    assert _etag_matches('*', '"abc"')
+    assert not _etag_matches('"xyz"', '"abc"')
+    assert not _etag_matches('abc', '"abc"')  # malformed
+
+
+def test_conditional_requests(average_mock, monkeypatch):
+    """
+    Check a response carries its ETag and stays fresh as long as its readings, that a request with a matching
+    If-None-Match is answered 304 without computing the average again until then, and that errors must not be cached
+    """
+    clock = SimpleNamespace(monotonic=lambda: 1000.)
+    monkeypatch.setattr(views, 'time', clock)
+    monkeypatch.setattr(views, 'response_validators', LRUCache(10))
+    client = AsyncClient()
+    location = {'latitude': 1, 'longitude': 0}
+
+    response = asyncio.run(client.get('/average_temperature', location))
+    assert response.status_code == 200
+    assert response['Cache-Control'] == 'max-age=60'
+    etag = response['ETag']
+
+    clock.monotonic = lambda: 1030.
+    response = asyncio.run(client.get('/average_temperature', location, headers={'If-None-Match': etag}))
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response['ETag'] == etag
+    assert response['Cache-Control'] == 'max-age=30'
+    assert average_mock == [1]
+
+    response = asyncio.run(client.get('/average_temperature', location, headers={'If-None-Match': '"other"'}))
+    assert response.status_code == 200
+    assert average_mock == [1, 1]
+
+    # the validator is not honoured once the readings are no longer fresh
+    clock.monotonic = lambda: 1100.
+    asyncio.run(client.get('/average_temperature', location, headers={'If-None-Match': etag}))
+    assert average_mock == [1, 1, 1]
+
+    response = asyncio.run(client.get('/average_temperature', {'latitude': 13, 'longitude': 0}))
+    assert response.status_code == 500
+    assert response['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response
+
+
+def test_coordinates_out_of_range(average_mock, location_popularity):
+    """
+    Check coordinates that are not finite or are out of range are answered 400, without computing the average or
+    counting towards the popularity of the location
+    """
+    for latitude, longitude in [('nan', '0'), ('1e400', '0'), ('0', '-inf'), ('90.1', '0'), ('0', '180.1')]:
+        response = asyncio.run(AsyncClient().get('/average_temperature',
+                                                 {'latitude': latitude, 'longitude': longitude}))
+        assert response.status_code == 400
+        assert 'error' in response.json()
+        assert response['Cache-Control'] == 'no-store'
+    assert average_mock == []
+    assert location_popularity.top(10) == []
+
+
+def test_only_valid_coordinates_are_popular(average_mock, location_popularity, monkeypatch):
+    """
+    Check only the coordinates that pass validation count towards the popularity of the location
+    """
+    monkeypatch.setattr(views, 'ENABLE_COORDINATES_CHECKING', True)
+    monkeypatch.setattr(views, 'validate_coordinates_async', AsyncMock(side_effect=lambda latitude, _: latitude == 1))
+
+    assert asyncio.run(AsyncClient().get('/average_temperature', {'latitude': 2, 'longitude': 0})).status_code == 400
+    assert asyncio.run(AsyncClient().get('/average_temperature', {'latitude': 1, 'longitude': 0})).status_code == 200
+    assert location_popularity.top(10) == [(1., 0.)]
+
+
+def test_batch(average_mock):
+    """
+    Check a batch is answered with the result of every location in order, each one with its status, that a failing
+    location only fails its own result, and that repeated locations are computed once
+    """
+    locations = [{'latitude': 3, 'longitude': 0},
+                 {'latitude': 1, 'longitude': 0, 'filters': 'noaa'},
+                 {'latitude': 13, 'longitude': 0},
+                 {'latitude': 1},
+                 {'latitude': 1, 'longitude': 0, 'filters': 'foo'},
+                 {'latitude': 3, 'longitude': 0}]
+    response, content = asyncio.run(_post_batch({'locations': locations}))
+
+    assert response.status_code == 200
+    results = json.loads(content)['results']
+    assert [result['status'] for result in results] == [200, 200, 500, 400, 400, 200]
+    assert results[0] == {'celsius': 3, 'sources': ['noaa'], 'distance_km': 0., 'status': 200}
+    assert results[1]['celsius'] == 1
+    assert results[5] == results[0]
+    assert all('error' in result for result in results[2:5])
+    assert sorted(average_mock) == [1, 3, 13]
+
+
+def test_batch_over_the_limits(average_mock, monkeypatch):
+    """
+    Check batches with too many locations or too big a body are answered 400 with a JSON error
+    """
+    monkeypatch.setattr(views, 'BATCH_MAX_LOCATIONS', 2)
+    response, content = asyncio.run(_post_batch({'locations': [{'latitude': 1, 'longitude': 0}] * 3}))
+    assert response.status_code == 400
+    assert json.loads(content) == {'error': 'At most 2 locations are allowed'}
+
+    response, content = asyncio.run(_post_batch({'locations': [{'latitude': 1, 'longitude': 0}] * 2}))
+    assert response.status_code == 200
+
+    # bodies over Django's limit are answered with a JSON error as well
+    with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=10):
+        response, content = asyncio.run(_post_batch({'locations': [{'latitude': 1, 'longitude': 0}] * 2}))
+    assert response.status_code == 400
+    assert json.loads(content) == {'error': 'The body must be at most 10 bytes'}
+
+
+def test_malformed_batch(average_mock):
+    """
+    Check bodies that are not JSON objects with a list of locations are answered 400 with a JSON error, and locations
+    with parameters of the wrong type get a 400 result of their own
+    """
+    for body in ['{"locations": ', '[]', {'places': []}, {'locations': {}}, {'locations': [1]}]:
+        response, content = asyncio.run(_post_batch(body))
+        assert response.status_code == 400
+        assert 'error' in json.loads(content)
+
+    response = asyncio.run(AsyncClient().get('/average_temperature/batch'))
+    assert response.status_code == 405
+
+    # locations with parameters of the wrong type only fail their own result
+    locations = [{'zip_code': 10001},
+                 {'zip_code': ['x']},
+                 {'latitude': 1, 'longitude': 0, 'filters': 5},
+                 {'latitude': 1, 'longitude': 0, 'filters': [{}]},
+                 {'latitude': True, 'longitude': 0},
+                 {'latitude': 1, 'longitude': '0'},
+                 {'latitude': 1, 'longitude': 0, 'filters': ['noaa']}]
+    response, content = asyncio.run(_post_batch({'locations': locations}))
+    assert response.status_code == 200
+    results = json.loads(content)['results']
+    assert [result['status'] for result in results] == [400] * 6 + [200]
+    assert all('error' in result for result in results[:6])
+    assert average_mock == [1]
+
+
+def test_streamed_batch(average_mock):
+    """
+    Check a streamed batch is answered with a line of JSON per location as soon as it's computed, each one with the
+    index of its location, and that a failing location only fails its own line
+    """
+    locations = [{'latitude': 3, 'longitude': 0},
+                 {'latitude': 1, 'longitude': 0},
+                 {'latitude': 13, 'longitude': 0},
+                 {'latitude': 2}]
+    response, content = asyncio.run(_post_batch({'locations': locations}, '?stream'))
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert content.endswith(b'\n')
+    lines = [json.loads(line) for line in content.decode().splitlines()]
+    assert [line['index'] for line in lines] == [3, 1, 0, 2]
+    assert lines[1] == {'celsius': 1, 'sources': ['noaa'], 'distance_km': 0., 'status': 200, 'index': 1}
+    assert lines[2]['celsius'] == 3
+    assert lines[0]['status'] == 400 and 'error' in lines[0]
+    assert lines[3]['status'] == 500 and 'error' in lines[3]
+
+
+def test_streamed_batch_over_the_limits(average_mock, monkeypatch):
+    """
+    Check streamed batches with too many locations or too big a body are answered 400 with a JSON error, that they
+    are not bound by Django's limit on the body of the rest of the requests, and that the largest batch allowed fits
+    """
+    monkeypatch.setattr(views, 'BATCH_STREAM_MAX_LOCATIONS', 2)
+    response, content = asyncio.run(_post_batch({'locations': [{'latitude': 1, 'longitude': 0}] * 3}, '?stream'))
+    assert response.status_code == 400
+    assert json.loads(content) == {'error': 'At most 2 locations are allowed'}
+
+    body = {'locations': [{'latitude': 1, 'longitude': 0}] * 2}
+    monkeypatch.setattr(views, 'BATCH_STREAM_MAX_BODY_SIZE', 100)
+    with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=10):
+        response, content = asyncio.run(_post_batch(body, '?stream'))
+    assert response.status_code == 200
+    assert len(content.splitlines()) == 2
+
+    response, content = asyncio.run(_post_batch({'locations': [{'latitude': 1, 'longitude': 0}] * 10}, '?stream'))
+    assert response.status_code == 400
+    assert json.loads(content) == {'error': 'The body of a streamed batch must be at most 100 bytes'}
+
+    location = {'latitude': -33.868820, 'longitude': 151.209296, 'filters': ['accuweather', 'noaa', 'weather.com']}
+    assert len(json.dumps({'locations': [location] * BATCH_STREAM_MAX_LOCATIONS})) <= BATCH_STREAM_MAX_BODY_SIZE
@@ -1,8 +1,10 @@
 from django.urls import path
 
-from .views import average_temperature
+from .views import average_temperature, average_temperature_batch, metrics
 
 
 urlpatterns = [
-    path('', average_temperature, name='average_temperature'),
+    path('average_temperature', average_temperature, name='average_temperature'),
+    path('average_temperature/batch', average_temperature_batch, name='average_temperature_batch'),
+    path('metrics', metrics, name='metrics'),
 ]
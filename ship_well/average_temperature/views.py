@@ -1,98 +1,172 @@
-from typing import List
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import time
+from typing import List, Tuple
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import (
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
 
-from ship_well.settings import ENABLE_COORDINATES_CHECKING, GOOGLE_MAPS_API_KEY
+from ship_well.settings import (
+    ENABLE_COORDINATES_CHECKING,
+    BATCH_MAX_LOCATIONS,
+    BATCH_STREAM_MAX_LOCATIONS,
+    BATCH_STREAM_MAX_BODY_SIZE,
+    BATCH_STREAM_CONCURRENCY,
+    HTTP_CACHE_MAX_ENTRIES,
+    LATENCY_BUDGET,
+    LATENCY_BUDGET_MAX,
+)
 from .business_logic import (
-    get_average_temperature,
+    get_average_temperature_detail_async,
     get_valid_sources,
-    get_coordinates_from_zip_code,
-    validate_coordinates,
+    get_coordinates_from_zip_code_async,
+    validate_coordinates_async,
+    location_popularity,
+    render_metrics,
+    latency_budget,
     TemperatureAverageException,
     ServiceConnectionError,
+    ServiceNotConfigured,
+    ServiceTimeout,
     ServiceUnexpectedResponse,
+    TemperatureAverageTimeout,
 
 )
+from .business_logic.cache import LRUCache
+
+
+# request key -> (ETag, monotonic time it expires at) of the last response to the request. See average_temperature
+response_validators = LRUCache(HTTP_CACHE_MAX_ENTRIES)
 
 
-def _handle_average_temperature_by_coordinates(
-        latitude: float, longitude: float, filters: List[str] = None, validate: bool = True):
+async def _handle_average_temperature_by_coordinates(
+        latitude: float, longitude: float, filters: List[str] = None,
+        validate: bool = True) -> Tuple[dict, int, float]:
     """
-    Builds a response with the average temperature for a given location
+    Builds a response body with the average temperature for a given location, along with its status code and the
+    seconds it stays fresh
 
     Since coordinate validation depends on an external source, availability can't be guaranteed, so the validate
-    flag can be used to disable it.
+    flag can be used to disable it. Coordinates out of range are always rejected, and only the coordinates that pass
+    validation count towards the popularity of the location (see business_logic/prefetch.py).
 
     :param latitude: the desired latitude
     :param longitude: the desired longitude
     :param filters: an optional list of the sources to consider
     :param validate: weather validate or the coordinates
-    :return: the corresponding response
+    :return: the corresponding response body, status code and seconds it stays fresh
     """
+    if not _are_coordinates_in_range(latitude, longitude):
+        error = 'The specified coordinates are out of range ({}, {})'.format(latitude, longitude)
+        return {'error': error}, 400, 0.
+
     if validate:
         try:
-            are_valid = validate_coordinates(latitude, longitude)
+            are_valid = await validate_coordinates_async(latitude, longitude)
+        except ServiceTimeout:
+            return {'error': 'Could not validate the coordinates in time'}, 504, 0.
         except ServiceConnectionError:
-            return JsonResponse(
-                {'error': 'Can not connect to the underlying services to validate the coordinates'},
-                status=500
-            )
+            return {'error': 'Can not connect to the underlying services to validate the coordinates'}, 500, 0.
         except ServiceUnexpectedResponse:
-            return JsonResponse(
-                {'error': 'Could not validate the coordinates ({}, {})'.format(latitude, longitude)},
-                status=500
-            )
+            return {'error': 'Could not validate the coordinates ({}, {})'.format(latitude, longitude)}, 500, 0.
         else:
             if not are_valid:
-                return JsonResponse(
-                    {'error': 'The specified coordinates are invalid ({}, {})'.format(latitude, longitude)},
-                    status=400
-                )
+                return {'error': 'The specified coordinates are invalid ({}, {})'.format(latitude, longitude)}, 400, 0.
 
+    location_popularity.record(latitude, longitude)
     try:
-        average_weather = get_average_temperature(latitude, longitude, filters)
-        return JsonResponse({'celsius': average_weather})
+        average_weather = await get_average_temperature_detail_async(latitude, longitude, filters)
+        return {
+            'celsius': average_weather.celsius,
+            'sources': average_weather.sources,
+            'distance_km': round(average_weather.distance_km, 3),
+        }, 200, average_weather.max_age
+    except (ServiceTimeout, TemperatureAverageTimeout):
+        error = 'Could not retrieve current temperature for location ({}, {}) in time'.format(latitude, longitude)
+        return {'error': error}, 504, 0.
     except TemperatureAverageException:
-        return JsonResponse(
-            {'error': 'Could not retrieve current temperature for location ({}, {})'.format(latitude, longitude)},
-            status=500
-        )
+        error = 'Could not retrieve current temperature for location ({}, {})'.format(latitude, longitude)
+        return {'error': error}, 500, 0.
 
 
-def _handle_average_temperature_by_zip_code(zip_code: str, filters: List[str] = None):
+async def _handle_average_temperature_by_zip_code(zip_code: str,
+                                                  filters: List[str] = None) -> Tuple[dict, int, float]:
     """
-    Builds a response with the average temperature for a given location
+    Builds a response body with the average temperature for a given location, along with its status code and the
+    seconds it stays fresh
 
     :param zip_code: the desired zip_code
     :param filters: an optional list of the sources to consider
-    :return: the corresponding response
+    :return: the corresponding response body, status code and seconds it stays fresh
     """
     try:
-        coords = get_coordinates_from_zip_code(zip_code)
+        coords = await get_coordinates_from_zip_code_async(zip_code)
+    except ServiceNotConfigured:
+        return {'error': 'Google API Key not configured.'}, 500, 0.
+    except ServiceTimeout:
+        return {'error': 'Could not translate the zip code into coordinates in time'}, 504, 0.
     except ServiceConnectionError:
-        return JsonResponse(
-            {'error': 'Can not connect to the underlying services to translate the zip code into coordinates'},
-            status=500
-        )
+        error = 'Can not connect to the underlying services to translate the zip code into coordinates'
+        return {'error': error}, 500, 0.
     except ServiceUnexpectedResponse:
-        return JsonResponse(
-            {'error': 'Could not get the location for zip_code {}'.format(zip_code)},
-            status=500
-        )
+        return {'error': 'Could not get the location for zip_code {}'.format(zip_code)}, 500, 0.
     else:
         if coords is None:
-            return JsonResponse(
-                {'error': 'The specified zip_code is invalid: {}'.format(zip_code)},
-                status=400
-            )
+            return {'error': 'The specified zip_code is invalid: {}'.format(zip_code)}, 400, 0.
         latitude, longitude = coords
-        return _handle_average_temperature_by_coordinates(latitude, longitude, filters, validate=False)
+        return await _handle_average_temperature_by_coordinates(latitude, longitude, filters, validate=False)
+
 
+async def _handle_average_temperature(zip_code: str, latitude: str, longitude: str,
+                                      filters: List[str] = None) -> Tuple[dict, int, float]:
+    """
+    Validates the parameters of a location and builds a response body with its average temperature, along with its
+    status code and the seconds it stays fresh
 
-def average_temperature(request):
+    :param zip_code: the desired zip_code, if any
+    :param latitude: the desired latitude, if there's no zip code
+    :param longitude: the desired longitude, if there's no zip code
+    :param filters: an optional list of the sources to consider
+    :return: the corresponding response body, status code and seconds it stays fresh
+    """
+    # check filters are valid
+    if filters:
+        missing_sources = set(filters) - set(get_valid_sources())
+        if missing_sources:
+            return {'error': 'The following provided filters are no valid: {}'.format(missing_sources)}, 400, 0.
+
+    if zip_code:
+        return await _handle_average_temperature_by_zip_code(zip_code, filters)
+    else:
+        if latitude in (None, '') or longitude in (None, ''):
+            return {'error': 'latitude and/or longitude params are missing and zip_code is missing as well'}, 400, 0.
+
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+        except (TypeError, ValueError):
+            return {'error': 'latitude and longitude must be numeric values'}, 400, 0.
+        return await _handle_average_temperature_by_coordinates(latitude, longitude, filters,
+                                                                validate=ENABLE_COORDINATES_CHECKING)
+
+
+async def average_temperature(request):
     """
     Retrieve the current temperature at a given location as an average of several sources.
 
+    This is an asynchronous view: served under ASGI, waiting for the underlying services doesn't hold any thread.
+
     The query params accepted are the following:
      * zip_code: the zip_code of the desired location
      * latitude: the latitude coordinate of the desired location
@@ -101,42 +175,297 @@ def average_temperature(request):
        - noaa
        - accuweather
        - weather.com
+     * timeout: the seconds to compute the average in, up to LATENCY_BUDGET_MAX. LATENCY_BUDGET by default
 
     *Note*: - if zip_code param is present, latitude and longitude params are ignored.
             - if filters param is not present, all the sources are considered
+
+    The timeout is the latency budget of the request (see business_logic/budget.py): no upstream call outlives it.
+    Once it runs out, the response is 504 Gateway Timeout, unless the average can be computed from the sources that
+    answered (see LATENCY_ORIENTED_AVERAGING and AGREEMENT_TOLERANCE).
+
+    Successful responses carry a strong ETag, and can be cached until the first of the readings they were computed
+    from is no longer fresh. Until then, a request with a matching If-None-Match is answered 304 Not Modified without
+    computing the average again. Failed responses must not be cached.
     """
-    # check filters are valid
-    filters = request.GET.getlist('filters')
-    if filters:
-        missing_sources = set(filters) - set(get_valid_sources())
-        if missing_sources:
-            return JsonResponse(
-                {'error': 'The following provided filters are no valid: {}'.format(missing_sources)},
-                status=400
-            )
+    budget, error = _get_latency_budget(request)
+    if error:
+        response = JsonResponse({'error': error}, status=400)
+        response['Cache-Control'] = 'no-store'
+        return response
 
-    zip_code = request.GET.get('zip_code')
-    if zip_code:
-        if GOOGLE_MAPS_API_KEY is None:
-            return JsonResponse(
-                {'error': 'Google API Key not configured.'}, status=500
-            )
+    location = {
+        'zip_code': request.GET.get('zip_code'),
+        'latitude': request.GET.get('latitude'),
+        'longitude': request.GET.get('longitude'),
+        'filters': request.GET.getlist('filters'),
+    }
+    key = _get_location_key(location)
+    if_none_match = request.headers.get('If-None-Match')
+
+    if if_none_match:
+        validator = response_validators.get(key)
+        if validator is not LRUCache.MISSING:
+            etag, expires_at = validator
+            max_age = expires_at - time.monotonic()
+            if max_age > 0 and _etag_matches(if_none_match, etag):
+                return _set_cache_headers(HttpResponseNotModified(), etag, max_age)
+
+    with latency_budget(budget):
+        body, status, max_age = await _handle_average_temperature(location['zip_code'], location['latitude'],
+                                                                  location['longitude'], location['filters'])
+    response = JsonResponse(body, status=status)
+    if status != 200:
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    etag = '"{}"'.format(hashlib.blake2b(response.content, digest_size=16).hexdigest())
+    if max_age > 0:
+        response_validators.put(key, (etag, time.monotonic() + max_age))
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponseNotModified()
+    return _set_cache_headers(response, etag, max_age)
+
+
+async def average_temperature_batch(request):
+    """
+    Retrieve the current temperature at several locations, each one as an average of several sources.
+
+    The request body must be a JSON object with the key "locations": a list of objects with the same keys as the
+    query params accepted by average_temperature (zip_code, or latitude and longitude, and optionally filters).
+
+    The response is a JSON object with the key "results": a list with the result of every location, in the same
+    order. Every result has the same keys as the response of average_temperature, plus its "status" code. Locations
+    whose parameters are of the wrong type, i.e. a numeric zip_code, get a result with status 400.
+
+    Repeated locations are only computed once, and the requests to the sources for all the locations are performed
+    concurrently, sharing the same connections, cache and in-flight requests.
+
+    If the query param "stream" is present, the response is streamed as newline delimited JSON instead: one line per
+    location, written as soon as its average is computed, so the results are not in order but carry the "index" of
+    their location. See _stream_batch_results. Streaming relies on ASGI: under WSGI, Django consumes the whole
+    response before sending it, so the lines are only sent once every location is computed, and all of them are held
+    in memory meanwhile.
+
+    The timeout query param is accepted as well, and is the latency budget of every location. Bodies over
+    DATA_UPLOAD_MAX_MEMORY_SIZE bytes, or BATCH_STREAM_MAX_BODY_SIZE if streamed, are answered 400, like any other
+    invalid body.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    budget, error = _get_latency_budget(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    stream = 'stream' in request.GET
+    body, error = _read_batch_body(request, stream)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    try:
+        locations = json.loads(body)['locations']
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'The body must be a JSON object with a list of locations'}, status=400)
+
+    if not isinstance(locations, list) or not all(isinstance(location, dict) for location in locations):
+        return JsonResponse({'error': 'locations must be a list of objects'}, status=400)
+
+    max_locations = BATCH_STREAM_MAX_LOCATIONS if stream else BATCH_MAX_LOCATIONS
+    if len(locations) > max_locations:
+        return JsonResponse({'error': 'At most {} locations are allowed'.format(max_locations)}, status=400)
+
+    if stream:
+        return StreamingHttpResponse(_stream_batch_results(locations, budget), content_type='application/x-ndjson')
+
+    # every distinct location is computed once
+    keys = [_get_location_key(location) for location in locations]
+    unique_locations = dict(zip(keys, locations))
+    unique_results = await asyncio.gather(*[
+        _handle_batch_location(location, budget) for location in unique_locations.values()
+    ])
+    results_by_key = dict(zip(unique_locations, unique_results))
+
+    results = []
+    for key in keys:
+        body, status, _ = results_by_key[key]
+        results.append(dict(body, status=status))
+
+    return JsonResponse({'results': results})
+
+
+async def metrics(request):
+    """
+    Expose the metrics of the app in Prometheus text format: latency, errors and requests in flight of every upstream
+    service, along with the state of the caches, circuit breakers and executor.
+    """
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-        return _handle_average_temperature_by_zip_code(zip_code, filters)
-    else:
-        latitude = request.GET.get('latitude')
-        longitude = request.GET.get('longitude')
 
-        if not latitude or not longitude:
-            return JsonResponse({'error': 'latitude and/or longitude params are missing and '
-                                          'zip_code is missing as well'},
-                                status=400)
+async def _stream_batch_results(locations: List[dict], budget: float):
+    """
+    Compute the results of the locations of a batch, and yield them as newline delimited JSON as they are ready
+
+    At most BATCH_STREAM_CONCURRENCY locations are computed at a time, so the memory held doesn't depend on the size
+    of the batch. Repeated locations are not kept apart: they are served from the reading cache.
+
+    :param locations: the locations of the batch
+    :param budget: the latency budget of every location, in seconds
+    :return: an asynchronous iterator over the lines of the response
+    """
+    pending_locations = enumerate(locations)
+    in_flight = set()
+
+    def schedule_next_location():
+        for index, location in itertools.islice(pending_locations, 1):
+            in_flight.add(asyncio.ensure_future(_handle_batch_location(location, budget, index)))
+
+    for _ in range(BATCH_STREAM_CONCURRENCY):
+        schedule_next_location()
+
+    try:
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                in_flight.remove(task)
+                schedule_next_location()
+
+                body, status, _, index = task.result()
+                yield json.dumps(dict(body, status=status, index=index)) + '\n'
+    finally:
+        # the client may have gone away
+        for task in in_flight:
+            task.cancel()
+
+
+async def _handle_batch_location(location: dict, budget: float, *extra):
+    """
+    Builds the response body of a location of a batch within a latency budget, along with its status code, the
+    seconds it stays fresh and the given extra values
+    """
+    error = _check_batch_location(location)
+    if error:
+        return ({'error': error}, 400, 0.) + extra
+
+    with latency_budget(budget):
+        result = await _handle_average_temperature(location.get('zip_code'),
+                                                   location.get('latitude'),
+                                                   location.get('longitude'),
+                                                   _get_batch_location_filters(location))
+    return result + extra
+
 
+def _get_latency_budget(request) -> Tuple[float, str]:
+    """
+    Get the latency budget of a request: the seconds of its timeout query param, up to LATENCY_BUDGET_MAX, or
+    LATENCY_BUDGET if there's none
+
+    :return: the budget in seconds, and the error if the timeout query param is invalid
+    """
+    timeout = request.GET.get('timeout')
+    if timeout in (None, ''):
+        return LATENCY_BUDGET, None
+
+    try:
+        seconds = float(timeout)
+    except ValueError:
+        seconds = None
+    if seconds is None or not seconds > 0:  # NaN is not greater than 0 either
+        return None, 'timeout must be a positive amount of seconds'
+    return min(seconds, LATENCY_BUDGET_MAX), None
+
+
+def _are_coordinates_in_range(latitude: float, longitude: float) -> bool:
+    """
+    Tell whether coordinates are finite, and within the range of latitudes and longitudes. NaN and infinity parse as
+    floats, but they are no location
+    """
+    return (math.isfinite(latitude) and math.isfinite(longitude) and
+            -90 <= latitude <= 90 and -180 <= longitude <= 180)
+
+
+def _check_batch_location(location: dict) -> str:
+    """
+    Check the types of the parameters of a location of a batch, as JSON bodies can hold any type
+
+    :return: the error, or None if the types are right
+    """
+    zip_code = location.get('zip_code')
+    if zip_code is not None and not isinstance(zip_code, str):
+        return 'zip_code must be a string'
+
+    for coordinate in ('latitude', 'longitude'):
+        value = location.get(coordinate)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return 'latitude and longitude must be numeric values'
+
+    filters = location.get('filters')
+    if filters is not None and not isinstance(filters, str) and not (
+            isinstance(filters, list) and all(isinstance(source, str) for source in filters)):
+        return 'filters must be a source or a list of sources'
+    return None
+
+
+def _read_batch_body(request, stream: bool) -> Tuple[bytes, str]:
+    """
+    Read the body of a batch. Streamed batches may be bigger than the rest of the requests: up to
+    BATCH_STREAM_MAX_BODY_SIZE bytes, instead of Django's DATA_UPLOAD_MAX_MEMORY_SIZE
+
+    :return: the body, and the error if it's too big
+    """
+    if not stream:
         try:
-            latitude = float(latitude)
-            longitude = float(longitude)
-        except ValueError:
-            return JsonResponse({'error': 'latitude and longitude must be numeric values'}, status=400)
-        else:
-            return _handle_average_temperature_by_coordinates(latitude, longitude, filters,
-                                                              validate=ENABLE_COORDINATES_CHECKING)
+            return request.body, None
+        except RequestDataTooBig:
+            return None, 'The body must be at most {} bytes'.format(settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+    error = 'The body of a streamed batch must be at most {} bytes'.format(BATCH_STREAM_MAX_BODY_SIZE)
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > BATCH_STREAM_MAX_BODY_SIZE:
+        return None, error
+
+    # the body may be sent without a length
+    body = request.read(BATCH_STREAM_MAX_BODY_SIZE + 1)
+    if len(body) > BATCH_STREAM_MAX_BODY_SIZE:
+        return None, error
+    return body, None
+
+
+def _get_batch_location_filters(location: dict) -> List[str]:
+    """
+    Get the filters of a location of a batch, which may be a single source or a list of them
+    """
+    filters = location.get('filters')
+    if isinstance(filters, str):
+        return [filters]
+    return filters
+
+
+def _get_location_key(location: dict) -> str:
+    """
+    Get a key that is the same for the locations whose results are the same
+    """
+    filters = _get_batch_location_filters(location)
+    if isinstance(filters, list):
+        filters = sorted(set(map(str, filters)))
+
+    if location.get('zip_code'):
+        return json.dumps(['zip_code', location['zip_code'], filters])
+    return json.dumps(['coordinates', location.get('latitude'), location.get('longitude'), filters])
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Tell whether an If-None-Match header matches an ETag, with the weak comparison it calls for
+    """
+    etags = parse_etags(if_none_match)
+    return '*' in etags or any(candidate.replace('W/', '', 1) == etag for candidate in etags)
+
+
+def _set_cache_headers(response: HttpResponse, etag: str, max_age: float) -> HttpResponse:
+    response['ETag'] = etag
+    response['Cache-Control'] = 'max-age={}'.format(int(max_age))
+    return response
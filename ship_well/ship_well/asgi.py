@@ -0,0 +1,21 @@
+"""
+ASGI config for ship_well project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ship_well.settings')
+
+application = get_asgi_application()
+
+# a single process server: this process serves the requests. See the serve management command for the prefork server
+from average_temperature.lifecycle import start_worker  # noqa: E402
+
+start_worker()
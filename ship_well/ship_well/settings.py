@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,10 +30,16 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+INSTALLED_APPS = [
+    'average_temperature.apps.WeatherAverageConfig',
+]
+
 ROOT_URLCONF = 'ship_well.urls'
 
 WSGI_APPLICATION = 'ship_well.wsgi.application'
 
+ASGI_APPLICATION = 'ship_well.asgi.application'
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -43,8 +50,6 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 # This project uses Google Maps API with two purposes:
@@ -56,3 +61,160 @@ GOOGLE_MAPS_API_KEY = None  # SET API KEY HERE
 
 # By default, coordinates checking is disabled. You can enable it by setting this flag to True
 ENABLE_COORDINATES_CHECKING = False
+
+# Every upstream service (temperature sources and Google Maps API) is requested through its own pooled keep-alive
+# HTTP session. These settings tune the size of each pool, the connect and read timeouts (in seconds) and how many
+# connections are opened to each temperature source when the app starts
+UPSTREAM_POOL_SIZE = 20
+UPSTREAM_CONNECT_TIMEOUT = 3.05
+UPSTREAM_READ_TIMEOUT = 10
+UPSTREAM_PREWARM_CONNECTIONS = 2
+
+# The responses of the temperature sources are decoded with orjson (falling back to the standard library if it's not
+# installed). Set this flag to False to always decode them with the standard library
+FAST_JSON_PARSING = True
+
+# The blocking work of the fetch layer, like the lookups of the caches shared by the worker processes, runs on a
+# process-wide pool of threads, so it never blocks the event loop the sources are requested on. The pool grows, up to
+# FETCH_MAX_WORKERS, as calls pile up or their latency rises. Idle threads exit after FETCH_WORKER_IDLE_TIMEOUT
+# seconds, as long as there are FETCH_MIN_WORKERS left
+FETCH_MIN_WORKERS = 4
+FETCH_MAX_WORKERS = 200
+FETCH_WORKER_IDLE_TIMEOUT = 30
+
+# The temperature read from every source is cached by location. Locations are quantised to a grid of
+# READING_CACHE_GRID_SIZE degrees (0.01 is about 1 km), readings are fresh for READING_CACHE_TTL seconds and up to
+# READING_CACHE_MAX_ENTRIES readings are kept
+READING_CACHE_GRID_SIZE = 0.01
+READING_CACHE_TTL = 300
+READING_CACHE_MAX_ENTRIES = 100000
+
+# Stale-while-revalidate: for READING_CACHE_STALE_GRACE seconds after a reading outlived READING_CACHE_TTL, it's still
+# served right away while a single refresh is requested in the background. Set it to 0 to always wait for the source
+READING_CACHE_STALE_GRACE = 600
+
+# A source is not requested if it has a reading taken at most NEARBY_READING_RADIUS kilometres away from the requested
+# location in the last NEARBY_READING_MAX_AGE seconds: the nearest one is reused, and its distance is reported in the
+# response. Up to NEARBY_READING_MAX_ENTRIES readings are indexed. Set NEARBY_READING_RADIUS to 0 to disable it
+NEARBY_READING_RADIUS = 1.
+NEARBY_READING_MAX_AGE = 60
+NEARBY_READING_MAX_ENTRIES = 100000
+
+# The readings of the PREFETCH_TOP_LOCATIONS most requested locations are refreshed from every source before they
+# expire. They are checked every PREFETCH_INTERVAL seconds, and at most PREFETCH_BUDGET_PER_MINUTE upstream requests
+# per minute are spent on them. The popularity of a location halves every PREFETCH_POPULARITY_HALF_LIFE seconds
+PREFETCH_HOT_LOCATIONS = True
+PREFETCH_TOP_LOCATIONS = 300
+PREFETCH_BUDGET_PER_MINUTE = 600
+PREFETCH_INTERVAL = 30
+PREFETCH_POPULARITY_HALF_LIFE = 3600
+
+# The coordinates of every zip code translated by Google Maps API are stored in a SQLite database, so they survive
+# restarts. Up to GEOCODING_CACHE_MAX_ENTRIES zip codes are also kept in memory. The GEOCODING_CACHE_PATH environment
+# variable overrides its path, i.e. so the benchmarks don't write into the cache of the host
+GEOCODING_CACHE_PATH = os.environ.get('GEOCODING_CACHE_PATH', os.path.join(BASE_DIR, 'geocoding_cache.sqlite3'))
+GEOCODING_CACHE_MAX_ENTRIES = 10000
+
+# The worker processes of a host share their readings through a SQLite database in memory backed storage, so a reading
+# taken by one of them serves the rest. While a worker requests a source for a location, or Google Maps API for a zip
+# code, the other workers wait for it up to SHARED_CACHE_FILL_TIMEOUT seconds, checking every
+# SHARED_CACHE_POLL_INTERVAL seconds, instead of requesting it as well. Set SHARED_CACHE_PATH to None to disable it.
+# The SHARED_CACHE_PATH environment variable overrides its path, as GEOCODING_CACHE_PATH does
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'ship_well_shared_cache.sqlite3'))
+SHARED_CACHE_FILL_TIMEOUT = 5
+SHARED_CACHE_POLL_INTERVAL = 0.01
+
+# Coordinates are validated offline against a land mask bundled with the app, and Google Maps API is only requested
+# for coordinates that are not on land: near a coastline, or on water, as small islands are too small for the mask.
+# Set this flag to False to always validate coordinates with Google Maps API
+ENABLE_OFFLINE_COORDINATES_CHECKING = True
+LAND_MASK_PATH = os.path.join(BASE_DIR, 'average_temperature', 'business_logic', 'data', 'land_mask.bin')
+
+# Zip codes are translated offline with a zip code index bundled with the app, and Google Maps API is only requested
+# for the zip codes missing from it. Set this flag to False to always translate zip codes with Google Maps API
+ENABLE_OFFLINE_ZIP_CODES = True
+ZIP_CODE_INDEX_PATH = os.path.join(BASE_DIR, 'average_temperature', 'business_logic', 'data', 'zip_codes.bin')
+
+# The maximum amount of locations accepted by a single request to average_temperature/batch
+BATCH_MAX_LOCATIONS = 1000
+
+# Batches can be streamed as newline delimited JSON (average_temperature/batch?stream). Streamed batches accept up to
+# BATCH_STREAM_MAX_LOCATIONS locations, and BATCH_STREAM_CONCURRENCY of them are computed at a time
+BATCH_STREAM_MAX_LOCATIONS = 100000
+BATCH_STREAM_CONCURRENCY = 100
+
+# Django rejects request bodies over DATA_UPLOAD_MAX_MEMORY_SIZE bytes, 2.5 MB by default, which only fits streamed
+# batches of some tens of thousands of locations. Streamed batches alone accept bodies of up to
+# BATCH_STREAM_MAX_BODY_SIZE bytes, so the largest one fits at up to BATCH_LOCATION_MAX_SIZE bytes per location
+BATCH_LOCATION_MAX_SIZE = 256
+BATCH_STREAM_MAX_BODY_SIZE = BATCH_STREAM_MAX_LOCATIONS * BATCH_LOCATION_MAX_SIZE
+
+# Responses of average_temperature carry a strong ETag, and can be cached for as long as the readings they were
+# computed from stay fresh (Cache-Control max-age). Until then, a request whose If-None-Match matches the ETag of the
+# last response to the same parameters is answered 304 Not Modified, without computing the average again. The ETags of
+# up to HTTP_CACHE_MAX_ENTRIES distinct requests are kept
+HTTP_CACHE_MAX_ENTRIES = 100000
+
+# Every request to average_temperature, and every location of a batch, gets a latency budget of LATENCY_BUDGET seconds,
+# or the seconds given in its timeout query parameter, up to LATENCY_BUDGET_MAX. Upstream calls only get what's left of
+# it as their timeout, and so do the waits for their turn or for other workers. Once it runs out, the average is
+# computed from the sources that answered in latency oriented mode, and the request fails with 504 otherwise
+LATENCY_BUDGET = 10.
+LATENCY_BUDGET_MAX = 30.
+
+# Latency oriented averaging. Instead of waiting for every source, the average is returned as soon as AVERAGE_QUORUM
+# sources answered, or once AVERAGE_DEADLINE seconds elapsed, and the sources that fail are left out. A source that
+# takes longer than its HEDGE_PERCENTILE latency percentile is requested again (hedged) and the first answer wins
+LATENCY_ORIENTED_AVERAGING = False
+AVERAGE_QUORUM = 2
+AVERAGE_DEADLINE = 2.0
+HEDGE_PERCENTILE = 95
+
+# Early return on agreement. When AGREEMENT_TOLERANCE (in celsius degrees) is set, the average is returned as soon as
+# AGREEMENT_QUORUM readings are within AGREEMENT_TOLERANCE of each other, and it's the average of those readings. If
+# they never agree, the average waits for every source, or for the quorum and deadline of the latency oriented mode if
+# it's enabled. Either way, failing sources are left out, and the requests still in flight keep filling the cache
+AGREEMENT_TOLERANCE = None
+AGREEMENT_QUORUM = 2
+
+# Every temperature source has a circuit breaker. It opens when, among the last CIRCUIT_BREAKER_WINDOW requests (and
+# at least CIRCUIT_BREAKER_MIN_REQUESTS), the rate of failures reaches CIRCUIT_BREAKER_FAILURE_RATE or the rate of
+# requests slower than CIRCUIT_BREAKER_SLOW_REQUEST_DURATION seconds reaches CIRCUIT_BREAKER_SLOW_REQUEST_RATE. Only
+# connection errors and 5xx responses are failures: other errors, like 4xx responses, depend on the request. While
+# open, the source is not requested. After CIRCUIT_BREAKER_OPEN_DURATION seconds, CIRCUIT_BREAKER_PROBES requests are
+# let through: the breaker closes if all of them succeed, and opens again otherwise
+CIRCUIT_BREAKER_WINDOW = 20
+CIRCUIT_BREAKER_MIN_REQUESTS = 10
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5
+CIRCUIT_BREAKER_SLOW_REQUEST_DURATION = 5
+CIRCUIT_BREAKER_SLOW_REQUEST_RATE = 0.8
+CIRCUIT_BREAKER_OPEN_DURATION = 30
+CIRCUIT_BREAKER_PROBES = 3
+
+# The requests of every worker process to every source are rate limited: at most RATE_LIMIT_REQUESTS_PER_SECOND per
+# second, in bursts of up to RATE_LIMIT_BURST (None, by default, lifts it), and at most an adaptive amount at once.
+# That amount, between CONCURRENCY_LIMIT_MIN and CONCURRENCY_LIMIT_MAX, grows while the source answers well, and is
+# multiplied by CONCURRENCY_LIMIT_BACKOFF when it answers 429 or 5xx, or takes CONCURRENCY_LIMIT_LATENCY_TOLERANCE
+# times its usual latency. Requests over the limits wait up to RATE_LIMIT_MAX_WAIT seconds for their turn, and the
+# source is left out otherwise. RATE_LIMITS_BY_SOURCE overrides any of them by source ID, i.e.
+# {'accuweather': {'requests_per_second': 10, 'max_concurrency': 4}} (see RateLimiter for every key)
+RATE_LIMIT_REQUESTS_PER_SECOND = None
+RATE_LIMIT_BURST = 100
+RATE_LIMIT_MAX_WAIT = 1.
+CONCURRENCY_LIMIT_INITIAL = UPSTREAM_POOL_SIZE
+CONCURRENCY_LIMIT_MIN = 1
+CONCURRENCY_LIMIT_MAX = UPSTREAM_POOL_SIZE
+CONCURRENCY_LIMIT_LATENCY_TOLERANCE = 3.
+CONCURRENCY_LIMIT_BACKOFF = 0.5
+RATE_LIMITS_BY_SOURCE = {}
+
+# The serve management command runs the production server: SERVING_WORKERS processes (by default, one per CPU) are
+# forked from a master process that loaded the app, the source registry and the offline datasets first, so they share
+# that memory. SERVING_INTERFACE is either asgi (an event loop per worker) or wsgi (SERVING_THREADS threads per
+# worker). On restart or shutdown, every worker has SERVING_GRACEFUL_TIMEOUT seconds to finish the requests in progress
+SERVING_INTERFACE = 'asgi'
+SERVING_BIND = '0.0.0.0:80'
+SERVING_WORKERS = None
+SERVING_THREADS = 8
+SERVING_GRACEFUL_TIMEOUT = 30
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ship_well.settings')
 
 application = get_wsgi_application()
+
+# a single process server: this process serves the requests. See the serve management command for the prefork server
+from average_temperature.lifecycle import start_worker  # noqa: E402
+
+start_worker()